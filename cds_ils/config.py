@@ -622,27 +622,153 @@ CDS_ILS_EZPROXY_URL = "https://ezproxy.cern.ch/login?url={url}"
 # CDS-ILS importer configuration
 ###############################################################################
 
+#: XPath of the records of the imported files, or their local name. The
+#: records selected by their local name in any namespace are parsed
+#: incrementally, any other XPath loads the whole file
 CDS_ILS_IMPORTER_RECORD_TAG = "//*[local-name() = 'record']"
 
 CDS_ILS_IMPORTER_PROVIDERS = {
     "cds": {
         "priority": 1,
         "agency_code": "SzGeCERN",
+        "concurrency": 1,
     },
     "springer": {
         "priority": 2,
         "agency_code": "DE-He213",
+        "concurrency": 1,
+    },
+    "ebl": {
+        "priority": 3,
+        "agency_code": "MiAaPQ",
+        "concurrency": 1,
+    },
+    "safari": {
+        "priority": 4,
+        "agency_code": "CaSebORM",
+        "concurrency": 1,
     },
-    "ebl": {"priority": 3, "agency_code": "MiAaPQ"},
-    "safari": {"priority": 4, "agency_code": "CaSebORM"},
 }
 
 CDS_ILS_IMPORTER_UPLOADS_PATH = "/tmp"
 
-CDS_ILS_IMPORTER_FILE_EXTENSIONS_ALLOWED = [".xml"]
+#: Extensions of the files accepted by the importer, the compressed files
+#: are stored as they are and decompressed while they are imported
+CDS_ILS_IMPORTER_FILE_EXTENSIONS_ALLOWED = [
+    ".xml",
+    ".xml.gz",
+    ".xml.zst",
+    # records converted beforehand, see the ``importer convert`` command
+    ".ndjson",
+    ".ndjson.gz",
+    ".ndjson.zst",
+]
+
+#: Time during which the upload of a file identical to one already imported
+#: with the same provider and mode returns the existing task, None to always
+#: import the uploaded files
+CDS_ILS_IMPORTER_DUPLICATE_UPLOADS_WINDOW = timedelta(days=1)
 
 CDS_ILS_IMPORTER_PROVIDERS_ALLOWED_TO_DELETE_RECORDS = ["ebl", "safari"]
 
+#: Number of consecutive records whose matching documents are searched
+#: in a single request
+CDS_ILS_IMPORTER_MATCHING_WINDOW = 50
+
+#: Maximum number of documents returned by each matching search
+CDS_ILS_IMPORTER_MATCHING_MAX_HITS = 100
+
+#: Minimum number of entries of a file to pre-load the documents identifiers
+#: in memory before importing it, None to never pre-load them
+CDS_ILS_IMPORTER_IDENTIFIERS_INDEX_MIN_ENTRIES = 1000
+
+#: Minimum number of entries of a file to pre-load the signatures of the
+#: documents titles and authors in memory, to fuzzy match the records locally
+#: instead of searching them, None to never pre-load them
+CDS_ILS_IMPORTER_FUZZY_INDEX_MIN_ENTRIES = 1000
+
+#: Minimum estimated similarity of the documents fuzzy matched locally
+CDS_ILS_IMPORTER_FUZZY_MATCHING_THRESHOLD = 0.6
+
+#: Search the fuzzy matches of the records not fuzzy matched locally
+CDS_ILS_IMPORTER_FUZZY_SEARCH_FALLBACK = False
+
+#: Match the title and authors of the records with a term query on the
+#: normalized match key of the documents, instead of analyzed queries.
+#: The match key is only indexed when enabled: map and index it with the
+#: ``importer index-match-keys`` command before enabling it, and once again
+#: after, for the documents indexed meanwhile
+CDS_ILS_IMPORTER_MATCH_BY_KEY = False
+
+#: Match the ISBN and ISSN of the records with their canonical form, ISBN-10
+#: folded to ISBN-13, stored along the documents and series. They are only
+#: indexed when enabled: map and index them with the
+#: ``importer index-match-keys`` command before enabling it, and once again
+#: after, for the records indexed meanwhile
+CDS_ILS_IMPORTER_MATCH_CANONICAL_IDENTIFIERS = False
+
+#: Number of records sent in each bulk request when indexing imported records
+CDS_ILS_IMPORTER_BULK_INDEXING_CHUNK_SIZE = 500
+
+#: Maximum number of import task entries kept in memory before storing them
+CDS_ILS_IMPORTER_ENTRIES_FLUSH_SIZE = 100
+
+#: Maximum number of seconds import task entries are kept in memory
+CDS_ILS_IMPORTER_ENTRIES_FLUSH_INTERVAL = 5
+
+#: Minimum number of entries of each shard of a file imported in parallel,
+#: the number of shards is limited by the ``concurrency`` of the provider
+CDS_ILS_IMPORTER_SHARD_MIN_ENTRIES = 500
+
+#: Maximum number of records imported in a single transaction, each one in
+#: its own savepoint, None to commit the records of each matching window
+#: together. The entries and the checkpoint of the task are committed along
+#: them, for the task to be resumed without duplicates if its worker dies
+CDS_ILS_IMPORTER_RECORDS_PER_COMMIT = None
+
+#: Skip the records which did not change since their last import, identified
+#: by the fingerprint of their MARC fields and of the conversion rules
+CDS_ILS_IMPORTER_SKIP_UNCHANGED_RECORDS = False
+
+#: Time after which a running import which did not report its progress is
+#: considered dead and can be resumed
+CDS_ILS_IMPORTER_TASK_LEASE = timedelta(minutes=10)
+
+#: Maximum number of entries returned by each importer check request
+CDS_ILS_IMPORTER_CHECK_MAX_PAGE_SIZE = 100
+
+#: Redis URL of the channels publishing the progress of the importer tasks,
+#: streamed to the browsers. Disabled by default, the browsers poll the
+#: tasks. Each open stream holds a worker of the web server until the task
+#: ends or the stream times out, it requires the asynchronous (e.g. gevent)
+#: workers of a server dedicated to the streams, not the synchronous ones
+#: serving the application, e.g. "redis://localhost:6379/4". Requires the
+#: ``progress`` extra
+CDS_ILS_IMPORTER_PROGRESS_REDIS_URL = None
+
+#: Duration after which a progress stream is closed, for clients to reconnect
+CDS_ILS_IMPORTER_PROGRESS_STREAM_TIMEOUT = timedelta(minutes=5)
+
+#: Seconds between the keepalive messages of an idle progress stream
+CDS_ILS_IMPORTER_PROGRESS_STREAM_KEEPALIVE = 15
+
+#: Number of shards of a file converted in parallel by the conversion task
+CDS_ILS_IMPORTER_CONVERSION_SHARDS = 4
+
+#: Number of records sent at once to each process of the conversion command
+CDS_ILS_IMPORTER_CONVERSION_CHUNK_SIZE = 100
+
+#: Path of the sqlite file caching the records converted from MARCXML, shared
+#: by the importer and the migrator, None to always convert the records
+CDS_ILS_IMPORTER_CONVERSION_CACHE_PATH = None
+
+#: Maximum number of bytes of the cached conversions, the least recently used
+#: ones are evicted beyond it
+CDS_ILS_IMPORTER_CONVERSION_CACHE_MAX_SIZE = 2 * 1024 ** 3
+
+#: Number of new conversions and accesses written at once to the cache file
+CDS_ILS_IMPORTER_CONVERSION_CACHE_BATCH_SIZE = 100
+
 CDS_ILS_RECORD_LEGACY_PID_TYPE = "lrecid"
 
 CDS_ILS_INDEX_LOCAL_ACCOUNTS = True
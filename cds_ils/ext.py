@@ -10,6 +10,9 @@
 from flask import Blueprint
 from invenio_records.signals import after_record_insert, after_record_update
 
+from cds_ils.importer.documents.api import register_match_key_signals
+from cds_ils.literature.identifiers import \
+    register_canonical_identifiers_signals
 from cds_ils.literature.tasks import pick_identifier_with_cover
 
 
@@ -38,3 +41,9 @@ class CdsIls(object):
         if app.config.get("CDS_ILS_LITERATURE_UPDATE_COVERS", True):
             after_record_insert.connect(pick_identifier_with_cover)
             after_record_update.connect(pick_identifier_with_cover)
+        if app.config.get("CDS_ILS_IMPORTER_MATCH_BY_KEY", False):
+            register_match_key_signals(app)
+        if app.config.get(
+            "CDS_ILS_IMPORTER_MATCH_CANONICAL_IDENTIFIERS", False
+        ):
+            register_canonical_identifiers_signals(app)
@@ -6,9 +6,8 @@
 # the terms of the MIT License; see LICENSE file for more details.
 
 """CDS-ILS RecordDumpLoader module."""
-import pkg_resources
-
 from cds_ils.importer.errors import RecordNotDeletable
+from cds_ils.importer.registry import current_importer_providers
 
 
 class XMLRecordDumpLoader(object):
@@ -17,19 +16,30 @@ class XMLRecordDumpLoader(object):
     @classmethod
     def get_importer_class(cls, provider):
         """Load importer for a given provider."""
-        return pkg_resources.load_entry_point(
-            "cds-ils", "cds_ils.importers", provider
-        )
+        return current_importer_providers.get(provider).importer_class
 
     @classmethod
-    def process(cls, dump_model, provider, mode):
-        """Process the JSON dump."""
+    def get_importer(cls, dump_model, provider, mode, context=None):
+        """Convert the JSON dump and instantiate the provider importer."""
         timestamp, json_data, is_deletable = dump_model.dump()
         importer_class = cls.get_importer_class(provider)
         if mode == "delete" and not is_deletable:
             raise RecordNotDeletable()
+        return importer_class(json_data, provider, context=context)
+
+    @classmethod
+    def run(cls, importer, mode):
+        """Run the importer in the given mode."""
         if mode == "create":
-            report = importer_class(json_data, provider).import_record()
-        elif mode == "delete" and is_deletable:
-            report = importer_class(json_data, provider).delete_record()
+            report = importer.import_record()
+        elif mode == "delete":
+            report = importer.delete_record()
+        elif mode == "preview":
+            report = importer.preview_record()
         return report
+
+    @classmethod
+    def process(cls, dump_model, provider, mode):
+        """Process the JSON dump."""
+        importer = cls.get_importer(dump_model, provider, mode)
+        return cls.run(importer, mode)
@@ -9,15 +9,17 @@
 """CDS Migrator Records loader."""
 import datetime
 
-from cds_dojson.marc21.utils import create_record
 from flask import current_app
 from invenio_pidstore.resolver import Resolver
 from invenio_records.api import Record
+from lxml import etree
 
 from cds_ils.importer import marc21
+from cds_ils.importer.conversion_cache import get_conversion_cache
 from cds_ils.importer.errors import LossyConversion, ManualImportRequired, \
     MissingRequiredField, UnexpectedValue
 from cds_ils.importer.handlers import importer_exception_handler
+from cds_ils.importer.marc import create_marc_record, get_marc_fields
 
 
 class XMLRecordToJson(object):
@@ -43,31 +45,44 @@ class XMLRecordToJson(object):
         self.pid_fetchers = pid_fetchers or []
 
     def dump(self):
-        """Perform record dump."""
+        """Perform record dump, reusing the cached conversion if any."""
         dt = datetime.datetime.utcnow()
 
+        data = self.data
+        if etree.iselement(data):
+            # flattened once for the cache key and the MARC record
+            data = get_marc_fields(data)
+
+        cache = get_conversion_cache()
+        if cache is not None:
+            cache_key = cache.get_key(self.dojson_model, data)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                val, is_deletable = cached
+                return dt, val, is_deletable
+
         exception_handlers = {
             UnexpectedValue: importer_exception_handler,
             MissingRequiredField: importer_exception_handler,
             ManualImportRequired: importer_exception_handler,
         }
 
-        marc_record = create_record(self.data)
+        marc_record = create_marc_record(data)
         if "d" in marc_record.get("leader", []):
             is_deletable = True
         else:
             is_deletable = False
         try:
 
-            # MARCXML -> JSON fields translation
-            val = self.dojson_model.do(
+            # MARCXML -> JSON fields translation, checking for missing rules
+            val, missing = self.dojson_model.convert(
                 marc_record, exception_handlers=exception_handlers
             )
-            # check for missing rules
-            missing = self.dojson_model.missing(marc_record)
 
             if missing:
                 raise LossyConversion(missing=missing)
+            if cache is not None:
+                cache.set(cache_key, val, is_deletable)
             return dt, val, is_deletable
 
         except LossyConversion as e:
@@ -7,7 +7,7 @@
 
 """CDS-IlS Importer module."""
 
-from cds_dojson.overdo import OverdoBase
+from cds_ils.importer.overdo import CdsIlsOverdoBase
 
 # Matching to a correct model is happening here
-marc21 = OverdoBase(entry_point_models="cds_ils.importer.models")
+marc21 = CdsIlsOverdoBase(entry_point_models="cds_ils.importer.models")
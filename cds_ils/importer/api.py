@@ -7,29 +7,70 @@
 
 """CDS-ILS Importer API module."""
 import logging
+import os
+from functools import partial
 
 from celery import shared_task
 from flask import current_app
 from invenio_app_ils.errors import IlsValidationError
 from invenio_db import db
+from lxml import etree
+from sqlalchemy.orm.exc import StaleDataError
 
-from cds_ils.importer.errors import LossyConversion, \
-    ProviderNotAllowedDeletion, RecordNotDeletable
-from cds_ils.importer.models import ImporterTaskEntry, ImporterTaskLog
-from cds_ils.importer.parse_xml import get_records_list
+from cds_ils.importer.context import ImportContext
+from cds_ils.importer.conversion import ConvertedRecordDump
+from cds_ils.importer.conversion_cache import flush_conversion_cache
+from cds_ils.importer.documents.fuzzy import DocumentFuzzyIndex
+from cds_ils.importer.documents.identifiers import DocumentIdentifiersIndex
+from cds_ils.importer.documents.importer import DocumentImporter
+from cds_ils.importer.entries import ImporterTaskEntryWriter
+from cds_ils.importer.errors import DocumentCreationDeferred, \
+    ImporterTaskNotPromotable, ImporterTaskNotResumable, LossyConversion, \
+    ProviderNotAllowedDeletion, RecordConversionError, RecordNotDeletable, \
+    RecordUnchanged, ShardImportError
+from cds_ils.importer.fingerprints import RecordFingerprints
+from cds_ils.importer.indexer import IndexingBuffer
+from cds_ils.importer.marc import get_marc_fields
+from cds_ils.importer.models import ImporterMode, ImporterTaskEntry, \
+    ImporterTaskLog, ImporterTaskStatus, _format_exception
+from cds_ils.importer.registry import current_importer_providers
+from cds_ils.importer.series.cache import SeriesCache
+from cds_ils.importer.sources import SOURCE_TYPES, count_source_records, \
+    get_source_records, open_source
+from cds_ils.importer.transactions import UnitOfWork
 from cds_ils.importer.XMLRecordLoader import XMLRecordDumpLoader
 from cds_ils.importer.XMLRecordToJson import XMLRecordToJson
 
 records_logger = logging.getLogger("records_errored")
 
+ENTRY_ERRORS = (
+    LossyConversion,
+    RecordNotDeletable,
+    ProviderNotAllowedDeletion,
+    IlsValidationError,
+    RecordConversionError,
+)
+"""Errors failing a single entry without aborting the whole import."""
+
+DEFERRED_ENTRY_ERRORS = (DocumentCreationDeferred, StaleDataError)
+"""Errors deferring an entry to the sequential pass of a parallel import."""
+
+
+def get_record_dump(data, source_type, provider):
+    """Get the dump model converting a record of the given source type."""
+    if source_type == "ndjson":
+        # converted beforehand by the conversion stage
+        return ConvertedRecordDump(data)
+    dojson_model = current_importer_providers.get(provider).dojson_model
+    return XMLRecordToJson(
+        data, source_type=source_type, dojson_model=dojson_model
+    )
+
 
 @shared_task()
 def process_dump(data, provider, mode, source_type):
     """Process record dump."""
-    recorddump = XMLRecordToJson(
-        data,
-        source_type=source_type,
-    )
+    recorddump = get_record_dump(data, source_type, provider)
     try:
         report = XMLRecordDumpLoader.process(recorddump, provider, mode)
         db.session.commit()
@@ -39,63 +80,520 @@ def process_dump(data, provider, mode, source_type):
         raise e
 
 
+def validate_provider_mode(provider, mode):
+    """Check that the provider is allowed to import in the given mode."""
+    if mode == "delete" \
+            and not current_importer_providers.get(provider).can_delete:
+        raise ProviderNotAllowedDeletion(provider=provider)
+
+
 def import_record(data, provider, mode, source_type=None, eager=False):
     """Import record from dump."""
     source_type = source_type or "marcxml"
-    assert source_type in ["marcxml"]
+    assert source_type in SOURCE_TYPES.values()
 
-    if provider not in current_app.config[
-        "CDS_ILS_IMPORTER_PROVIDERS_ALLOWED_TO_DELETE_RECORDS"
-    ] and mode == 'delete':
-        raise ProviderNotAllowedDeletion(provider=provider)
+    validate_provider_mode(provider, mode)
     if eager:
         return process_dump(data, provider, mode, source_type=source_type)
     else:
+        if etree.iselement(data):
+            # compact fields are sent to the workers, not serialized records
+            data = get_marc_fields(data)
         process_dump.delay(data, provider, mode, source_type=source_type)
 
 
+def _add_entry_failure(log_id, entries_writer, entry_data, exception):
+    """Store the failure of an entry."""
+    if isinstance(exception, IlsValidationError):
+        records_logger.error(
+            "@FILE TASK: {0} FATAL: {1}".format(
+                log_id,
+                str(exception.original_exception.message),
+            )
+        )
+    entries_writer.add_failure(entry_data, exception)
+
+
+def _import_window(log_id, window, mode, context, entries_writer):
+    """Import a window of converted records.
+
+    The documents matching all the records of the window are searched with
+    a single request before importing them one by one.
+
+    :returns: the indexes of the deferred entries.
+    """
+    DocumentImporter.match_documents([
+        importer.document_importer for _, importer in window
+    ])
+    deferred = []
+    for entry_data, importer in window:
+        try:
+            with context.record():
+                report = XMLRecordDumpLoader.run(importer, mode)
+        except ENTRY_ERRORS as e:
+            _add_entry_failure(log_id, entries_writer, entry_data, e)
+            continue
+        except DEFERRED_ENTRY_ERRORS:
+            deferred.append(entry_data["entry_index"])
+            continue
+        except Exception as e:
+            entries_writer.add_failure(entry_data, e)
+            raise e
+
+        entries_writer.add_success(entry_data, report)
+        if context.fingerprints is not None \
+                and (report["created"] or report["updated"]):
+            context.fingerprints.add(
+                importer.json_data.get("provider_recid"),
+                *importer.get_imported_pids()
+            )
+
+    return deferred
+
+
+def _commit_window(log, context, entries_writer, window_last_index=None):
+    """Commit the records of a window along with their entries.
+
+    The task is checkpointed in the same transaction: if the worker dies,
+    the records of the window, their entries and the checkpoint are lost
+    together and the entries are imported again when resuming. The records
+    are committed before being indexed.
+    """
+    context.flush_series()
+    entries_writer.flush()
+    if window_last_index is not None:
+        log.checkpoint(window_last_index, unit_of_work=context.unit_of_work)
+    context.commit()
+    context.indexing_buffer.flush()
+    if context.fingerprints is not None:
+        context.fingerprints.flush()
+    flush_conversion_cache()
+
+
+def create_import_context(
+    entries_count, provider, mode, defer_creations=False, log=None
+):
+    """Create the context of an import run.
+
+    The identifiers of all the documents are pre-loaded in memory when the
+    file is large enough for it to be cheaper than searching each record.
+    The signatures of the documents titles and authors are pre-loaded as
+    well, to fuzzy match the records locally. Otherwise, the in-memory
+    indexes only hold the documents created or updated by the run: the
+    matches of a window are searched before its records are imported and
+    indexed, the records of the window matching each other are found there.
+    The series matched or created by the run are cached along it.
+    The indexing of the imported records is deferred and done in bulk, its
+    failures are counted on the task.
+    The fingerprints of the records of the provider are loaded to skip the
+    unchanged ones when importing. The records are imported in a unit of
+    work, committed by the caller.
+    """
+    min_entries = current_app.config[
+        "CDS_ILS_IMPORTER_IDENTIFIERS_INDEX_MIN_ENTRIES"
+    ]
+    if min_entries is not None and entries_count >= min_entries:
+        identifiers_index = DocumentIdentifiersIndex.build()
+    else:
+        identifiers_index = DocumentIdentifiersIndex()
+    min_entries = current_app.config[
+        "CDS_ILS_IMPORTER_FUZZY_INDEX_MIN_ENTRIES"
+    ]
+    fuzzy_index_kwargs = dict(
+        threshold=current_app.config[
+            "CDS_ILS_IMPORTER_FUZZY_MATCHING_THRESHOLD"
+        ],
+        max_hits=current_app.config["CDS_ILS_IMPORTER_MATCHING_MAX_HITS"],
+    )
+    if min_entries is not None and entries_count >= min_entries:
+        fuzzy_index = DocumentFuzzyIndex.build(**fuzzy_index_kwargs)
+    else:
+        fuzzy_index = DocumentFuzzyIndex(**fuzzy_index_kwargs)
+    fingerprints = None
+    if mode == "create" and current_app.config[
+        "CDS_ILS_IMPORTER_SKIP_UNCHANGED_RECORDS"
+    ]:
+        fingerprints = RecordFingerprints.load(provider)
+    return ImportContext(
+        identifiers_index=identifiers_index,
+        fuzzy_index=fuzzy_index,
+        indexing_buffer=IndexingBuffer(log=log),
+        series_cache=SeriesCache(),
+        defer_creations=defer_creations,
+        fingerprints=fingerprints,
+        unit_of_work=UnitOfWork(),
+    )
+
+
+def _import_entries(log, entries, entries_count, mode, defer_creations=False):
+    """Import the given entries of a task, window by window.
+
+    The records of each window are committed with their entries and the
+    checkpoint of the task, so that it can be resumed if the worker dies.
+    The windows hold at most ``CDS_ILS_IMPORTER_RECORDS_PER_COMMIT``
+    records, if set.
+
+    :param entries: iterable of the entry indexes along with the functions
+                    returning the importers of their records for a context.
+    :param entries_count: number of entries to import.
+    :returns: the indexes of the deferred entries.
+    """
+    window_size = current_app.config["CDS_ILS_IMPORTER_MATCHING_WINDOW"]
+    commit_size = current_app.config["CDS_ILS_IMPORTER_RECORDS_PER_COMMIT"]
+    if commit_size:
+        window_size = min(window_size, commit_size)
+    context = create_import_context(
+        entries_count,
+        log.provider,
+        mode,
+        defer_creations=defer_creations,
+        log=log,
+    )
+    entries_writer = ImporterTaskEntryWriter(
+        log=log, unit_of_work=context.unit_of_work
+    )
+    deferred = []
+    entry_data = None
+
+    def import_window(window, window_last_index):
+        deferred.extend(
+            _import_window(log.id, window, mode, context, entries_writer)
+        )
+        _commit_window(log, context, entries_writer, window_last_index)
+
+    try:
+        window = []
+        i = None
+        for i, get_importer in entries:
+            entry_data = dict(
+                import_id=log.id,
+                entry_index=i,
+            )
+            try:
+                window.append((entry_data, get_importer(context)))
+            except RecordUnchanged:
+                entries_writer.add_skipped(entry_data, "unchanged")
+            except ENTRY_ERRORS as e:
+                _add_entry_failure(log.id, entries_writer, entry_data, e)
+            # the entry is now handled by the window
+            entry_data = None
+
+            if len(window) == window_size:
+                import_window(window, i)
+                window = []
+        import_window(window, i)
+    except Exception as e:
+        records_logger.error(
+            "@FILE TASK: {0} ERROR: {1}".format(log.id, str(e))
+        )
+        if entry_data:
+            entries_writer.add_failure(entry_data, e)
+        # commit and index the records imported so far
+        _commit_window(log, context, entries_writer)
+        raise e
+
+    return deferred
+
+
+def _get_record_importer(
+    record, source_type, provider, mode, context,
+    previewed_fuzzy_matches=None,
+):
+    """Convert a record of the source file and get its importer.
+
+    :param previewed_fuzzy_matches: fuzzy matches of the record found by
+                                    its preview, to not search them again.
+    """
+    validate_provider_mode(provider, mode)
+    if source_type == "marcxml":
+        # flattened once for the fingerprint and the conversion
+        record = get_marc_fields(record)
+    if context.fingerprints is not None:
+        if source_type == "ndjson":
+            context.fingerprints.check_fingerprint(
+                record.get("provider_recid"), record.get("fingerprint")
+            )
+        else:
+            context.fingerprints.check(record)
+    importer = XMLRecordDumpLoader.get_importer(
+        get_record_dump(record, source_type, provider),
+        provider,
+        mode,
+        context=context,
+    )
+    importer.document_importer.previewed_fuzzy_matches = \
+        previewed_fuzzy_matches
+    return importer
+
+
+def _import_records(
+    log,
+    source,
+    source_type,
+    provider,
+    mode,
+    entry_indexes,
+    defer_creations=False,
+    previewed_fuzzy_matches=None,
+):
+    """Import the records of the file having the given entry indexes.
+
+    :param previewed_fuzzy_matches: fuzzy matches of the previewed records,
+                                    by entry index.
+    :returns: the indexes of the deferred entries.
+    """
+    last_index = max(entry_indexes, default=-1)
+    previewed_fuzzy_matches = previewed_fuzzy_matches or {}
+
+    def get_entries():
+        records = get_source_records(source, source_type)
+        for i, record in enumerate(records):
+            if i > last_index:
+                break
+            if i in entry_indexes:
+                yield i, partial(
+                    _get_record_importer,
+                    record,
+                    source_type,
+                    provider,
+                    mode,
+                    previewed_fuzzy_matches=previewed_fuzzy_matches.get(i),
+                )
+
+    return _import_entries(
+        log,
+        get_entries(),
+        len(entry_indexes),
+        mode,
+        defer_creations=defer_creations,
+    )
+
+
 def import_from_xml(log_id, source_path, source_type, provider, mode):
     """Load a single xml file."""
     log = ImporterTaskLog.query.filter_by(id=log_id).first()
-    entry_data = None
     try:
-        with open(source_path) as source:
-            records_list = list(get_records_list(source))
+        # update the entries count now that we know it
+        log.source_path = source_path
+        log.entries_count = count_source_records(source_path, source_type)
+        db.session.commit()
 
-            # update the entries count now that we know it
-            log.entries_count = len(records_list)
-            db.session.commit()
+        with open_source(source_path) as source:
+            _import_records(
+                log,
+                source,
+                source_type,
+                provider,
+                mode,
+                range(log.entries_count),
+            )
+    except Exception as e:
+        log.set_failed(e)
+        raise e
 
-            for i, record in enumerate(records_list):
-                entry_data = dict(
-                    import_id=log.id,
-                    entry_index=i,
-                )
-                try:
-                    report = import_record(record, provider, mode,
-                                           source_type=source_type,
-                                           eager=True)
-                except (LossyConversion, RecordNotDeletable,
-                        ProviderNotAllowedDeletion) as e:
-                    ImporterTaskEntry.create_failure(entry_data, e)
-                    continue
-                except IlsValidationError as e:
-                    records_logger.error(
-                        "@FILE TASK: {0} FATAL: {1}".format(
-                            log_id,
-                            str(e.original_exception.message),
-                        )
-                    )
-                    ImporterTaskEntry.create_failure(entry_data, e)
-                    continue
-
-                ImporterTaskEntry.create_success(entry_data, report)
+    log.set_succeeded()
+
+
+def get_import_shards(log_id, source_path, provider):
+    """Split the file in ranges of entries to be imported in parallel.
+
+    The number of shards is given by the concurrency of the provider, and
+    each one has at least ``CDS_ILS_IMPORTER_SHARD_MIN_ENTRIES`` entries.
+
+    :returns: the list of ``(start, stop)`` entry indexes of the shards, a
+              single shard means that the file should be imported
+              sequentially.
+    """
+    concurrency = current_importer_providers.get(provider).concurrency
+    if concurrency <= 1:
+        return [(0, None)]
+
+    log = ImporterTaskLog.query.filter_by(id=log_id).first()
+    log.entries_count = count_source_records(source_path, log.source_type)
+    db.session.commit()
+
+    min_entries = current_app.config["CDS_ILS_IMPORTER_SHARD_MIN_ENTRIES"]
+    shards_count = min(concurrency, log.entries_count // min_entries)
+    if shards_count <= 1:
+        return [(0, None)]
+    shard_size = -(-log.entries_count // shards_count)  # ceiling division
+    return [
+        (start, min(start + shard_size, log.entries_count))
+        for start in range(0, log.entries_count, shard_size)
+    ]
+
+
+def import_shard_from_xml(
+    log_id, source_path, source_type, provider, mode, start, stop
+):
+    """Load a range of entries of a xml file, in parallel with other shards.
+
+    To avoid duplicates, the records that would create a document or a
+    series, and the ones updating a document concurrently modified by
+    another shard, are not imported but deferred to a sequential pass run
+    when all the shards are completed. The records updating the matched
+    documents are imported by the shards.
+
+    :returns: a dict with the deferred entry indexes and the error message
+              if the shard failed.
+    """
+    log = ImporterTaskLog.query.filter_by(id=log_id).first()
+    try:
+        with open_source(source_path) as source:
+            deferred = _import_records(
+                log,
+                source,
+                source_type,
+                provider,
+                mode,
+                range(start, stop),
+                defer_creations=True,
+            )
     except Exception as e:
-        records_logger.error(
-            "@FILE TASK: {0} ERROR: {1}".format(log_id, str(e))
+        db.session.rollback()
+        return dict(deferred=[], error=_format_exception(e))
+    return dict(deferred=deferred, error=None)
+
+
+def finish_sharded_import(
+    shard_results, log_id, source_path, source_type, provider, mode
+):
+    """Import the deferred entries of the shards and close the task."""
+    log = ImporterTaskLog.query.filter_by(id=log_id).first()
+    errors = [result["error"] for result in shard_results if result["error"]]
+    deferred = set(
+        index for result in shard_results for index in result["deferred"]
+    )
+    try:
+        with open_source(source_path) as source:
+            _import_records(
+                log, source, source_type, provider, mode, deferred
+            )
+        if errors:
+            raise ShardImportError("; ".join(errors))
+    except Exception as e:
+        log.set_failed(e)
+        raise e
+
+    log.set_succeeded()
+
+
+def get_resumable_task(log_id):
+    """Get the task log to resume, if it failed or its worker died."""
+    log = ImporterTaskLog.query.filter_by(id=log_id).first()
+    if not log:
+        raise ImporterTaskNotResumable("Task not found")
+    lease = current_app.config["CDS_ILS_IMPORTER_TASK_LEASE"]
+    if log.status == ImporterTaskStatus.SUCCEEDED:
+        raise ImporterTaskNotResumable("The task already succeeded")
+    if log.is_running() and not log.is_stale(lease):
+        raise ImporterTaskNotResumable("The task is still running")
+    if not log.source_path or not os.path.exists(log.source_path):
+        raise ImporterTaskNotResumable("The source file is not available")
+    return log
+
+
+def resume_import(log_id):
+    """Resume an interrupted import, skipping the already imported entries.
+
+    The records are imported sequentially, from the start of the file for
+    the entries deferred or lost by a parallel import.
+    """
+    log = get_resumable_task(log_id)
+    log.set_resumed()
+
+    try:
+        _import_missing_records(log)
+    except Exception as e:
+        log.set_failed(e)
+        raise e
+
+    log.set_succeeded()
+
+
+def _import_missing_records(log, previewed_fuzzy_matches=None):
+    """Import the records of the source file which have no entry yet.
+
+    :param previewed_fuzzy_matches: fuzzy matches of the previewed records,
+                                    by entry index.
+    """
+    imported_indexes = set(
+        entry_index for entry_index, in db.session.query(
+            ImporterTaskEntry.entry_index
+        ).filter_by(import_id=log.id)
+    )
+    if log.entries_count is None:
+        log.entries_count = count_source_records(
+            log.source_path, log.source_type
         )
-        if entry_data:
-            ImporterTaskEntry.create_failure(entry_data, e)
+        db.session.commit()
+    with open_source(log.source_path) as source:
+        entry_indexes = set(range(log.entries_count)) - imported_indexes
+        if entry_indexes:
+            _import_records(
+                log,
+                source,
+                log.source_type,
+                log.provider,
+                log.mode.value.lower(),
+                entry_indexes,
+                previewed_fuzzy_matches=previewed_fuzzy_matches,
+            )
+
+
+def create_promotion_task(preview_log_id, agent):
+    """Create the task log importing the records of a previewed task."""
+    preview_log = ImporterTaskLog.query.filter_by(id=preview_log_id).first()
+    if not preview_log or preview_log.mode != ImporterMode.PREVIEW:
+        raise ImporterTaskNotPromotable("Preview task not found")
+    if preview_log.status != ImporterTaskStatus.SUCCEEDED:
+        raise ImporterTaskNotPromotable("The preview did not succeed")
+    return ImporterTaskLog.create(dict(
+        agent=agent,
+        provider=preview_log.provider,
+        source_type=preview_log.source_type,
+        mode=ImporterMode.CREATE,
+        original_filename=preview_log.original_filename,
+        source_path=preview_log.source_path,
+        entries_count=preview_log.entries_count,
+    ))
+
+
+def _get_previewed_fuzzy_matches(preview_log_id):
+    """Get the fuzzy matches of the entries of a preview, by entry index.
+
+    The records exactly matching a single document were not fuzzy matched,
+    neither were the failed ones.
+    """
+    entries = db.session.query(
+        ImporterTaskEntry.entry_index, ImporterTaskEntry.fuzzy_documents
+    ).filter(
+        ImporterTaskEntry.import_id == preview_log_id,
+        ImporterTaskEntry.error.is_(None),
+        ImporterTaskEntry.updated_document.is_(None),
+    )
+    return {
+        entry_index: fuzzy_documents or []
+        for entry_index, fuzzy_documents in entries
+    }
+
+
+def promote_preview(preview_log_id, log_id):
+    """Import the records of a previewed task.
+
+    The records are converted again, from the conversion cache if enabled,
+    and matched again except for the fuzzy matches found by the preview.
+    Only the fuzzy matched documents which still exist are kept.
+    """
+    log = ImporterTaskLog.query.filter_by(id=log_id).first()
+    try:
+        _import_missing_records(
+            log,
+            previewed_fuzzy_matches=_get_previewed_fuzzy_matches(
+                preview_log_id
+            ),
+        )
+    except Exception as e:
         log.set_failed(e)
         raise e
 
@@ -6,17 +6,30 @@
 # the terms of the MIT License; see LICENSE file for more details.
 
 """CDS-ILS Importer command lines module."""
+import os
+
 import click
+from flask import current_app
 from flask.cli import with_appcontext
+from invenio_app_ils.documents.api import DOCUMENT_PID_TYPE
 from invenio_app_ils.errors import IlsValidationError
+from invenio_app_ils.series.api import SERIES_PID_TYPE
 from invenio_db import db
 
-from cds_ils.importer.api import import_record, records_logger
+from cds_ils.importer.api import create_promotion_task, import_record, \
+    promote_preview, records_logger, resume_import
+from cds_ils.importer.conversion import convert_file
+from cds_ils.importer.documents.api import put_match_key_mapping, \
+    register_match_key_signals
 from cds_ils.importer.errors import LossyConversion, \
     ProviderNotAllowedDeletion, RecordNotDeletable
 from cds_ils.importer.models import ImporterAgent, ImporterMode, \
     ImporterTaskEntry, ImporterTaskLog
-from cds_ils.importer.parse_xml import get_records_list
+from cds_ils.importer.sources import count_source_records, \
+    get_source_records, get_source_type, open_source
+from cds_ils.literature.identifiers import put_canonical_identifiers_mapping, \
+    register_canonical_identifiers_signals
+from cds_ils.migrator.utils import reindex_pidtype
 
 
 @click.group()
@@ -25,7 +38,9 @@ def importer():
 
 
 @importer.command()
-@click.argument("sources", type=click.File("r"), nargs=-1)
+@click.argument(
+    "sources", type=click.Path(exists=True, dir_okay=False), nargs=-1
+)
 @click.option(
     "--provider",
     "-p",
@@ -41,17 +56,95 @@ def importer():
     help="Choose the mode",
 )
 @with_appcontext
-def import_from_file(sources, provider, mode, source_type="marcxml"):
-    """Import from file command."""
-    import_from_xml(sources, provider, mode, source_type)
+def import_from_file(sources, provider, mode):
+    """Import from MARCXML or converted NDJSON files command."""
+    import_from_xml(sources, provider, mode)
+
+
+@importer.command()
+@click.argument("source", type=click.Path(exists=True, dir_okay=False))
+@click.argument("destination", type=click.Path(dir_okay=False))
+@click.option(
+    "--provider",
+    "-p",
+    required=True,
+    type=click.Choice(["springer", "cds", "ebl", "safari"]),
+    help="Choose the provider",
+)
+@click.option(
+    "--processes",
+    "-j",
+    type=int,
+    default=None,
+    help="Number of conversion processes, the number of CPUs by default",
+)
+@with_appcontext
+def convert(source, destination, provider, processes):
+    """Convert the MARCXML records of a file to a NDJSON file to import."""
+    click.echo("Converting the records of {}...".format(source))
+    count = convert_file(source, destination, provider, processes=processes)
+    click.echo("{} records converted to {}".format(count, destination))
+
+
+@importer.command()
+@click.argument("log_id", type=int)
+@with_appcontext
+def resume(log_id):
+    """Resume an interrupted import task."""
+    click.echo("Resuming import task {}...".format(log_id))
+    resume_import(log_id)
 
 
-def import_from_xml(sources, provider, mode, source_type, eager=True):
-    """Load xml files."""
-    for idx, source in enumerate(sources, 1):
+@importer.command()
+@click.argument("preview_log_id", type=int)
+@with_appcontext
+def promote(preview_log_id):
+    """Import the records of a previewed import task."""
+    log = create_promotion_task(preview_log_id, ImporterAgent.CLI)
+    click.echo("Importing previewed task {} as task {}...".format(
+        preview_log_id, log.id
+    ))
+    promote_preview(preview_log_id, log.id)
+
+
+@importer.command()
+@with_appcontext
+def index_match_keys():
+    """Map and index the match keys of all the documents and series."""
+    click.echo("Mapping the match keys and canonical identifiers...")
+    put_match_key_mapping()
+    if not current_app.config["CDS_ILS_IMPORTER_MATCH_BY_KEY"]:
+        # the match keys are indexed before enabling the matching
+        register_match_key_signals(current_app._get_current_object())
+    put_canonical_identifiers_mapping()
+    if not current_app.config["CDS_ILS_IMPORTER_MATCH_CANONICAL_IDENTIFIERS"]:
+        register_canonical_identifiers_signals(
+            current_app._get_current_object()
+        )
+    reindex_pidtype(DOCUMENT_PID_TYPE)
+    reindex_pidtype(SERIES_PID_TYPE)
+
+
+@importer.command()
+@with_appcontext
+def compact_entries():
+    """Keep only the summary of the records reported by the task entries."""
+    logs = ImporterTaskLog.query.with_entities(ImporterTaskLog.id) \
+        .order_by(ImporterTaskLog.id.asc())
+    for log_id, in logs:
+        click.echo("Compacting the entries of task {}...".format(log_id))
+        for entry in ImporterTaskEntry.query.filter_by(import_id=log_id):
+            entry.compact()
+        db.session.commit()
+
+
+def import_from_xml(sources, provider, mode, eager=True):
+    """Load xml or ndjson files, possibly gzip or zstd compressed."""
+    for idx, source_path in enumerate(sources, 1):
+        source_type = get_source_type(source_path) or "marcxml"
         click.echo(
             "({}/{}) Importing documents in {}...".format(
-                idx, len(sources), source.name
+                idx, len(sources), source_path
             )
         )
         log = ImporterTaskLog.create(dict(
@@ -59,51 +152,55 @@ def import_from_xml(sources, provider, mode, source_type, eager=True):
             provider=provider,
             source_type=source_type,
             mode=ImporterMode.CREATE,  # commands act as create
-            original_filename=source.name,
+            original_filename=os.path.basename(source_path),
+            source_path=os.path.abspath(source_path),
         ))
 
         entry_data = None
         try:
-            records_list = list(get_records_list(source))
-            log.entries_count = len(records_list)
+            log.entries_count = count_source_records(
+                source_path, source_type
+            )
             db.session.commit()
-            for i, record in enumerate(records_list):
-                entry_data = dict(
-                    import_id=log.id,
-                    entry_index=i,
-                )
-                click.secho("Processing record {}".format(i))
+            with open_source(source_path) as source:
+                records = get_source_records(source, source_type)
+                for i, record in enumerate(records):
+                    entry_data = dict(
+                        import_id=log.id,
+                        entry_index=i,
+                    )
+                    click.secho("Processing record {}".format(i))
 
-                try:
-                    report = import_record(
-                        record, provider, mode,
-                        source_type=source_type, eager=True
+                    try:
+                        report = import_record(
+                            record, provider, mode,
+                            source_type=source_type, eager=True
+                        )
+                    except (LossyConversion, RecordNotDeletable,
+                            ProviderNotAllowedDeletion) as e:
+                        click.secho("Failed to import entry", fg="red")
+                        ImporterTaskEntry.create_failure(entry_data, e)
+                        continue
+
+                    click.secho(
+                        "Created: {}\n "
+                        "Updated: "
+                        "{}\n "
+                        "Ambiguous matches {}\n "
+                        "Fuzzy matches {}\n".format(
+                            report["created"],
+                            report["updated"],
+                            report["ambiguous_documents"],
+                            report["fuzzy"],
+                        ),
+                        fg="blue",
                     )
-                except (LossyConversion, RecordNotDeletable,
-                        ProviderNotAllowedDeletion) as e:
-                    click.secho("Failed to import entry", fg="red")
-                    ImporterTaskEntry.create_failure(entry_data, e)
-                    continue
-
-                click.secho(
-                    "Created: {}\n "
-                    "Updated: "
-                    "{}\n "
-                    "Ambiguous matches {}\n "
-                    "Fuzzy matches {}\n".format(
-                        report["created"],
-                        report["updated"],
-                        report["ambiguous_documents"],
-                        report["fuzzy"],
-                    ),
-                    fg="blue",
-                )
-                ImporterTaskEntry.create_success(entry_data, report)
+                    ImporterTaskEntry.create_success(entry_data, report)
 
         except IlsValidationError as e:
             records_logger.error(
                 "@FILE: {0} FATAL: {1}".format(
-                    source.name,
+                    source_path,
                     str(e.original_exception.message),
                 )
             )
@@ -114,7 +211,7 @@ def import_from_xml(sources, provider, mode, source_type, eager=True):
 
         except Exception as e:
             records_logger.error(
-                "@FILE: {0} ERROR: {1}".format(source.name, str(e))
+                "@FILE: {0} ERROR: {1}".format(source_path, str(e))
             )
             if entry_data:
                 ImporterTaskEntry.create_failure(entry_data, e)
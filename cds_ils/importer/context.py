@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer run context module."""
+from contextlib import contextmanager
+
+from invenio_db import db
+
+
+class ImportContext(object):
+    """State shared by the importers of the records of the same run."""
+
+    def __init__(
+        self,
+        identifiers_index=None,
+        fuzzy_index=None,
+        indexing_buffer=None,
+        defer_creations=False,
+        fingerprints=None,
+        unit_of_work=None,
+        series_cache=None,
+    ):
+        """Constructor.
+
+        :param identifiers_index: in-memory identifiers index of the
+                                  documents, when the run was pre-warmed.
+        :param fuzzy_index: in-memory signatures of the documents titles and
+                            authors, when the run was pre-warmed.
+        :param indexing_buffer: buffer deferring the indexing of the imported
+                                records, they are indexed immediately if not
+                                given.
+        :param defer_creations: defer the records which would create new
+                                documents or series, when other runs import
+                                the same file concurrently.
+        :param fingerprints: fingerprints of the records of the provider, to
+                             skip the unchanged ones.
+        :param unit_of_work: unit of work batching the commits of the
+                             records, each record is committed on its own if
+                             not given.
+        :param series_cache: series matched or created by the run.
+        """
+        self.identifiers_index = identifiers_index
+        self.fuzzy_index = fuzzy_index
+        self.indexing_buffer = indexing_buffer
+        self.defer_creations = defer_creations
+        self.fingerprints = fingerprints
+        self.unit_of_work = unit_of_work
+        self.series_cache = series_cache
+
+    @contextmanager
+    def record(self):
+        """Import a record, committing or rolling back its changes.
+
+        In a unit of work, the changes of a failed record are rolled back
+        along with its pending indexing operations, indexed documents and
+        cached series.
+        """
+        if self.unit_of_work is None:
+            try:
+                yield
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return
+
+        indexing_snapshot = None
+        if self.indexing_buffer is not None:
+            indexing_snapshot = self.indexing_buffer.snapshot()
+        journaled = [
+            journal
+            for journal in (
+                self.identifiers_index, self.fuzzy_index, self.series_cache
+            )
+            if journal is not None
+        ]
+        for journal in journaled:
+            journal.begin()
+        try:
+            with self.unit_of_work.record():
+                yield
+        except Exception:
+            if indexing_snapshot is not None:
+                self.indexing_buffer.restore(indexing_snapshot)
+            for journal in journaled:
+                journal.rollback()
+            raise
+        for journal in journaled:
+            journal.commit()
+
+    def flush_series(self):
+        """Store the identifiers merged into the cached series."""
+        if self.series_cache is not None:
+            self.series_cache.flush(
+                indexing_buffer=self.indexing_buffer,
+                unit_of_work=self.unit_of_work,
+            )
+
+    def commit(self):
+        """Commit the records of the unit of work."""
+        if self.unit_of_work is not None:
+            self.unit_of_work.commit()
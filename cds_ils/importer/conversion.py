@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer conversion module.
+
+The conversion of the MARCXML records to JSON is CPU bound: it can be run
+beforehand as a separate stage, in parallel, writing the converted records
+of a file as NDJSON. The NDJSON file is then imported without converting
+the records again, see ``ConvertedRecordDump``.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+from functools import partial
+from itertools import islice
+
+import arrow
+from flask import current_app
+
+from cds_ils.importer.conversion_cache import flush_conversion_cache
+from cds_ils.importer.errors import RecordConversionError
+from cds_ils.importer.fingerprints import compute_fingerprint, \
+    get_provider_recid
+from cds_ils.importer.marc import get_marc_fields
+from cds_ils.importer.models import _format_exception
+from cds_ils.importer.parse_xml import get_records_list
+from cds_ils.importer.registry import current_importer_providers
+from cds_ils.importer.sources import count_source_records, open_source
+from cds_ils.importer.XMLRecordToJson import XMLRecordToJson
+
+
+class ConvertedRecordDump(object):
+    """Handle record dump from a converted record of a NDJSON file.
+
+    Counterpart of ``XMLRecordToJson`` for the records already converted.
+    """
+
+    def __init__(self, data):
+        """Initialize class."""
+        self.data = data
+
+    def dump(self):
+        """Perform record dump, failing as the conversion did."""
+        if self.data.get("error"):
+            raise RecordConversionError(self.data["error"])
+        return (
+            arrow.get(self.data["timestamp"]).datetime,
+            self.data["record"],
+            self.data["deletable"],
+        )
+
+
+def convert_record(marc_fields, provider):
+    """Convert the compact MARC fields of a record with a provider model.
+
+    The fingerprint of the MARC record is kept along the converted one, to
+    skip it when importing if unchanged.
+
+    :returns: the converted record data, with the error message instead of
+              the record if the conversion failed.
+    """
+    dojson_model = current_importer_providers.get(provider).dojson_model
+    data = dict(
+        provider_recid=get_provider_recid(marc_fields),
+        fingerprint=compute_fingerprint(marc_fields, dojson_model),
+    )
+    try:
+        timestamp, json_data, is_deletable = XMLRecordToJson(
+            marc_fields, dojson_model=dojson_model
+        ).dump()
+    except Exception as e:
+        data["error"] = _format_exception(e)
+        return data
+    data.update(
+        timestamp=timestamp.isoformat(),
+        record=json_data,
+        deletable=is_deletable,
+    )
+    return data
+
+
+def _convert_lines(records_fields, provider):
+    """Convert the compact MARC fields of records to NDJSON lines.
+
+    The conversions cached meanwhile are written at the end of the chunk.
+    """
+    lines = [
+        json.dumps(convert_record(marc_fields, provider)) + "\n"
+        for marc_fields in records_fields
+    ]
+    flush_conversion_cache()
+    return lines
+
+
+def _init_worker(app):
+    """Push the application context of the conversion processes."""
+    app.app_context().push()
+
+
+def _batches(iterable, size):
+    """Split an iterable in lists of the given size."""
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def convert_records(records, provider, processes=1):
+    """Generate the NDJSON lines of the converted records, in order.
+
+    The records are converted by a pool of processes if more than one is
+    given, sent to them in batches not to load the whole file in memory.
+    """
+    # compact fields are sent to the processes, not serialized records
+    records_fields = (get_marc_fields(record) for record in records)
+    convert = partial(_convert_lines, provider=provider)
+    chunk_size = current_app.config["CDS_ILS_IMPORTER_CONVERSION_CHUNK_SIZE"]
+    if processes == 1:
+        for chunk in _batches(records_fields, chunk_size):
+            for line in convert(chunk):
+                yield line
+        return
+
+    # the forked processes inherit the loaded application
+    pool = multiprocessing.get_context("fork").Pool(
+        processes,
+        initializer=_init_worker,
+        initargs=(current_app._get_current_object(),),
+    )
+    with pool:
+        chunks = _batches(records_fields, chunk_size)
+        for batch in _batches(chunks, processes * 4):
+            for lines in pool.imap(convert, batch):
+                for line in lines:
+                    yield line
+
+
+def convert_file(
+    source_path, destination_path, provider, processes=None, start=0,
+    stop=None
+):
+    """Convert the MARCXML records of a file to a NDJSON file.
+
+    :param processes: number of conversion processes, the number of CPUs
+                      by default.
+    :param start: index of the first record to convert.
+    :param stop: index after the last record to convert, None for all.
+    :returns: the number of converted records.
+    """
+    processes = processes or os.cpu_count()
+    count = 0
+    with open_source(source_path) as source, \
+            open(destination_path, "w", encoding="utf-8") as destination:
+        records = islice(get_records_list(source), start, stop)
+        for line in convert_records(records, provider, processes):
+            destination.write(line)
+            count += 1
+    return count
+
+
+def get_conversion_shards(source_path, shards_count):
+    """Split a file in ranges of records to be converted in parallel.
+
+    :returns: the list of ``(start, stop)`` record indexes of the shards.
+    """
+    records_count = count_source_records(source_path)
+    shard_size = max(1, -(-records_count // shards_count))  # ceiling
+    return [
+        (start, min(start + shard_size, records_count))
+        for start in range(0, records_count, shard_size)
+    ]
+
+
+def get_shard_path(destination_path, start):
+    """Get the path of the NDJSON file of a conversion shard."""
+    return "{0}.{1}".format(destination_path, start)
+
+
+def merge_converted_shards(shard_paths, destination_path):
+    """Concatenate the NDJSON files of the shards, in order, and drop them."""
+    with open(destination_path, "wb") as destination:
+        for shard_path in shard_paths:
+            with open(shard_path, "rb") as shard:
+                shutil.copyfileobj(shard, destination)
+    for shard_path in shard_paths:
+        os.remove(shard_path)
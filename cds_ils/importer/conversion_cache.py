@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer conversion cache module.
+
+The MARCXML records converted to JSON are kept in a sqlite file, keyed by
+the dojson model, the version of its rules and the MARCXML content, so that
+the records of a re-run import are not converted again. The version of the
+rules is the hash of their source code: changing a rule invalidates the
+cached conversions of its model only.
+"""
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from types import ModuleType
+
+import pkg_resources
+from flask import current_app
+from lxml import etree
+
+from cds_ils.importer.marc import get_marc_fields
+
+CONVERSION_CACHE_EXTENSION = "cds-ils-importer-conversion-cache"
+
+_models_versions = {}
+"""Versions of the dojson models, computed once per process."""
+
+
+def _get_model_modules(dojson_model):
+    """Get the names of the modules defining the rules of a dojson model.
+
+    The modules of the models, of their rules and the ``cds_ils`` modules
+    they use are included.
+    """
+    modules = set()
+    for entry_point in pkg_resources.iter_entry_points(
+        dojson_model.entry_point_models
+    ):
+        model = entry_point.load()
+        if model.index is None:
+            model.build()
+        modules.update(cls.__module__ for cls in type(model).__mro__)
+        if model.entry_point_group:
+            modules.update(
+                rules.module_name
+                for rules in pkg_resources.iter_entry_points(
+                    model.entry_point_group
+                )
+            )
+        modules.update(
+            creator.__module__ for _, (_, creator) in model.rules
+        )
+    # the helpers used by the rules
+    for name in list(modules):
+        for value in vars(sys.modules[name]).values():
+            if isinstance(value, ModuleType):
+                modules.add(value.__name__)
+            elif inspect.isfunction(value) or inspect.isclass(value):
+                modules.add(value.__module__)
+    return sorted(name for name in modules if name.startswith("cds_ils."))
+
+
+def get_model_version(dojson_model):
+    """Hash the source of the rules of a dojson model."""
+    namespace = dojson_model.entry_point_models
+    if namespace not in _models_versions:
+        version = hashlib.sha256()
+        for distribution in ("dojson", "cds-dojson"):
+            version.update(
+                pkg_resources.get_distribution(distribution).version.encode()
+            )
+        for name in _get_model_modules(dojson_model):
+            version.update(name.encode("utf-8"))
+            source_path = inspect.getsourcefile(sys.modules[name])
+            if source_path:
+                with open(source_path, "rb") as source:
+                    version.update(source.read())
+        _models_versions[namespace] = version.hexdigest()
+    return _models_versions[namespace]
+
+
+def get_marc_checksum(marcxml):
+    """Hash a MARC record, serialized, parsed or as compact fields."""
+    if etree.iselement(marcxml):
+        marcxml = get_marc_fields(marcxml)
+    if isinstance(marcxml, str):
+        marcxml = marcxml.encode("utf-8")
+    elif not isinstance(marcxml, bytes):
+        marcxml = json.dumps(marcxml).encode("utf-8")
+    return hashlib.sha256(marcxml).hexdigest()
+
+
+class ConversionCache(object):
+    """Size bounded cache of the converted records, in a sqlite file.
+
+    The least recently used conversions are evicted when the size of the
+    stored conversions exceeds the maximum size. The cache can be shared by
+    processes, each one opening its own connection.
+
+    Reading a conversion does not write to the file: the new conversions and
+    the access times of the read ones are kept in memory and written in a
+    single transaction per batch, when the batch is full or flushed.
+    """
+
+    def __init__(self, path, max_size, batch_size=100):
+        """Constructor.
+
+        :param max_size: maximum number of bytes of the stored conversions.
+        :param batch_size: number of new conversions and accesses written
+                           at once.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self._connection = None
+        self._pid = None
+        self._size = None
+        # {key: (value, access time)}
+        self._pending = {}
+        # {key: access time}
+        self._accessed = {}
+
+    @property
+    def connection(self):
+        """Connection of the current process to the cache file."""
+        if self._pid != os.getpid():
+            # not shared with the forked processes, nor their pending writes
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._pid = os.getpid()
+            self._pending = {}
+            self._accessed = {}
+            with self._connection:
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS conversions ("
+                    "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                    "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+                )
+                self._connection.execute(
+                    "CREATE INDEX IF NOT EXISTS conversions_accessed "
+                    "ON conversions (accessed)"
+                )
+            # the WAL is not synced on each commit, a crash can lose the
+            # last cached conversions only
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._size = None
+        return self._connection
+
+    @staticmethod
+    def get_key(dojson_model, marcxml):
+        """Get the key of the conversion of a record by a dojson model."""
+        return hashlib.sha256(
+            "{0}:{1}:{2}".format(
+                dojson_model.entry_point_models,
+                get_model_version(dojson_model),
+                get_marc_checksum(marcxml),
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key):
+        """Get a cached conversion.
+
+        :returns: the converted record and its deletable flag, or None.
+        """
+        connection = self.connection
+        if key in self._pending:
+            value = self._pending[key][0]
+        else:
+            row = connection.execute(
+                "SELECT value FROM conversions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value = row[0]
+            self._accessed[key] = time.time()
+            self._flush_full_batch()
+        value = json.loads(zlib.decompress(value).decode("utf-8"))
+        return value["record"], value["deletable"]
+
+    def set(self, key, record, is_deletable=None):
+        """Cache the conversion of a record, written with its batch."""
+        value = zlib.compress(json.dumps(
+            dict(record=record, deletable=is_deletable)
+        ).encode("utf-8"))
+        # connected first, dropping the batch inherited from a parent process
+        self.connection
+        self._pending[key] = (value, time.time())
+        self._flush_full_batch()
+
+    def _flush_full_batch(self):
+        """Write the pending batch once full."""
+        if len(self._pending) + len(self._accessed) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the pending conversions and accesses, evicting if full."""
+        connection = self.connection
+        if not (self._pending or self._accessed):
+            return
+        with connection:
+            if self._size is None:
+                self._size = connection.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM conversions"
+                ).fetchone()[0]
+            connection.executemany(
+                "INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?)",
+                [
+                    (key, value, len(value), accessed)
+                    for key, (value, accessed) in self._pending.items()
+                ],
+            )
+            connection.executemany(
+                "UPDATE conversions SET accessed = ? WHERE key = ?",
+                [
+                    (accessed, key)
+                    for key, accessed in self._accessed.items()
+                ],
+            )
+            self._size += sum(
+                len(value) for value, _ in self._pending.values()
+            )
+            self._pending = {}
+            self._accessed = {}
+            if self._size > self.max_size:
+                self._evict(connection)
+
+    def _evict(self, connection):
+        """Delete the least recently used conversions, down to 90%."""
+        target = self.max_size * 0.9
+        evicted = []
+        size = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM conversions"
+        ).fetchone()[0]
+        rows = connection.execute(
+            "SELECT key, size FROM conversions ORDER BY accessed ASC"
+        )
+        for key, row_size in rows:
+            if size <= target:
+                break
+            evicted.append((key,))
+            size -= row_size
+        connection.executemany(
+            "DELETE FROM conversions WHERE key = ?", evicted
+        )
+        self._size = size
+
+
+def get_conversion_cache():
+    """Get the conversion cache of the application, if configured."""
+    path = current_app.config["CDS_ILS_IMPORTER_CONVERSION_CACHE_PATH"]
+    if not path:
+        return None
+    caches = current_app.extensions.setdefault(
+        CONVERSION_CACHE_EXTENSION, {}
+    )
+    if path not in caches:
+        config = current_app.config
+        caches[path] = ConversionCache(
+            path,
+            config["CDS_ILS_IMPORTER_CONVERSION_CACHE_MAX_SIZE"],
+            config["CDS_ILS_IMPORTER_CONVERSION_CACHE_BATCH_SIZE"],
+        )
+    return caches[path]
+
+
+def flush_conversion_cache():
+    """Write the pending conversions of the application cache, if any."""
+    cache = get_conversion_cache()
+    if cache is not None:
+        cache.flush()
@@ -6,12 +6,106 @@
 # the terms of the MIT License; see LICENSE file for more details.
 
 """CDS-ILS Importer module."""
+import re
+import unicodedata
+
 import click
-from elasticsearch_dsl import Q
+from elasticsearch_dsl import MultiSearch, Q
 from elasticsearch_dsl.query import Match
+from flask import current_app
+from invenio_app_ils.documents.api import DOCUMENT_PID_TYPE
 from invenio_app_ils.proxies import current_app_ils
+from invenio_db import db
+from invenio_indexer.signals import before_record_index
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_search import current_search_client
+from invenio_search.utils import build_alias_name
 
 from cds_ils.importer.errors import DocumentImportError
+from cds_ils.literature.identifiers import CANONICAL_IDENTIFIERS_FIELD, \
+    get_canonical_identifier
+from cds_ils.search import is_keyword_field
+
+MATCH_KEY_FIELD = "match_key"
+"""Keyword field of the documents storing their normalized match key."""
+
+NON_ALPHANUMERIC = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_text(text):
+    """Casefold a text, stripping its diacritics and punctuation."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return NON_ALPHANUMERIC.sub(" ", text.casefold()).strip()
+
+
+def get_author_surname(full_name):
+    """Get the surname of a "Surname, Name" or "Name Surname" author."""
+    if "," in full_name:
+        return full_name.split(",", 1)[0]
+    names = full_name.split()
+    return names[-1] if names else ""
+
+
+def get_match_key(title, subtitle=None, authors=()):
+    """Build the normalized match key of a title and its authors."""
+    surnames = sorted(
+        normalize_text(get_author_surname(author)) for author in authors
+    )
+    values = [normalize_text(title), normalize_text(subtitle)] + surnames
+    return " ".join(value for value in values if value)
+
+
+def get_document_match_key(document):
+    """Build the match key of a document, if it has a title."""
+    title = document.get("title")
+    if not title:
+        return None
+    subtitles = [
+        alt_title["value"]
+        for alt_title in document.get("alternative_titles", [])
+        if alt_title.get("type") == "SUBTITLE"
+    ]
+    authors = [
+        author.get("full_name", "") for author in document.get("authors", [])
+    ]
+    return get_match_key(
+        title, subtitle=subtitles[0] if subtitles else None, authors=authors
+    )
+
+
+def index_document_match_key(
+    sender, json=None, record=None, index=None, **kwargs
+):
+    """Add the match key to a document before indexing it.
+
+    The match key is only added once mapped as a keyword, so that it is not
+    mapped dynamically as a text field.
+    """
+    if not is_keyword_field(index, MATCH_KEY_FIELD):
+        return
+    match_key = get_document_match_key(json)
+    if match_key:
+        json[MATCH_KEY_FIELD] = match_key
+
+
+def register_match_key_signals(app):
+    """Index the match key of the documents."""
+    before_record_index.dynamic_connect(
+        index_document_match_key,
+        sender=app,
+        weak=False,
+        index="documents-document-v1.0.0",
+    )
+
+
+def put_match_key_mapping():
+    """Map the match key of the documents as a keyword."""
+    document_search = current_app_ils.document_search_cls()
+    current_search_client.indices.put_mapping(
+        index=build_alias_name(document_search.Meta.index),
+        body={"properties": {MATCH_KEY_FIELD: {"type": "keyword"}}},
+    )
 
 
 def check_search_results(
@@ -80,6 +174,28 @@ def search_documents_by_doi(doi):
     return search
 
 
+def search_documents_by_identifiers(scheme, values):
+    """Find documents matching any of the identifiers of a given scheme."""
+    document_search = current_app_ils.document_search_cls()
+    search = document_search.query(
+        "bool",
+        must=[
+            Q("term", identifiers__scheme=scheme),
+            Q("terms", identifiers__value=values),
+        ],
+    )
+    return search
+
+
+def search_documents_by_canonical_identifiers(scheme, values):
+    """Find documents having any of the identifiers, in canonical form."""
+    document_search = current_app_ils.document_search_cls()
+    terms = [get_canonical_identifier(scheme, value) for value in values]
+    return document_search.filter(
+        Q("terms", **{CANONICAL_IDENTIFIERS_FIELD: terms})
+    )
+
+
 def search_document_by_title_authors(title, authors, subtitle=None):
     """Find document by title and authors."""
     document_search = current_app_ils.document_search_cls()
@@ -97,6 +213,12 @@ def search_document_by_title_authors(title, authors, subtitle=None):
     return search
 
 
+def search_documents_by_match_key(match_key):
+    """Find documents by their exact match key."""
+    document_search = current_app_ils.document_search_cls()
+    return document_search.filter(Q("term", **{MATCH_KEY_FIELD: match_key}))
+
+
 def fuzzy_search_document(title, authors):
     """Search fuzzy matches of document and title."""
     # check the fuzzy search options under:
@@ -122,6 +244,23 @@ def fuzzy_search_document(title, authors):
     return search
 
 
+def multi_search_documents_pids(searches):
+    """Execute the searches in a single request and return the hits pids.
+
+    Each search is limited to the configured maximum number of hits.
+    """
+    if not searches:
+        return []
+    max_hits = current_app.config["CDS_ILS_IMPORTER_MATCHING_MAX_HITS"]
+    multi_search = MultiSearch(using=current_search_client)
+    for search in searches:
+        multi_search = multi_search.add(
+            search.source(["pid"])[:max_hits]
+        )
+    responses = multi_search.execute()
+    return [[hit.pid for hit in response] for response in responses]
+
+
 def get_document_by_legacy_recid(legacy_recid):
     """Search documents by its legacy recid."""
     document_search = current_app_ils.document_search_cls()
@@ -135,3 +274,19 @@ def get_document_by_legacy_recid(legacy_recid):
 
     if hits_total == 1:
         return document_cls.get_record_by_pid(result.hits[0].pid)
+
+
+def get_existing_documents_pids(pids):
+    """Get which of the given documents pids are still registered."""
+    if not pids:
+        return set()
+    return set(
+        pid_value
+        for pid_value, in db.session.query(
+            PersistentIdentifier.pid_value
+        ).filter(
+            PersistentIdentifier.pid_type == DOCUMENT_PID_TYPE,
+            PersistentIdentifier.pid_value.in_(set(pids)),
+            PersistentIdentifier.status == PIDStatus.REGISTERED,
+        )
+    )
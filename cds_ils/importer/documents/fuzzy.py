@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer documents fuzzy matching index."""
+import zlib
+
+from invenio_app_ils.proxies import current_app_ils
+
+from cds_ils.importer.documents.api import normalize_text
+
+
+def get_fuzzy_key(title, authors):
+    """Build the normalized key of a title and its authors."""
+    return " ".join(
+        normalize_text(value) for value in [title] + list(authors)
+    ).strip()
+
+
+class DocumentFuzzyIndex(object):
+    """In-memory MinHash signatures of the document titles and authors.
+
+    The key of each document is split in character n-grams, hashed once
+    and distributed in ``BINS`` bins keeping the minimum hash of each bin
+    (one permutation MinHash). Documents sharing all the bins of one of the
+    bands of their signatures are candidates, ranked by the estimated
+    similarity of their keys.
+
+    Like the identifiers index, it lives for a single import run and is kept
+    up to date with the documents created or updated by the run, only
+    holding them when it is not filled from the search index.
+    """
+
+    NGRAM_SIZE = 3
+    BINS = 32
+    ROWS_PER_BAND = 2
+
+    def __init__(self, threshold=0.6, max_hits=100, complete=False):
+        """Constructor.
+
+        :param threshold: minimum estimated similarity of the candidates.
+        :param max_hits: maximum number of candidates returned.
+        :param complete: whether all the documents are indexed.
+        """
+        self.complete = complete
+        self.threshold = threshold
+        self.max_hits = max_hits
+        # {pid: signature}
+        self._signatures = {}
+        # {(band, hashes): [pids]}
+        self._buckets = {}
+        # functions undoing the changes, while journaling
+        self._journal = None
+
+    @classmethod
+    def build(cls, **kwargs):
+        """Build the index scanning the documents once."""
+        fuzzy_index = cls(complete=True, **kwargs)
+        document_search = current_app_ils.document_search_cls()
+        search = document_search.source(["pid", "title", "authors"])
+        for hit in search.scan():
+            fuzzy_index.add(hit.to_dict())
+        return fuzzy_index
+
+    @classmethod
+    def get_signature(cls, key):
+        """Compute the MinHash signature of a key."""
+        padded = " {} ".format(key)
+        signature = [None] * cls.BINS
+        for i in range(max(len(padded) - cls.NGRAM_SIZE + 1, 1)):
+            ngram = padded[i:i + cls.NGRAM_SIZE]
+            ngram_hash = zlib.crc32(ngram.encode("utf-8"))
+            position, value = ngram_hash % cls.BINS, ngram_hash // cls.BINS
+            if signature[position] is None or value < signature[position]:
+                signature[position] = value
+        return tuple(signature)
+
+    @classmethod
+    def get_bands(cls, signature):
+        """Split a signature in bands, skipping the ones with empty bins."""
+        for start in range(0, cls.BINS, cls.ROWS_PER_BAND):
+            band = signature[start:start + cls.ROWS_PER_BAND]
+            if None not in band:
+                yield start, band
+
+    @staticmethod
+    def get_similarity(signature, other):
+        """Estimate the similarity of the keys of two signatures."""
+        bins = [
+            (value, other_value)
+            for value, other_value in zip(signature, other)
+            if value is not None or other_value is not None
+        ]
+        if not bins:
+            return 0.0
+        equal = sum(1 for value, other_value in bins if value == other_value)
+        return equal / len(bins)
+
+    def add(self, document):
+        """Index the title and authors of a document."""
+        title = document.get("title")
+        if not title:
+            return
+        authors = [
+            author.get("full_name", "")
+            for author in document.get("authors", [])
+        ]
+        pid = document["pid"]
+        signature = self.get_signature(get_fuzzy_key(title, authors))
+        previous = self._signatures.get(pid)
+        if previous == signature:
+            return
+        self._undo(self._set_signature, pid, previous)
+        self._signatures[pid] = signature
+        # the buckets of a previous signature are kept, its pid is ranked
+        # with the new signature anyway
+        for band in self.get_bands(signature):
+            bucket = self._buckets.setdefault(band, [])
+            if pid not in bucket:
+                bucket.append(pid)
+                self._undo(bucket.remove, pid)
+
+    def _set_signature(self, pid, signature):
+        """Restore the signature of a document."""
+        if signature is None:
+            self._signatures.pop(pid, None)
+        else:
+            self._signatures[pid] = signature
+
+    def _undo(self, function, *args):
+        """Record how to undo a change."""
+        if self._journal is not None:
+            self._journal.append((function, args))
+
+    def begin(self):
+        """Start recording the changes, to be able to undo them."""
+        self._journal = []
+
+    def commit(self):
+        """Keep the recorded changes."""
+        self._journal = None
+
+    def rollback(self):
+        """Undo the changes recorded since ``begin``."""
+        for function, args in reversed(self._journal):
+            function(*args)
+        self._journal = None
+
+    def search(self, title, authors):
+        """Return the candidates ranked by similarity.
+
+        :returns: list of ``(pid, score)`` pairs, the most similar first.
+        """
+        signature = self.get_signature(get_fuzzy_key(title, authors))
+        candidates = set()
+        for band in self.get_bands(signature):
+            candidates.update(self._buckets.get(band, ()))
+        scored = []
+        for pid in candidates:
+            score = self.get_similarity(signature, self._signatures[pid])
+            if score >= self.threshold:
+                scored.append((pid, score))
+        scored.sort(key=lambda candidate: (-candidate[1], candidate[0]))
+        return scored[:self.max_hits]
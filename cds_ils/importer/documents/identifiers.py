@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer documents identifiers index."""
+from elasticsearch_dsl import Q
+from invenio_app_ils.proxies import current_app_ils
+
+from cds_ils.literature.identifiers import get_canonical_value
+
+
+class DocumentIdentifiersIndex(object):
+    """In-memory map of the document identifiers to the documents pids.
+
+    It is meant to live for a single import run: it is filled once from the
+    search index and then kept up to date with the documents created or
+    updated by the run, which are found even before the search index is
+    refreshed. The ISBN are indexed and searched in their canonical form.
+
+    When it is not filled from the search index, it only holds the documents
+    of the run and complements the searches of the other documents.
+    """
+
+    SCHEMES = ("ISBN", "DOI")
+
+    def __init__(self, complete=False):
+        """Constructor.
+
+        :param complete: whether all the documents are indexed.
+        """
+        self.complete = complete
+        # {scheme: {value: pid or tuple of pids}}
+        self._index = {scheme: {} for scheme in self.SCHEMES}
+        # previous values of the changed entries, while journaling
+        self._journal = None
+
+    @classmethod
+    def build(cls):
+        """Build the index scanning the documents once."""
+        identifiers_index = cls(complete=True)
+        document_search = current_app_ils.document_search_cls()
+        search = document_search.filter(
+            Q("terms", identifiers__scheme=list(cls.SCHEMES))
+        ).source(["pid", "identifiers"])
+        for hit in search.scan():
+            identifiers_index.add(hit.to_dict())
+        return identifiers_index
+
+    def add(self, document):
+        """Index the identifiers of a document."""
+        pid = document["pid"]
+        for identifier in document.get("identifiers", []):
+            values = self._index.get(identifier["scheme"])
+            if values is None:
+                continue
+            value = get_canonical_value(
+                identifier["scheme"], identifier["value"]
+            )
+            pids = values.get(value)
+            if self._journal is not None:
+                self._journal.append((values, value, pids))
+            if pids is None:
+                values[value] = pid
+            elif isinstance(pids, tuple):
+                if pid not in pids:
+                    values[value] = pids + (pid,)
+            elif pids != pid:
+                values[value] = (pids, pid)
+
+    def begin(self):
+        """Start recording the changes, to be able to undo them."""
+        self._journal = []
+
+    def commit(self):
+        """Keep the recorded changes."""
+        self._journal = None
+
+    def rollback(self):
+        """Undo the changes recorded since ``begin``."""
+        for values, value, pids in reversed(self._journal):
+            if pids is None:
+                del values[value]
+            else:
+                values[value] = pids
+        self._journal = None
+
+    def search(self, scheme, values):
+        """Return the pids of the documents having one of the identifiers."""
+        matches = []
+        indexed_values = self._index[scheme]
+        for value in values:
+            value = get_canonical_value(scheme, value)
+            pids = indexed_values.get(value, ())
+            if not isinstance(pids, tuple):
+                pids = (pids,)
+            matches += [pid for pid in pids if pid not in matches]
+        return matches
@@ -7,17 +7,20 @@
 
 """CDS-ILS Importer documents module."""
 import uuid
-from copy import deepcopy
 
 import click
+from flask import current_app
 from invenio_app_ils.documents.api import DocumentIdProvider
 from invenio_app_ils.errors import IlsValidationError
 from invenio_app_ils.proxies import current_app_ils
 from invenio_db import db
 
 from cds_ils.importer.documents.api import fuzzy_search_document, \
-    search_document_by_title_authors, search_documents_by_doi, \
-    search_documents_by_isbn
+    get_existing_documents_pids, get_match_key, multi_search_documents_pids, \
+    search_document_by_title_authors, \
+    search_documents_by_canonical_identifiers, \
+    search_documents_by_identifiers, search_documents_by_match_key
+from cds_ils.importer.transactions import commit, rollback, savepoint
 
 
 class DocumentImporter(object):
@@ -29,12 +32,23 @@ class DocumentImporter(object):
         helper_metadata_fields,
         metadata_provider,
         update_document_fields,
+        identifiers_index=None,
+        fuzzy_index=None,
+        unit_of_work=None,
     ):
         """Constructor."""
         self.helper_metadata_fields = helper_metadata_fields
         self.json_data = json_metadata
         self.metadata_provider = metadata_provider
         self.update_document_fields = update_document_fields
+        self.identifiers_index = identifiers_index
+        self.fuzzy_index = fuzzy_index
+        self.unit_of_work = unit_of_work
+        # exact and fuzzy matching pids, precomputed or lazily searched
+        self.matches = None
+        # fuzzy matching pids found when the record was previewed
+        self.previewed_fuzzy_matches = None
+        self.unchanged = False
 
     def _set_record_import_source(self, record_dict):
         """Set the import source for document."""
@@ -45,10 +59,12 @@ class DocumentImporter(object):
 
     def _before_create(self):
         """Perform before create metadata modification."""
-        cleaned = deepcopy(self.json_data)
-        for field in self.helper_metadata_fields:
-            if field in cleaned:
-                del cleaned[field]
+        # the helper fields are left out, the others are shared not copied
+        cleaned = {
+            field: value
+            for field, value in self.json_data.items()
+            if field not in self.helper_metadata_fields
+        }
         # save the import source
         self._set_record_import_source(cleaned)
         return cleaned
@@ -68,14 +84,26 @@ class DocumentImporter(object):
                 )
                 cleaned_json["pid"] = provider.pid.pid_value
                 document = document_class.create(cleaned_json, record_uuid)
-            db.session.commit()
+            commit(self.unit_of_work)
+            self._index_document(document)
             return document
         except IlsValidationError as e:
             click.secho("Field: {}".format(e.errors[0].res["field"]), fg="red")
             click.secho(e.original_exception.message, fg="red")
-            db.session.rollback()
+            rollback(self.unit_of_work)
             # raise e TODO handle the incorrect records in the logging
 
+    def _index_document(self, document):
+        """Keep the run indexes up to date with a stored document."""
+        if self.identifiers_index is not None:
+            self.identifiers_index.add(document)
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.add(document)
+
+    def preview_document(self):
+        """Return the document that would be created."""
+        return self._before_create()
+
     def _update_field_identifiers(self, matched_document):
         """Update isbns of a given document."""
         existing_identifiers = matched_document["identifiers"]
@@ -88,52 +116,83 @@ class DocumentImporter(object):
         return existing_identifiers + new_identifiers
 
     def update_document(self, matched_document):
-        """Update document record."""
+        """Update document record, unless nothing changed."""
+        updated_fields = {}
         for field in self.update_document_fields:
             update_field_method = getattr(
                 self, "_update_field_{}".format(field), None
             )
             if update_field_method:
-                matched_document[field] = update_field_method(matched_document)
+                updated_fields[field] = update_field_method(matched_document)
             else:
-                matched_document[field] = self.json_data[field]
+                updated_fields[field] = self.json_data[field]
+
+        # avoid a new revision, and its reindexing, when nothing changed
+        self.unchanged = all(
+            matched_document.get(field) == value
+            for field, value in updated_fields.items()
+        )
+        if self.unchanged:
+            return
+        matched_document.update(updated_fields)
 
         try:
-            matched_document.commit()
-            db.session.commit()
+            with savepoint(self.unit_of_work):
+                matched_document.commit()
+            commit(self.unit_of_work)
+            self._index_document(matched_document)
         except IlsValidationError as e:
             click.secho("Field: {}".format(e.errors[0].res["field"]), fg="red")
             click.secho(e.original_exception.message, fg="red")
-            db.session.rollback()
+            rollback(self.unit_of_work)
 
-    def search_for_matching_documents(self):
-        """Find matching documents."""
-        isbn_list = [
+    def _get_identifiers(self, scheme):
+        """Get the identifiers values of the record for a given scheme."""
+        return [
             identifier["value"]
             for identifier in self.json_data.get("identifiers", [])
-            if identifier["scheme"] == "ISBN"
+            if identifier["scheme"] == scheme
         ]
 
-        doi_list = [
-            identifier["value"]
-            for identifier in self.json_data.get("identifiers", [])
-            if identifier["scheme"] == "DOI"
-        ]
+    def _search_identifiers_index(self):
+        """Find the documents matching the identifiers in the run index."""
+        if self.identifiers_index is None:
+            return []
+        # check by isbn first, then by doi
+        return self.identifiers_index.search(
+            "ISBN", self._get_identifiers("ISBN")
+        ) + self.identifiers_index.search("DOI", self._get_identifiers("DOI"))
 
-        matches = []
+    def _get_exact_match_searches(self):
+        """Build the searches of documents exactly matching the record."""
+        searches = []
 
-        # check by isbn first
-        for isbn in isbn_list:
-            search = search_documents_by_isbn(isbn)
-            results = search.scan()
-            matches += [x.pid for x in results if x.pid not in matches]
+        # identifiers are matched in memory when all the documents are in
+        # the run index
+        if self.identifiers_index is None \
+                or not self.identifiers_index.complete:
+            isbn_list = self._get_identifiers("ISBN")
+            doi_list = self._get_identifiers("DOI")
 
-        # check by doi
+            # check by isbn first
+            if isbn_list and current_app.config[
+                "CDS_ILS_IMPORTER_MATCH_CANONICAL_IDENTIFIERS"
+            ]:
+                searches.append(
+                    search_documents_by_canonical_identifiers(
+                        "ISBN", isbn_list
+                    )
+                )
+            elif isbn_list:
+                searches.append(
+                    search_documents_by_identifiers("ISBN", isbn_list)
+                )
 
-        for doi in doi_list:
-            search = search_documents_by_doi(doi)
-            results = search.scan()
-            matches += [x.pid for x in results if x.pid not in matches]
+            # check by doi
+            if doi_list:
+                searches.append(
+                    search_documents_by_identifiers("DOI", doi_list)
+                )
 
         is_part_of_serial = self.json_data.get("_serial", None)
         title = self.json_data.get("title", None)
@@ -153,25 +212,122 @@ class DocumentImporter(object):
             if subtitle_obj:
                 subtitle = subtitle_obj[0]["value"]
 
-            search = search_document_by_title_authors(
-                title, authors, subtitle=subtitle
-            )
-            results = search.scan()
-            matches += [x.pid for x in results if x.pid not in matches]
+            if current_app.config["CDS_ILS_IMPORTER_MATCH_BY_KEY"]:
+                match_key = get_match_key(
+                    title, subtitle=subtitle, authors=authors
+                )
+                searches.append(search_documents_by_match_key(match_key))
+            else:
+                searches.append(
+                    search_document_by_title_authors(
+                        title, authors, subtitle=subtitle
+                    )
+                )
 
-        return matches
+        return searches
 
-    def fuzzy_match_documents(self):
-        """Fuzzy search documents."""
+    def _get_fuzzy_match_fields(self):
+        """Get the title and authors to fuzzy match, if any."""
         is_part_of_serial = self.json_data.get("_serial", None)
         title = self.json_data.get("title", None)
 
         if is_part_of_serial or not title:
-            return []
+            return None
         authors = [
             author["full_name"] for author in self.json_data.get("authors", [])
         ]
+        return title, authors
+
+    def _search_fuzzy_index(self):
+        """Find the documents fuzzy matching the record in the run index."""
+        fields = self._get_fuzzy_match_fields()
+        if self.fuzzy_index is None or fields is None:
+            return []
+        return [pid for pid, score in self.fuzzy_index.search(*fields)]
+
+    def _get_fuzzy_match_search(self):
+        """Build the search of documents fuzzy matching the record."""
+        fields = self._get_fuzzy_match_fields()
+        if fields is None:
+            return None
+        # fuzzy matched in memory when all the documents are in the run index
+        if self.fuzzy_index is not None and self.fuzzy_index.complete \
+                and not current_app.config[
+                    "CDS_ILS_IMPORTER_FUZZY_SEARCH_FALLBACK"
+                ]:
+            return None
+        return fuzzy_search_document(*fields)
+
+    @classmethod
+    def match_documents(cls, document_importers):
+        """Precompute the matches of many records in a single request.
+
+        All the exact and fuzzy searches of the given importers are packed
+        in one multi search, and each importer keeps its own results.
+        The fuzzy matches of the previewed records are not searched again,
+        only the ones of the documents which still exist are kept.
+        """
+        searches = []
+        slices = []
+        previewed_pids = []
+        for document_importer in document_importers:
+            exact_searches = document_importer._get_exact_match_searches()
+            fuzzy_searches = []
+            if document_importer.previewed_fuzzy_matches is None:
+                fuzzy_search = document_importer._get_fuzzy_match_search()
+                fuzzy_searches = [fuzzy_search] if fuzzy_search else []
+            else:
+                previewed_pids += document_importer.previewed_fuzzy_matches
+            slices.append((len(exact_searches), len(fuzzy_searches)))
+            searches += exact_searches + fuzzy_searches
+
+        results = multi_search_documents_pids(searches)
+        existing_pids = get_existing_documents_pids(previewed_pids)
+
+        position = 0
+        for document_importer, (exact_count, fuzzy_count) in zip(
+            document_importers, slices
+        ):
+            exact_results = results[position:position + exact_count]
+            position += exact_count
+            fuzzy_results = results[position:position + fuzzy_count]
+            position += fuzzy_count
+            if document_importer.previewed_fuzzy_matches is not None:
+                fuzzy_results = [[
+                    pid for pid in document_importer.previewed_fuzzy_matches
+                    if pid in existing_pids
+                ]]
+            document_importer.matches = (
+                _unique_pids(exact_results),
+                _unique_pids(fuzzy_results),
+            )
+
+    def search_for_matching_documents(self):
+        """Find matching documents."""
+        if self.matches is None:
+            self.match_documents([self])
+        exact_matches, _ = self.matches
+        # the run index is checked now, to see the documents created by
+        # the previous records of the same run
+        return _unique_pids([self._search_identifiers_index(), exact_matches])
+
+    def fuzzy_match_documents(self):
+        """Fuzzy search documents."""
+        if self.matches is None:
+            self.match_documents([self])
+        _, fuzzy_matches = self.matches
+        # the run index is checked now, to see the documents created by
+        # the previous records of the same run, and searched matches are
+        # only a fallback when it holds all the documents
+        index_matches = self._search_fuzzy_index()
+        if self.fuzzy_index is not None and self.fuzzy_index.complete:
+            return index_matches or fuzzy_matches
+        return _unique_pids([index_matches, fuzzy_matches])
 
-        fuzzy_results = fuzzy_search_document(title, authors).scan()
 
-        return fuzzy_results
+def _unique_pids(results):
+    """Merge lists of pids keeping the first occurrence order."""
+    pids = []
+    for result in results:
+        pids += [pid for pid in result if pid not in pids]
+    return pids
@@ -10,13 +10,15 @@
 import uuid
 
 import click
-from flask import current_app
-from invenio_app_ils.eitems.api import EItemIdProvider
+from invenio_app_ils.eitems.api import EITEM_PID_TYPE, EItemIdProvider
 from invenio_app_ils.errors import IlsValidationError
 from invenio_app_ils.proxies import current_app_ils
 from invenio_db import db
 
 from cds_ils.importer.eitems.api import get_eitems_for_document_by_provider
+from cds_ils.importer.indexer import delete_record_index
+from cds_ils.importer.registry import current_importer_providers
+from cds_ils.importer.transactions import commit, rollback, savepoint
 
 
 class EItemImporter(object):
@@ -30,6 +32,8 @@ class EItemImporter(object):
         provider_priority_sensitive,
         open_access,
         login_required,
+        indexing_buffer=None,
+        unit_of_work=None,
     ):
         """Constructor."""
         self.json_data = json_metadata
@@ -38,9 +42,12 @@ class EItemImporter(object):
         self.is_provider_priority_sensitive = provider_priority_sensitive
         self.open_access = open_access
         self.login_required = login_required
+        self.indexing_buffer = indexing_buffer
+        self.unit_of_work = unit_of_work
 
         self.created = None
         self.updated = None
+        self.matched = None
         self.ambiguous_list = []
         self.deleted_list = []
 
@@ -64,9 +71,9 @@ class EItemImporter(object):
         if not existing_provider:
             return False
 
-        existing_priority = current_app.config["CDS_ILS_IMPORTER_PROVIDERS"][
+        existing_priority = current_importer_providers.get(
             existing_provider
-        ]["priority"]
+        ).priority
 
         # existing_priority = 0, self.priority = 1, returns False
         return existing_priority > self.current_provider_priority
@@ -74,30 +81,69 @@ class EItemImporter(object):
     def _update_existing_record(self, existing_eitem, matched_document):
         metadata_to_update = {}
         self._build_eitem_dict(metadata_to_update, matched_document["pid"])
+        # avoid a new revision, and its reindexing, when nothing changed
+        if all(
+            existing_eitem.get(field) == value
+            for field, value in metadata_to_update.items()
+        ):
+            return None
         try:
-            existing_eitem.update(metadata_to_update)
-            existing_eitem.commit()
-            db.session.commit()
+            with savepoint(self.unit_of_work):
+                existing_eitem.update(metadata_to_update)
+                existing_eitem.commit()
+            commit(self.unit_of_work)
             return existing_eitem
         except IlsValidationError as e:
-            db.session.rollback()
+            rollback(self.unit_of_work)
             click.secho("Field: {}".format(e.errors[0].res["field"]), fg="red")
             click.secho(e.original_exception.message, fg="red")
 
     def _delete_existing_record(self, existing_eitem):
         eitem_indexer = current_app_ils.eitem_indexer
-        existing_eitem.delete(force=True)
-        db.session.commit()
-        eitem_indexer.delete(existing_eitem)
+        with savepoint(self.unit_of_work):
+            existing_eitem.delete(force=True)
+        commit(self.unit_of_work)
+        delete_record_index(
+            eitem_indexer, existing_eitem, self.indexing_buffer
+        )
         return existing_eitem
 
-    def _report_ambiguous_records(self, multiple_results):
+    def _report_ambiguous_records(self, pids):
         eitem_cls = current_app_ils.eitem_record_cls
 
-        for hit in multiple_results:
-            existing_eitem = eitem_cls.get_record_by_pid(hit["pid"])
+        for pid in pids:
+            existing_eitem = eitem_cls.get_record_by_pid(pid)
             self.ambiguous_list.append(existing_eitem)
 
+    def _get_provider_eitems_pids(self, document_pid):
+        """Get the pids of the eitems of the provider for a document.
+
+        The eitems created by the run and not indexed yet are included.
+        """
+        search = get_eitems_for_document_by_provider(
+            document_pid, self.metadata_provider
+        )
+        pids = [hit["pid"] for hit in search.scan()]
+        if self.indexing_buffer is not None:
+            pending_eitems = self.indexing_buffer.get_pending_records(
+                EITEM_PID_TYPE
+            )
+            pids += [
+                eitem["pid"]
+                for eitem in pending_eitems
+                if eitem["document_pid"] == document_pid
+                and eitem["created_by"].get("value") == self.metadata_provider
+                and eitem["pid"] not in pids
+            ]
+        return pids
+
+    def has_new_eitem(self, matched_document):
+        """Check if an eitem would be created for the matched document."""
+        if not self.json_data.get("_eitem"):
+            return False
+        pids = self._get_provider_eitems_pids(matched_document["pid"])
+        return len(pids) != 1
+
     def _replace_lower_priority_eitems(self, matched_document):
         eitem_indexer = current_app_ils.eitem_indexer
         eitem_search = current_app_ils.eitem_search_cls()
@@ -111,7 +157,9 @@ class EItemImporter(object):
             if self._should_replace_eitems(eitem):
                 self.deleted_list.append(eitem)
                 eitem.delete()
-                eitem_indexer.delete(eitem)
+                delete_record_index(
+                    eitem_indexer, eitem, self.indexing_buffer
+                )
 
     def _build_eitem_dict(self, eitem_json, document_pid):
         """Provide initial metadata dictionary."""
@@ -147,22 +195,18 @@ class EItemImporter(object):
         document_pid = matched_document["pid"]
 
         # get eitems for current provider
-        search = get_eitems_for_document_by_provider(
-            document_pid, self.metadata_provider
-        )
-        results = search.scan()
-        hits_total = search.count()
+        pids = self._get_provider_eitems_pids(document_pid)
 
-        if hits_total == 0:
+        if not pids:
             self.created = self.create_eitem(matched_document)
-        elif hits_total == 1:
-            record = [result for result in results][0]
-            existing_eitem = eitem_cls.get_record_by_pid(record["pid"])
+        elif len(pids) == 1:
+            existing_eitem = eitem_cls.get_record_by_pid(pids[0])
+            self.matched = existing_eitem
             self.updated = self._update_existing_record(
                 existing_eitem, matched_document
             )
         else:
-            self._report_ambiguous_records(results)
+            self._report_ambiguous_records(pids)
             self.created = self.create_eitem(matched_document)
         if self.is_provider_priority_sensitive:
             self._replace_lower_priority_eitems(matched_document)
@@ -202,12 +246,12 @@ class EItemImporter(object):
 
                     eitem_json["pid"] = provider.pid.pid_value
                     self.created = eitem_cls.create(eitem_json, record_uuid)
-                db.session.commit()
+                commit(self.unit_of_work)
                 return self.created
             except IlsValidationError as e:
                 click.secho(
                     "Field: {}".format(e.errors[0].res["field"]), fg="red"
                 )
                 click.secho(e.original_exception.message, fg="red")
-                db.session.rollback()
+                rollback(self.unit_of_work)
                 raise e
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer task entries module."""
+import time
+
+from flask import current_app
+from invenio_db import db
+
+from cds_ils.importer.models import ImporterTaskEntry, ImporterTaskLog
+from cds_ils.importer.progress import publish_progress
+from cds_ils.importer.transactions import commit
+
+
+class ImporterTaskEntryWriter(object):
+    """Buffer the entries of an import task and insert them in batches.
+
+    The buffered entries are inserted with a single commit every
+    ``flush_size`` entries or ``flush_interval`` seconds, whichever comes
+    first, so readers see them with at most one flush interval of delay.
+    The counters of the task are incremented along each insert.
+    The caller is responsible for the final flush.
+
+    Within a unit of work, the entries are only inserted when the caller
+    flushes them, in the transaction of the unit of work: they are committed
+    along with their records.
+    """
+
+    def __init__(
+        self, flush_size=None, flush_interval=None, log=None,
+        unit_of_work=None,
+    ):
+        """Constructor.
+
+        :param log: task whose progress is published after each insert.
+        :param unit_of_work: unit of work of the imported records.
+        """
+        self.flush_size = flush_size or current_app.config[
+            "CDS_ILS_IMPORTER_ENTRIES_FLUSH_SIZE"
+        ]
+        self.flush_interval = flush_interval or current_app.config[
+            "CDS_ILS_IMPORTER_ENTRIES_FLUSH_INTERVAL"
+        ]
+        self.log = log
+        self.unit_of_work = unit_of_work
+        self._entries = []
+        self._last_flush = time.monotonic()
+
+    def _add(self, entry_data):
+        """Buffer an entry and flush the buffer when due."""
+        self._entries.append(entry_data)
+        if self.unit_of_work is not None:
+            return
+        elapsed = time.monotonic() - self._last_flush
+        if (
+            len(self._entries) >= self.flush_size
+            or elapsed >= self.flush_interval
+        ):
+            self.flush()
+
+    def add_success(self, base_data, report):
+        """Buffer a successfully imported record entry."""
+        self._add(ImporterTaskEntry.success_data(base_data, report))
+
+    def add_skipped(self, base_data, reason):
+        """Buffer a skipped record entry."""
+        self._add(ImporterTaskEntry.skipped_data(base_data, reason))
+
+    def add_failure(self, base_data, exception):
+        """Buffer a failed record entry."""
+        self._add(ImporterTaskEntry.failure_data(base_data, exception))
+
+    def flush(self):
+        """Insert the buffered entries."""
+        if self._entries:
+            db.session.bulk_insert_mappings(ImporterTaskEntry, self._entries)
+            ImporterTaskLog.increment_counters(self._entries)
+            commit(self.unit_of_work)
+            if self.log is not None:
+                publish_progress(self.log, [
+                    ImporterTaskEntry.dump_data(entry_data)
+                    for entry_data in self._entries
+                ])
+            self._entries = []
+        self._last_flush = time.monotonic()
@@ -82,3 +82,31 @@ class SeriesImportError(CDSImporterException):
     """Document import exception."""
 
     message = "[SERIES IMPORT ERROR]"
+
+
+class DocumentCreationDeferred(Exception):
+    """The import of the record is deferred to avoid duplicated documents."""
+
+
+class ShardImportError(Exception):
+    """Some shards of a parallel import failed."""
+
+
+class ImporterTaskNotResumable(Exception):
+    """The import task cannot be resumed."""
+
+
+class ImporterTaskNotPromotable(Exception):
+    """The previewed task cannot be imported."""
+
+
+class RecordUnchanged(Exception):
+    """The record did not change since its last import."""
+
+
+class ImporterSourceError(Exception):
+    """The source file cannot be read."""
+
+
+class RecordConversionError(Exception):
+    """The record failed to be converted by the conversion stage."""
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer records fingerprints module."""
+import hashlib
+import json
+from datetime import datetime
+
+from invenio_app_ils.documents.api import DOCUMENT_PID_TYPE
+from invenio_app_ils.eitems.api import EITEM_PID_TYPE
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from lxml import etree
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from cds_ils.importer.conversion_cache import get_model_version
+from cds_ils.importer.errors import RecordUnchanged
+from cds_ils.importer.marc import get_control_field, get_marc_fields
+from cds_ils.importer.models import ImporterRecordFingerprint
+from cds_ils.importer.registry import current_importer_providers
+
+
+def get_provider_recid(record):
+    """Get the identifier given by the provider to a MARC record.
+
+    :param record: the parsed MARCXML record or its compact fields.
+    """
+    if etree.iselement(record):
+        return record.findtext("{*}controlfield[@tag='001']")
+    return get_control_field(record, "001")
+
+
+def compute_fingerprint(record, dojson_model):
+    """Hash the MARC fields of the record along with the model version.
+
+    The version of the rules of the model is part of the hash so that the
+    records are imported again when their conversion changes.
+
+    :param record: the parsed MARCXML record or its compact fields.
+    :param dojson_model: dojson model converting the record.
+    """
+    if etree.iselement(record):
+        record = get_marc_fields(record)
+    fingerprint = hashlib.sha256(
+        get_model_version(dojson_model).encode("utf-8")
+    )
+    fingerprint.update(json.dumps(record).encode("utf-8"))
+    return fingerprint.hexdigest()
+
+
+def records_exist(document_pid, eitem_pid=None):
+    """Check that the imported document and eitem are still registered."""
+    if document_pid is None:
+        return False
+    pids = [(DOCUMENT_PID_TYPE, document_pid)]
+    if eitem_pid is not None:
+        pids.append((EITEM_PID_TYPE, eitem_pid))
+    registered = PersistentIdentifier.query.filter(
+        PersistentIdentifier.status == PIDStatus.REGISTERED,
+        or_(*[
+            and_(
+                PersistentIdentifier.pid_type == pid_type,
+                PersistentIdentifier.pid_value == pid_value,
+            )
+            for pid_type, pid_value in pids
+        ]),
+    ).count()
+    return registered == len(pids)
+
+
+class RecordFingerprints(object):
+    """Fingerprints of the records last imported from a provider.
+
+    The stored fingerprints are loaded once per import run, the ones of the
+    records imported by the run are stored in batches when flushed.
+    Along the fingerprint, the pids of the document and eitem imported from
+    the record are stored: an unchanged record is imported again if they
+    were deleted since, manually or by a delete import.
+    """
+
+    def __init__(self, provider, fingerprints=None):
+        """Constructor."""
+        self.provider = provider
+        # {provider recid: (fingerprint, document pid, eitem pid)}
+        self._fingerprints = fingerprints or {}
+        self._pending = {}
+        self._imported = {}
+
+    @classmethod
+    def load(cls, provider):
+        """Load the stored fingerprints of a provider."""
+        rows = db.session.query(
+            ImporterRecordFingerprint.provider_recid,
+            ImporterRecordFingerprint.fingerprint,
+            ImporterRecordFingerprint.document_pid,
+            ImporterRecordFingerprint.eitem_pid,
+        ).filter_by(provider=provider)
+        return cls(provider, {row[0]: tuple(row[1:]) for row in rows})
+
+    def check(self, record):
+        """Raise if the MARCXML record is unchanged since its last import."""
+        provider_recid = get_provider_recid(record)
+        if provider_recid is None:
+            return
+        dojson_model = current_importer_providers.get(
+            self.provider
+        ).dojson_model
+        self.check_fingerprint(
+            provider_recid, compute_fingerprint(record, dojson_model)
+        )
+
+    def check_fingerprint(self, provider_recid, fingerprint):
+        """Raise if the fingerprint of a record is the last imported one.
+
+        Used for the records converted beforehand, fingerprinted then.
+        """
+        if provider_recid is None or fingerprint is None:
+            return
+        stored = self._fingerprints.get(provider_recid)
+        if stored and stored[0] == fingerprint and records_exist(*stored[1:]):
+            raise RecordUnchanged()
+        self._pending[provider_recid] = fingerprint
+
+    def add(self, provider_recid, document_pid, eitem_pid=None):
+        """Keep the fingerprint of a checked record once it is imported.
+
+        :param document_pid: pid of the document created or updated.
+        :param eitem_pid: pid of the eitem of the provider, if any.
+        """
+        fingerprint = self._pending.pop(provider_recid, None)
+        if fingerprint:
+            self._imported[provider_recid] = (
+                fingerprint, document_pid, eitem_pid
+            )
+
+    def flush(self):
+        """Store the fingerprints of the imported records."""
+        self._pending = {}
+        if not self._imported:
+            return
+        now = datetime.now()
+        inserts, updates = [], []
+        for provider_recid, imported in self._imported.items():
+            fingerprint, document_pid, eitem_pid = imported
+            mapping = dict(
+                provider=self.provider,
+                provider_recid=provider_recid,
+                fingerprint=fingerprint,
+                document_pid=document_pid,
+                eitem_pid=eitem_pid,
+                updated=now,
+            )
+            if provider_recid in self._fingerprints:
+                updates.append(mapping)
+            else:
+                inserts.append(mapping)
+        try:
+            db.session.bulk_insert_mappings(
+                ImporterRecordFingerprint, inserts
+            )
+            db.session.bulk_update_mappings(
+                ImporterRecordFingerprint, updates
+            )
+            db.session.commit()
+        except IntegrityError:
+            # stored meanwhile by a concurrent run
+            db.session.rollback()
+            for mapping in inserts + updates:
+                db.session.merge(ImporterRecordFingerprint(**mapping))
+            db.session.commit()
+        self._fingerprints.update(self._imported)
+        self._imported = {}
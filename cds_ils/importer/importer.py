@@ -6,12 +6,14 @@
 # the terms of the MIT License; see LICENSE file for more details.
 
 """CDS-ILS Importer module."""
-from flask import current_app
 from invenio_app_ils.proxies import current_app_ils
 
-from cds_ils.importer.documents.api import fuzzy_search_document
+from cds_ils.importer.context import ImportContext
 from cds_ils.importer.documents.importer import DocumentImporter
 from cds_ils.importer.eitems.importer import EItemImporter
+from cds_ils.importer.errors import DocumentCreationDeferred
+from cds_ils.importer.indexer import index_record
+from cds_ils.importer.registry import current_importer_providers
 from cds_ils.importer.series.importer import SeriesImporter
 
 
@@ -30,29 +32,38 @@ class Importer(object):
         "provider_recid",
     )
 
-    def __init__(self, json_data, metadata_provider):
+    def __init__(self, json_data, metadata_provider, context=None):
         """Constructor."""
         self.json_data = json_data
         self.metadata_provider = metadata_provider
-        priority = current_app.config["CDS_ILS_IMPORTER_PROVIDERS"][
-            metadata_provider
-        ]["priority"]
+        self.context = context or ImportContext()
+        self.provider = current_importer_providers.get(metadata_provider)
         self.document_importer = DocumentImporter(
             json_data,
             self.HELPER_METADATA_FIELDS,
             metadata_provider,
             self.UPDATE_DOCUMENT_FIELDS,
+            identifiers_index=self.context.identifiers_index,
+            fuzzy_index=self.context.fuzzy_index,
+            unit_of_work=self.context.unit_of_work,
         )
         self.eitem_importer = EItemImporter(
             json_data,
             metadata_provider,
-            priority,
+            self.provider.priority,
             self.IS_PROVIDER_PRIORITY_SENSITIVE,
             self.EITEM_OPEN_ACCESS,
             self.EITEM_URLS_LOGIN_REQUIRED,
+            indexing_buffer=self.context.indexing_buffer,
+            unit_of_work=self.context.unit_of_work,
         )
         series_json = json_data.get("_serial", None)
-        self.series_importer = SeriesImporter(series_json, metadata_provider)
+        self.series_importer = SeriesImporter(
+            series_json,
+            metadata_provider,
+            unit_of_work=self.context.unit_of_work,
+            series_cache=self.context.series_cache,
+        )
 
         self.ambiguous_matches = []
         self.created = None
@@ -62,12 +73,7 @@ class Importer(object):
 
     def _validate_provider(self):
         """Check if the chosen provider is matching the import data."""
-        assert (
-            self.json_data["agency_code"]
-            == current_app.config["CDS_ILS_IMPORTER_PROVIDERS"][
-                self.metadata_provider
-            ]["agency_code"]
-        )
+        assert self.json_data["agency_code"] == self.provider.agency_code
 
     def _match_document(self):
         """Search the catalogue for existing document."""
@@ -79,8 +85,7 @@ class Importer(object):
 
         self.ambiguous_matches = matching_pids
 
-        fuzzy_results = self.document_importer.fuzzy_match_documents()
-        self.fuzzy_matches = [x.pid for x in fuzzy_results]
+        self.fuzzy_matches = self.document_importer.fuzzy_match_documents()
 
     def import_summary(self):
         """Provide import summary."""
@@ -94,8 +99,33 @@ class Importer(object):
             "updated_eitem": self.eitem_importer.updated,
             "deleted_eitem_list": self.eitem_importer.deleted_list,
             "ambiguous_eitem_list": self.eitem_importer.ambiguous_list,
+            "unchanged": self.is_unchanged(),
         }
 
+    def is_unchanged(self):
+        """Check if the matched document and its records are unchanged."""
+        return bool(
+            self.updated
+            and self.document_importer.unchanged
+            and not self.eitem_importer.created
+            and not self.eitem_importer.updated
+            and not self.eitem_importer.deleted_list
+            and not self.series_importer.changed
+        )
+
+    def get_imported_pids(self):
+        """Get the pids of the imported document and of its eitem."""
+        document = self.created or self.updated
+        eitem = (
+            self.eitem_importer.created
+            or self.eitem_importer.updated
+            or self.eitem_importer.matched
+        )
+        return (
+            document["pid"] if document else None,
+            eitem["pid"] if eitem else None,
+        )
+
     def update_records(self, matched_document):
         """Update document eitem and series records."""
         self.document_importer.update_document(matched_document)
@@ -115,12 +145,20 @@ class Importer(object):
         series_indexer = current_app_ils.series_indexer
         eitem_indexer = current_app_ils.eitem_indexer
 
+        indexing_buffer = self.context.indexing_buffer
+
         eitem = self.eitem_importer.updated or self.eitem_importer.created
         if eitem:
-            eitem_indexer.index(eitem)
-        document_indexer.index(self.created or self.updated)
-        for series in self.series_list:
-            series_indexer.index(series)
+            index_record(eitem_indexer, eitem, indexing_buffer)
+        if self.created or not self.document_importer.unchanged:
+            index_record(
+                document_indexer,
+                self.created or self.updated,
+                indexing_buffer,
+            )
+        if self.series_importer.changed:
+            for series in self.series_list:
+                index_record(series_indexer, series, indexing_buffer)
 
     def import_record(self):
         """Import record."""
@@ -129,7 +167,14 @@ class Importer(object):
         # finds the exact match, update records
         matched_document = self._match_document()
 
+        # records creating documents, series or eitems would race with the
+        # other shards of a parallel import, they are imported afterwards
         if matched_document:
+            if self.context.defer_creations and (
+                self.series_importer.has_new_series()
+                or self.eitem_importer.has_new_eitem(matched_document)
+            ):
+                raise DocumentCreationDeferred()
             self.update_records(matched_document)
             self.index_all_records()
             return self.import_summary()
@@ -139,6 +184,8 @@ class Importer(object):
         if self.ambiguous_matches or self.fuzzy_matches:
             return self.import_summary()
 
+        if self.context.defer_creations:
+            raise DocumentCreationDeferred()
         document = self.document_importer.create_document()
         if document:
             self.eitem_importer.create_eitem(document)
@@ -147,6 +194,21 @@ class Importer(object):
             self.index_all_records()
         return self.import_summary()
 
+    def preview_record(self):
+        """Compute the import summary without writing or indexing records.
+
+        Only the ids of the matched documents are kept by the entries of the
+        summary, the fuzzy matches are reused when the preview is promoted.
+        """
+        self._validate_provider()
+
+        matched_document = self._match_document()
+        if matched_document:
+            self.updated = matched_document
+        elif not (self.ambiguous_matches or self.fuzzy_matches):
+            self.created = self.document_importer.preview_document()
+        return self.import_summary()
+
     def delete_record(self):
         """Deletes the eitems of the record."""
         self._validate_provider()
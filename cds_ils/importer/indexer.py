@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer indexing module."""
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app
+from flask_celeryext import current_celery_app
+from invenio_app_ils.documents.api import DOCUMENT_PID_TYPE
+from invenio_app_ils.documents.indexer import \
+    index_referenced_records as index_document_referenced_records
+from invenio_app_ils.eitems.api import EITEM_PID_TYPE
+from invenio_app_ils.eitems.indexer import \
+    index_referenced_records as index_eitem_referenced_records
+from invenio_app_ils.series.api import SERIES_PID_TYPE
+from invenio_app_ils.series.indexer import \
+    index_referenced_records as index_series_referenced_records
+from kombu import Queue
+
+from cds_ils.importer.models import ImporterTaskLog
+
+REFERENCED_RECORDS_TASKS = {
+    DOCUMENT_PID_TYPE: index_document_referenced_records,
+    EITEM_PID_TYPE: index_eitem_referenced_records,
+    SERIES_PID_TYPE: index_series_referenced_records,
+}
+"""Tasks indexing the records referenced by the imported record types."""
+
+
+class IndexingBuffer(object):
+    """Collect the indexing operations of an import run.
+
+    Repeated operations on the same record are merged, the last one wins,
+    and they are sent to Elasticsearch in bulk when flushed. They go through
+    a queue of their own, not the bulk queue shared by the indexers, so that
+    a flush only sends and counts the operations of its run. As the
+    indexers do, the records referencing the indexed ones are reindexed
+    asynchronously, once per record.
+    """
+
+    def __init__(self, chunk_size=None, log=None):
+        """Constructor.
+
+        :param log: task on which the records failing to be indexed are
+                    counted.
+        """
+        self.chunk_size = chunk_size or current_app.config[
+            "CDS_ILS_IMPORTER_BULK_INDEXING_CHUNK_SIZE"
+        ]
+        self.log = log
+        # {record uuid: (operation, indexer, record)}
+        self._operations = OrderedDict()
+
+    def index(self, indexer, record):
+        """Defer the indexing of a committed record."""
+        record_id = str(record.id)
+        self._operations.pop(record_id, None)
+        self._operations[record_id] = ("index", indexer, record)
+
+    def delete(self, indexer, record):
+        """Defer the removal of a record from the index."""
+        record_id = str(record.id)
+        self._operations.pop(record_id, None)
+        self._operations[record_id] = ("delete", indexer, record)
+
+    def get_pending_records(self, pid_type):
+        """Get the records of a type waiting to be indexed."""
+        return [
+            record
+            for operation, _, record in self._operations.values()
+            if operation == "index" and record._pid_type == pid_type
+        ]
+
+    def snapshot(self):
+        """Return the pending operations, to be restored on failure."""
+        return OrderedDict(self._operations)
+
+    def restore(self, snapshot):
+        """Discard the operations added since the snapshot was taken."""
+        self._operations = snapshot
+
+    def _index_referenced_records(self, records):
+        """Reindex asynchronously the records referencing the indexed ones."""
+        eta = datetime.utcnow() + current_app.config["ILS_INDEXER_TASK_DELAY"]
+        for record in records:
+            task = REFERENCED_RECORDS_TASKS.get(record._pid_type)
+            if task:
+                task.apply_async((record,), eta=eta)
+
+    @contextmanager
+    def _bulk_queue(self):
+        """Declare a queue for the operations of a flush, deleted after."""
+        exchange = current_app.config["INDEXER_MQ_EXCHANGE"]
+        name = "cds-ils-importer-indexer-{0}".format(uuid.uuid4())
+        queue = Queue(name, exchange=exchange, routing_key=name)
+        with current_celery_app.pool.acquire(block=True) as connection:
+            queue(connection).declare()
+        try:
+            yield queue
+        finally:
+            with current_celery_app.pool.acquire(block=True) as connection:
+                queue(connection).delete()
+
+    def _bulk(self, indexer, operations, queue):
+        """Send the operations of an indexer through the queue of the flush.
+
+        :param operations: list of the ``(operation, record id)`` to send.
+        :returns: the number of failed operations.
+        """
+        # same indexer, bound to the queue of the flush
+        indexer = type(indexer)(
+            exchange=queue.exchange,
+            queue=queue,
+            routing_key=queue.routing_key,
+        )
+        indexer.bulk_index(
+            record_id for operation, record_id in operations
+            if operation == "index"
+        )
+        indexer.bulk_delete(
+            record_id for operation, record_id in operations
+            if operation == "delete"
+        )
+        _, failed = indexer.process_bulk_queue(
+            es_bulk_kwargs=dict(
+                chunk_size=self.chunk_size, raise_on_error=False
+            )
+        )
+        return failed
+
+    def flush(self):
+        """Send the pending operations to Elasticsearch.
+
+        The operations failing to be indexed are counted on the task.
+
+        :returns: the number of failed operations.
+        """
+        if not self._operations:
+            return 0
+        operations = self._operations
+        self._operations = OrderedDict()
+
+        operations_by_indexer = OrderedDict()
+        for record_id, (operation, indexer, _) in operations.items():
+            operations_by_indexer.setdefault(indexer, []).append(
+                (operation, record_id)
+            )
+        with self._bulk_queue() as queue:
+            failed = sum(
+                self._bulk(indexer, indexer_operations, queue)
+                for indexer, indexer_operations
+                in operations_by_indexer.items()
+            )
+        if failed:
+            current_app.logger.error(
+                "IMPORTER BULK INDEXING {0} RECORDS FAILED".format(failed)
+            )
+            if self.log is not None:
+                ImporterTaskLog.add_indexing_failures(self.log.id, failed)
+
+        self._index_referenced_records(
+            record for operation, _, record in operations.values()
+            if operation == "index"
+        )
+        return failed
+
+
+def index_record(indexer, record, indexing_buffer=None):
+    """Index a record now, or when the buffer of the run is flushed."""
+    if indexing_buffer is None:
+        indexer.index(record)
+    else:
+        indexing_buffer.index(indexer, record)
+
+
+def delete_record_index(indexer, record, indexing_buffer=None):
+    """Remove a record from the index now, or when the buffer is flushed."""
+    if indexing_buffer is None:
+        indexer.delete(record)
+    else:
+        indexing_buffer.delete(indexer, record)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer MARC fields module.
+
+The parsed MARCXML records are flattened once in compact fields, which are
+cheap to hash and to send to the workers, and from which the MARC structure
+of dojson is built without serializing and parsing the records again.
+"""
+from cds_dojson.marc21.utils import create_record
+from cds_dojson.utils import MementoDict
+from lxml import etree
+
+
+def _get_indicator(datafield, name):
+    """Get an indicator of a data field, normalized as by create_record."""
+    indicator = datafield.get(name, "!")
+    if indicator in ("", "#"):
+        return "_"
+    return indicator.replace(" ", "_")
+
+
+def get_marc_fields(record):
+    """Flatten a parsed MARCXML record in compact fields.
+
+    The leader and the control fields are ``(tag, None, None, value)``
+    tuples, the data fields are ``(tag, ind1, ind2, subfields)`` tuples with
+    the ``(code, value)`` tuples of their subfields. They are ordered as by
+    ``create_record``: leader, control fields then data fields.
+    """
+    leaders, controlfields, datafields = [], [], []
+    for field in record:
+        if not isinstance(field.tag, str):
+            # comments and processing instructions
+            continue
+        name = field.tag.rpartition("}")[2]
+        if name == "leader":
+            leaders.append(("leader", None, None, field.text or ""))
+        elif name == "controlfield":
+            controlfields.append(
+                (field.get("tag", "!"), None, None, field.text or "")
+            )
+        elif name == "datafield":
+            datafields.append((
+                field.get("tag", "!"),
+                _get_indicator(field, "ind1"),
+                _get_indicator(field, "ind2"),
+                tuple(
+                    (subfield.get("code", "!"), subfield.text or "")
+                    for subfield in field.iterchildren("{*}subfield")
+                ),
+            ))
+    return leaders + controlfields + datafields
+
+
+def get_control_field(fields, tag):
+    """Get the value of a control field of compact fields."""
+    for field_tag, ind1, _, value in fields:
+        if field_tag == tag and ind1 is None:
+            return value
+    return None
+
+
+def create_marc_record(data):
+    """Create the MARC structure of dojson from a record.
+
+    :param data: the compact fields of the record, possibly deserialized as
+                 lists, or the parsed or serialized MARCXML record.
+    """
+    if isinstance(data, (str, bytes)):
+        return create_record(data)
+    if etree.iselement(data):
+        data = get_marc_fields(data)
+    record = []
+    for tag, ind1, ind2, value in data:
+        if ind1 is None:
+            record.append((tag, value))
+        else:
+            record.append((
+                "{0}{1}{2}".format(tag, ind1, ind2),
+                MementoDict([tuple(subfield) for subfield in value]),
+            ))
+    return MementoDict(record)
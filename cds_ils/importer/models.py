@@ -13,6 +13,12 @@ from datetime import datetime
 from invenio_db import db
 from sqlalchemy import Enum
 
+from cds_ils.importer.progress import publish_progress
+from cds_ils.importer.reports import DOCUMENT_REPORT_FIELDS, \
+    EITEM_REPORT_FIELDS, SERIES_REPORT_FIELDS, compact_record, \
+    compact_records
+from cds_ils.importer.transactions import commit
+
 
 def _format_exception(exception):
     """Formats the exception into a string."""
@@ -54,6 +60,8 @@ class ImporterMode(enum.Enum):
 
     DELETE = "DELETE"
 
+    PREVIEW = "PREVIEW"
+
 
 class ImporterTaskLog(db.Model):
     """Store the ldap synchronization task history."""
@@ -97,6 +105,70 @@ class ImporterTaskLog(db.Model):
     entries_count = db.Column(db.Integer, nullable=True)
     """Number of entries in source file."""
 
+    source_path = db.Column(db.String, nullable=True)
+    """Path of the stored source file, to resume the task."""
+
+    source_checksum = db.Column(db.String(64), nullable=True, index=True)
+    """SHA-256 checksum of the uploaded source file, to detect duplicates."""
+
+    last_entry_index = db.Column(db.Integer, nullable=True)
+    """Index of the last entry committed, the checkpoint of the task."""
+
+    heartbeat = db.Column(db.DateTime, nullable=True)
+    """Last time the running task reported its progress."""
+
+    processed_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    """Number of entries written, whatever their status."""
+
+    created_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    """Number of entries which created a document."""
+
+    updated_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    """Number of entries which updated a document."""
+
+    ambiguous_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    """Number of entries matching many documents."""
+
+    fuzzy_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    """Number of entries fuzzy matching documents."""
+
+    failed_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    """Number of failed entries."""
+
+    unchanged_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    """Number of entries skipped as unchanged."""
+
+    indexing_failed_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    """Number of imported records which failed to be indexed."""
+
+    COUNTERS = {
+        "processed": lambda entry: True,
+        "created": lambda entry: entry.get("created_document"),
+        "updated": lambda entry: entry.get("updated_document")
+        and entry.get("skipped") != "unchanged",
+        "ambiguous": lambda entry: entry.get("ambiguous_documents"),
+        "fuzzy": lambda entry: entry.get("fuzzy_documents"),
+        "failed": lambda entry: entry.get("error"),
+        "unchanged": lambda entry: entry.get("skipped") == "unchanged",
+    }
+    """Status counters of the task and the entries they count."""
+
     @classmethod
     def create(cls, data):
         """Create a new task log."""
@@ -105,16 +177,104 @@ class ImporterTaskLog(db.Model):
         db.session.commit()
         return log
 
+    @classmethod
+    def get_duplicate(cls, source_checksum, provider, mode, window):
+        """Get the latest task importing the same file recently.
+
+        The failed tasks are ignored, for their file to be uploaded again.
+
+        :param window: time during which an identical upload is a duplicate.
+        """
+        return cls.query.filter(
+            cls.source_checksum == source_checksum,
+            cls.provider == provider,
+            cls.mode == mode,
+            cls.status != ImporterTaskStatus.FAILED,
+            cls.start_time >= datetime.now() - window,
+        ).order_by(cls.id.desc()).first()
+
+    @classmethod
+    def increment_counters(cls, entries):
+        """Count the given entries data in the counters of their tasks.
+
+        The counters are incremented in the database, for the tasks
+        writing their entries concurrently, and committed with them.
+        """
+        increments = {}
+        for entry in entries:
+            counters = increments.setdefault(entry["import_id"], {})
+            for name, counts in cls.COUNTERS.items():
+                if counts(entry):
+                    counters[name] = counters.get(name, 0) + 1
+        for import_id, counters in increments.items():
+            column_values = {}
+            for name, increment in counters.items():
+                column = getattr(cls, "{}_count".format(name))
+                column_values[column] = column + increment
+            cls.query.filter_by(id=import_id).update(
+                column_values, synchronize_session=False
+            )
+
+    @classmethod
+    def add_indexing_failures(cls, import_id, count):
+        """Count the imported records of a task which failed to be indexed.
+
+        The records are already committed, the failures are committed on
+        their own.
+        """
+        cls.query.filter_by(id=import_id).update(
+            {cls.indexing_failed_count: cls.indexing_failed_count + count},
+            synchronize_session=False,
+        )
+        db.session.commit()
+
+    def dump_counters(self):
+        """Dump the status counters of the task."""
+        return {
+            name: getattr(self, "{}_count".format(name)) or 0
+            for name in self.COUNTERS
+        }
+
     def is_running(self):
         """Check if the task is currently running."""
         return self.status == ImporterTaskStatus.RUNNING
 
+    def is_stale(self, lease):
+        """Check if the task is running but stopped reporting its progress.
+
+        :param lease: time after which a silent task is considered dead.
+        """
+        last_seen = self.heartbeat or self.start_time
+        return self.is_running() and last_seen < datetime.now() - lease
+
+    def checkpoint(self, entry_index, unit_of_work=None):
+        """Store the progress of the task, renewing its lease.
+
+        :param unit_of_work: unit of work of the imported records, the
+                             progress is then committed along them.
+        """
+        if self.last_entry_index is None \
+                or entry_index > self.last_entry_index:
+            self.last_entry_index = entry_index
+        self.heartbeat = datetime.now()
+        commit(unit_of_work)
+
+    def set_resumed(self):
+        """Mark this task as running again."""
+        self.status = ImporterTaskStatus.RUNNING
+        self.end_time = None
+        self.message = None
+        self.heartbeat = datetime.now()
+        db.session.commit()
+        publish_progress(self)
+
     def set_succeeded(self):
         """Mark this task as complete and log output."""
         assert self.is_running()
         self.status = ImporterTaskStatus.SUCCEEDED
         self.end_time = datetime.now()
         db.session.commit()
+        publish_progress(self)
 
     def set_failed(self, exception):
         """Mark this task as failed."""
@@ -123,6 +283,7 @@ class ImporterTaskLog(db.Model):
         self.end_time = datetime.now()
         self.message = _format_exception(exception)
         db.session.commit()
+        publish_progress(self)
 
 
 class ImporterTaskEntry(db.Model):
@@ -160,48 +321,177 @@ class ImporterTaskEntry(db.Model):
 
     fuzzy_documents = db.Column(db.JSON, nullable=True)
 
+    skipped = db.Column(db.String, nullable=True)
+    """The reason why the record was not imported, if skipped."""
+
     importer_task = db.relationship(
         ImporterTaskLog,
         backref=db.backref('entries', lazy='dynamic')
     )
     """Relationship."""
 
+    REPORT_COLUMNS = (
+        "ambiguous_documents",
+        "ambiguous_eitems",
+        "created_document",
+        "created_eitem",
+        "updated_document",
+        "updated_eitem",
+        "deleted_eitems",
+        "series",
+        "fuzzy_documents",
+        "skipped",
+    )
+    """Columns of the dumped reports."""
+
     @classmethod
     def __create(cls, data):
         """Create a new entry."""
         entry = cls(**data)
         db.session.add(entry)
+        ImporterTaskLog.increment_counters([data])
         db.session.commit()
         return entry
 
     @classmethod
-    def create_success(cls, base_data, report):
-        """Mark this record as successfully imported."""
-        return cls.__create(
-            {
-                **base_data,
-                **dict(
-                    ambiguous_documents=report["ambiguous_documents"],
-                    ambiguous_eitems=report["ambiguous_eitem_list"],
-                    created_document=report["created"],
-                    created_eitem=report["created_eitem"],
-                    updated_document=report["updated"],
-                    updated_eitem=report["updated_eitem"],
-                    deleted_eitems=report["deleted_eitem_list"],
-                    series=report["series"],
-                    fuzzy_documents=report["fuzzy"],
+    def success_data(cls, base_data, report):
+        """Build the data of a successfully imported record entry.
+
+        Only a summary of the reported records is stored.
+        """
+        return {
+            **base_data,
+            **dict(
+                ambiguous_documents=report["ambiguous_documents"],
+                ambiguous_eitems=compact_records(
+                    report["ambiguous_eitem_list"], EITEM_REPORT_FIELDS
                 ),
-            }
+                created_document=compact_record(
+                    report["created"], DOCUMENT_REPORT_FIELDS
+                ),
+                created_eitem=compact_record(
+                    report["created_eitem"], EITEM_REPORT_FIELDS
+                ),
+                updated_document=compact_record(
+                    report["updated"], DOCUMENT_REPORT_FIELDS
+                ),
+                updated_eitem=compact_record(
+                    report["updated_eitem"], EITEM_REPORT_FIELDS
+                ),
+                deleted_eitems=compact_records(
+                    report["deleted_eitem_list"], EITEM_REPORT_FIELDS
+                ),
+                series=compact_records(
+                    report["series"], SERIES_REPORT_FIELDS
+                ),
+                fuzzy_documents=report["fuzzy"],
+                skipped="unchanged" if report.get("unchanged") else None,
+            ),
+        }
+
+    @classmethod
+    def failure_data(cls, base_data, exception):
+        """Build the data of a failed record entry."""
+        return {
+            **base_data,
+            **dict(
+                error=_format_exception(exception)
+            )
+        }
+
+    @classmethod
+    def skipped_data(cls, base_data, reason):
+        """Build the data of a skipped record entry."""
+        return {
+            **base_data,
+            **dict(
+                skipped=reason
+            )
+        }
+
+    def compact(self):
+        """Keep only the summary of the records reported by the entry."""
+        self.ambiguous_eitems = compact_records(
+            self.ambiguous_eitems, EITEM_REPORT_FIELDS
+        )
+        self.created_document = compact_record(
+            self.created_document, DOCUMENT_REPORT_FIELDS
+        )
+        self.created_eitem = compact_record(
+            self.created_eitem, EITEM_REPORT_FIELDS
+        )
+        self.updated_document = compact_record(
+            self.updated_document, DOCUMENT_REPORT_FIELDS
+        )
+        self.updated_eitem = compact_record(
+            self.updated_eitem, EITEM_REPORT_FIELDS
         )
+        self.deleted_eitems = compact_records(
+            self.deleted_eitems, EITEM_REPORT_FIELDS
+        )
+        self.series = compact_records(self.series, SERIES_REPORT_FIELDS)
+
+    @classmethod
+    def dump_data(cls, data):
+        """Dump the data of an entry, with the summary of its records."""
+        if data.get("error"):
+            return {
+                "index": data["entry_index"],
+                "success": False,
+                "message": data["error"],
+            }
+        return {
+            "index": data["entry_index"],
+            "success": True,
+            "report": {
+                column: data.get(column) for column in cls.REPORT_COLUMNS
+            },
+        }
+
+    def dump(self):
+        """Dump the entry, with the summary of its records."""
+        return self.dump_data({
+            column: getattr(self, column)
+            for column in ("entry_index", "error")
+            + self.REPORT_COLUMNS
+        })
+
+    @classmethod
+    def create_success(cls, base_data, report):
+        """Mark this record as successfully imported."""
+        return cls.__create(cls.success_data(base_data, report))
 
     @classmethod
     def create_failure(cls, base_data, exception):
         """Mark this record as failed."""
-        return cls.__create(
-            {
-                **base_data,
-                **dict(
-                    error=_format_exception(exception)
-                )
-            }
-        )
+        return cls.__create(cls.failure_data(base_data, exception))
+
+
+class ImporterRecordFingerprint(db.Model):
+    """Fingerprint of the last imported version of a provider record."""
+
+    __tablename__ = "importer_record_fingerprint"
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint("provider", "provider_recid"),
+    )
+
+    provider = db.Column(db.String, nullable=False)
+    """The provider of the record."""
+
+    provider_recid = db.Column(db.String, nullable=False)
+    """The identifier of the record given by the provider."""
+
+    fingerprint = db.Column(db.String(64), nullable=False)
+    """Hash of the imported MARC record and of the importer version."""
+
+    document_pid = db.Column(db.String, nullable=True)
+    """The document created or updated by the last import of the record."""
+
+    eitem_pid = db.Column(db.String, nullable=True)
+    """The eitem of the provider of the document, if any."""
+
+    updated = db.Column(
+        db.DateTime, nullable=False, default=lambda: datetime.now()
+    )
+    """Last time the record was imported."""
@@ -7,21 +7,80 @@
 
 """CDS-ILS Overdo module."""
 
-from cds_dojson.overdo import Overdo
+from cds_dojson.matcher import matcher
+from cds_dojson.overdo import Overdo, OverdoBase
+from cds_dojson.utils import not_accessed_keys
 from dojson._compat import iteritems
 from dojson.errors import IgnoreKey, MissingRule
 from dojson.utils import GroupableOrderedDict
 
 
+def get_default_fields_factory(default_fields):
+    """Compile a function creating fresh default fields.
+
+    Only the containers are created for each record, the immutable values
+    are shared with the declared defaults: cheaper than deep copying them.
+
+    The containers are created eagerly rather than copied on write: the
+    rules mutate the nested containers of the output in place, e.g. by
+    appending to ``self["_migration"]["volumes"]``, so detecting the writes
+    would take proxies leaking into the converted records. The defaults are
+    at most a flat dict of a few empty lists, cheap next to the rules.
+    """
+    if isinstance(default_fields, dict):
+        factories = [
+            (key, get_default_fields_factory(value))
+            for key, value in default_fields.items()
+            if isinstance(value, (dict, list))
+        ]
+
+        def create_dict():
+            # the keys keep the declared order
+            fields = dict(default_fields)
+            for key, factory in factories:
+                fields[key] = factory()
+            return fields
+        return create_dict
+    if isinstance(default_fields, list):
+        factories = [get_default_fields_factory(v) for v in default_fields]
+        return lambda: [factory() for factory in factories]
+    return lambda: default_fields
+
+
 class CdsIlsOverdo(Overdo):
     """Overwrite API of Overdo dojson class."""
 
+    _default_fields = {}
+    """Fields initializing the translation of each record."""
+
+    def build(self):
+        """Build the rules index and reset the dispatch table."""
+        super().build()
+        # {MARC key: (name, creator, extend) or None when no rule matches}
+        self._dispatch = {}
+        self._create_default_fields = get_default_fields_factory(
+            self._default_fields
+        )
+
+    def _get_rule(self, key):
+        """Get the rule of a key, querying the index once per key."""
+        try:
+            return self._dispatch[key]
+        except KeyError:
+            result = self.index.query(key)
+            if result:
+                name, creator = result
+                result = (name, creator, getattr(creator, "__extend__", False))
+            self._dispatch[key] = result
+            return result
+
     def do(
         self,
         blob,
         ignore_missing=True,
         exception_handlers=None,
         init_fields=None,
+        missing=None,
     ):
         """Translate blob values and instantiate new model instance.
 
@@ -36,6 +95,10 @@ class CdsIlsOverdo(Overdo):
         :param exception_handlers: Give custom exception handlers to take care
                                    of non-standard codes that are installation
                                    specific.
+        :param missing: set filled with the keys which were not translated,
+                        as ``missing`` does but in the same pass.
+        :param init_fields: fields set on top of the default fields of the
+                            model.
         """
         handlers = {IgnoreKey: None}
         handlers.update(exception_handlers or {})
@@ -48,28 +111,29 @@ class CdsIlsOverdo(Overdo):
         if ignore_missing:
             handlers.setdefault(MissingRule, clean_missing)
 
-        output = {}
+        if self.index is None:
+            self.build()
+
+        output = self._create_default_fields()
 
         if init_fields:
             output.update(**init_fields)
 
-        if self.index is None:
-            self.build()
-
         if isinstance(blob, GroupableOrderedDict):
             items = blob.iteritems(repeated=True, with_order=False)
         else:
             items = iteritems(blob)
 
+        not_translated = set()
         for key, value in items:
             try:
-                result = self.index.query(key)
+                result = self._get_rule(key)
                 if not result:
                     raise MissingRule(key)
 
-                name, creator = result
+                name, creator, extend = result
                 data = creator(output, key, value)
-                if getattr(creator, "__extend__", False):
+                if extend:
                     existing = output.get(name, [])
                     existing.extend(data)
                     output[name] = existing
@@ -82,4 +146,28 @@ class CdsIlsOverdo(Overdo):
                         handler(exc, output, key, value)
                 else:
                     raise
+            finally:
+                if missing is not None:
+                    not_translated.update(
+                        "{0}{1}".format(key, subkey)
+                        for subkey in not_accessed_keys(value)
+                    )
+
+        if missing is not None:
+            missing.update(not_translated - self.__class__.__ignore_keys__)
         return output
+
+
+class CdsIlsOverdoBase(OverdoBase):
+    """Translate each record with the entry point model matching it."""
+
+    def convert(self, blob, **kwargs):
+        """Translate the blob and find its missing keys in a single pass.
+
+        :returns: the translated blob and the set of keys not translated.
+        """
+        model = matcher(blob, self.entry_point_models)
+        if not isinstance(model, CdsIlsOverdo):
+            return model.do(blob, **kwargs), model.missing(blob)
+        missing = set()
+        return model.do(blob, missing=missing, **kwargs), missing
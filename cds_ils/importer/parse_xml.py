@@ -6,15 +6,60 @@
 # the terms of the MIT License; see LICENSE file for more details.
 
 """CDS-ILS Importer xml parser module."""
+import re
+
 from flask import current_app
 from lxml import etree
 
+LOCAL_NAME_XPATH = re.compile(
+    r"^//\*\[local-name\(\) ?= ?['\"]([\w.-]+)['\"]\]$"
+)
+"""XPath matching the elements of a local name in any namespace."""
+
+
+def get_record_local_name(record_tag):
+    """Get the local name of the records selected by the record tag.
+
+    :param record_tag: local name of the records, or XPath selecting them.
+    :returns: the local name, None for the XPaths not selecting records by
+              their local name only.
+    """
+    match = LOCAL_NAME_XPATH.match(record_tag)
+    if match:
+        return match.group(1)
+    if re.match(r"^[\w.-]+$", record_tag):
+        return record_tag
+    return None
+
 
 def get_records_list(xml_file):
-    """Generate list of isolated records."""
-    record_tag_path = current_app.config["CDS_ILS_IMPORTER_RECORD_TAG"]
+    """Generate list of isolated records.
+
+    The binary file is parsed incrementally: each record is yielded as soon
+    as it is fully read and it is freed when the next one is requested, so
+    the consumer must not keep references to previously yielded records.
+    Records selected by any other XPath than their local name require the
+    whole file to be parsed first.
+    """
+    record_tag = current_app.config["CDS_ILS_IMPORTER_RECORD_TAG"]
+    local_name = get_record_local_name(record_tag)
+    if local_name is None:
+        root = etree.parse(xml_file).getroot()
+        for record in root.xpath(record_tag):
+            yield record
+        return
 
-    root = etree.parse(xml_file).getroot()
-    # namespaced XMLs
-    for record in root.xpath(record_tag_path):
+    # namespaced XMLs: match the local name in any namespace
+    context = etree.iterparse(
+        xml_file,
+        events=("end",),
+        tag="{{*}}{0}".format(local_name),
+        huge_tree=True,
+    )
+    for _, record in context:
         yield record
+        # free the processed record and its already processed siblings
+        record.clear()
+        while record.getprevious() is not None:
+            del record.getparent()[0]
+    del context
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer progress channel module.
+
+The importing workers publish the progress of their tasks on a Redis
+channel per task, relayed to the browsers as Server-Sent Events.
+
+The streams are enabled by setting ``CDS_ILS_IMPORTER_PROGRESS_REDIS_URL``,
+with the ``progress`` extra installed, the browsers poll the tasks
+otherwise. A stream holds its web server worker until the task ends or the
+stream times out: the stream endpoint has to be served by asynchronous
+(e.g. gevent) workers.
+"""
+import json
+import time
+
+from flask import current_app
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+PROGRESS_CHANNEL = "cds-ils-importer-progress:{0}"
+"""Name of the Redis channel of the progress of a task."""
+
+
+def get_progress_client():
+    """Get the Redis client of the progress channels, if configured."""
+    url = current_app.config["CDS_ILS_IMPORTER_PROGRESS_REDIS_URL"]
+    if not url:
+        return None
+    clients = current_app.extensions.setdefault(
+        "cds-ils-importer-progress", {}
+    )
+    if url not in clients:
+        if redis is None:
+            current_app.logger.warning(
+                "IMPORTER PROGRESS NOT STREAMED: the redis package is "
+                "required to stream the progress of the tasks"
+            )
+            clients[url] = None
+        else:
+            clients[url] = redis.StrictRedis.from_url(url)
+    return clients[url]
+
+
+def dump_progress(log, reports=()):
+    """Dump the state and counters of a task, with its new entries."""
+    return {
+        "id": log.id,
+        "state": log.status.value,
+        "total_entries": log.entries_count,
+        "loaded_entries": log.processed_count or 0,
+        "counters": log.dump_counters(),
+        "indexing_failures": log.indexing_failed_count or 0,
+        "reports": list(reports),
+    }
+
+
+def publish_progress(log, reports=()):
+    """Publish the progress of a task, never failing the import for it.
+
+    :param reports: dumped reports of the entries written since the last
+                    published progress.
+    """
+    client = get_progress_client()
+    if client is None:
+        return
+    try:
+        client.publish(
+            PROGRESS_CHANNEL.format(log.id),
+            json.dumps(dump_progress(log, reports)),
+        )
+    except redis.exceptions.RedisError as e:
+        current_app.logger.warning(
+            "IMPORTER PROGRESS {0} NOT PUBLISHED {1}".format(log.id, e)
+        )
+
+
+def format_event(event, data, event_id=None):
+    """Format a Server-Sent Event."""
+    formatted = "event: {0}\ndata: {1}\n\n".format(event, json.dumps(data))
+    if event_id is not None:
+        formatted = "id: {0}\n".format(event_id) + formatted
+    return formatted
+
+
+def get_last_entry_index(reports, last_entry_index=None):
+    """Get the highest index of the entries sent to a client."""
+    indexes = [report["index"] for report in reports]
+    if last_entry_index is not None:
+        indexes.append(last_entry_index)
+    return max(indexes) if indexes else None
+
+
+def stream_progress(log_id, get_progress, last_entry_index=None):
+    """Stream the progress of a task as Server-Sent Events.
+
+    A ``progress`` event is sent with the current state of the task, then
+    with each published progress, and an ``end`` event when the task is
+    finished. The stream is closed after the configured timeout, for the
+    client to reconnect.
+
+    The id of the events is the highest index of the entries sent so far,
+    sent back by the client when reconnecting: the initial state then
+    includes the entries written after it, published while disconnected.
+
+    :param get_progress: function returning the dumped progress of the
+                         task, to send its initial state, with the entries
+                         written after the given entry index.
+    :param last_entry_index: index of the last entry sent to the client
+                             before it reconnected.
+    """
+    client = get_progress_client()
+    timeout = current_app.config["CDS_ILS_IMPORTER_PROGRESS_STREAM_TIMEOUT"]
+    keepalive = current_app.config[
+        "CDS_ILS_IMPORTER_PROGRESS_STREAM_KEEPALIVE"
+    ]
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    # subscribe first, not to miss the progress published meanwhile
+    pubsub.subscribe(PROGRESS_CHANNEL.format(log_id))
+    try:
+        progress = get_progress(last_entry_index)
+        last_entry_index = get_last_entry_index(
+            progress["reports"], last_entry_index
+        )
+        yield format_event("progress", progress, last_entry_index)
+        deadline = time.monotonic() + timeout.total_seconds()
+        while progress["state"] == "RUNNING":
+            if time.monotonic() >= deadline:
+                return
+            message = pubsub.get_message(timeout=keepalive)
+            if message is None:
+                # comment lines keep the connection open
+                yield ": keepalive\n\n"
+                continue
+            progress = json.loads(message["data"])
+            last_entry_index = get_last_entry_index(
+                progress["reports"], last_entry_index
+            )
+            yield format_event("progress", progress, last_entry_index)
+        yield format_event("end", {"id": log_id})
+    finally:
+        pubsub.close()
@@ -6,15 +6,13 @@
 # the terms of the MIT License; see LICENSE file for more details.
 
 """CDS-ILS CDS Importer module."""
-from copy import deepcopy
-
 from cds_ils.importer.base_model import Base
 from cds_ils.importer.base_model import model as model_base
 
 
 def get_helper_dict():
     """Return migration extra data."""
-    _helper_dict = dict(
+    return dict(
         record_type="document",
         volumes=[],
         volumes_identifiers=[],
@@ -41,7 +39,6 @@ def get_helper_dict():
         item_medium=[],
         has_medium=False,
     )
-    return deepcopy(_helper_dict)
 
 
 class CDSBase(Base):
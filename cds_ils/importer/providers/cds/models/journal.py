@@ -9,8 +9,6 @@
 
 from __future__ import unicode_literals
 
-from copy import deepcopy
-
 from cds_ils.importer.overdo import CdsIlsOverdo
 
 from ..cds import model as cds_base
@@ -88,19 +86,6 @@ class CDSJournal(CdsIlsOverdo):
         }
     }
 
-    def do(
-        self,
-        blob,
-        ignore_missing=True,
-        exception_handlers=None,
-        init_fields=None,
-    ):
-        """Overwrite the do method."""
-        init_fields = deepcopy(self._default_fields)
-        return super().do(
-            blob, ignore_missing, exception_handlers, init_fields
-        )
-
 
 model = CDSJournal(
     bases=(cds_base, books_base), entry_point_group="cds_ils.importer.series"
@@ -9,8 +9,6 @@
 
 from __future__ import unicode_literals
 
-from copy import deepcopy
-
 from cds_ils.importer.overdo import CdsIlsOverdo
 from cds_ils.importer.providers.cds.ignore_fields import CDS_IGNORE_FIELDS
 
@@ -30,24 +28,10 @@ class CDSMultipart(CdsIlsOverdo):
     __ignore_keys__ = CDS_IGNORE_FIELDS
 
     _default_fields = {
-        "_migration": {**get_helper_dict()},
+        "_migration": {**get_helper_dict(), "record_type": "multipart"},
         "mode_of_issuance": "MULTIPART_MONOGRAPH",
     }
 
-    def do(
-        self,
-        blob,
-        ignore_missing=True,
-        exception_handlers=None,
-        init_fields=None,
-    ):
-        """Overwrite the do method."""
-        self._default_fields["_migration"]["record_type"] = "multipart"
-        init_fields = deepcopy(self._default_fields)
-        return super().do(
-            blob, ignore_missing, exception_handlers, init_fields
-        )
-
 
 model = CDSMultipart(
     bases=(
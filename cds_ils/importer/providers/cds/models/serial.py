@@ -9,8 +9,6 @@
 
 from __future__ import unicode_literals
 
-from copy import deepcopy
-
 from cds_ils.importer.overdo import CdsIlsOverdo
 from cds_ils.importer.providers.cds.ignore_fields import CDS_IGNORE_FIELDS
 
@@ -200,18 +198,5 @@ class CDSSerial(CdsIlsOverdo):
         "mode_of_issuance": "SERIAL",
     }
 
-    def do(
-        self,
-        blob,
-        ignore_missing=True,
-        exception_handlers=None,
-        init_fields=None,
-    ):
-        """Overwrite the do method."""
-        init_fields = deepcopy(self._default_fields)
-        return super().do(
-            blob, ignore_missing, exception_handlers, init_fields
-        )
-
 
 model = CDSSerial(bases=(), entry_point_group="cds_ils.importer.series")
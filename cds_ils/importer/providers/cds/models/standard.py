@@ -8,8 +8,6 @@
 
 from __future__ import unicode_literals
 
-from copy import deepcopy
-
 from cds_ils.importer.overdo import CdsIlsOverdo
 from cds_ils.importer.providers.cds.cds import get_helper_dict
 from cds_ils.importer.providers.cds.cds import model as base_model
@@ -28,19 +26,6 @@ class CDSStandard(CdsIlsOverdo):
 
     _default_fields = {"_migration": {**get_helper_dict()}}
 
-    def do(
-        self,
-        blob,
-        ignore_missing=True,
-        exception_handlers=None,
-        init_fields=None,
-    ):
-        """Overwrite the do method."""
-        init_fields = deepcopy(self._default_fields)
-        return super().do(
-            blob, ignore_missing, exception_handlers, init_fields
-        )
-
 
 model = CDSStandard(
     bases=(base_model,), entry_point_group="cds_ils.importer.cds.document"
@@ -6,8 +6,6 @@
 # the terms of the MIT License; see LICENSE file for more details.
 
 """CDS-ILS EBL Importer."""
-from copy import deepcopy
-
 from cds_ils.importer.base_model import Base
 from cds_ils.importer.base_model import model as model_base
 from cds_ils.importer.providers.ebl.ignore_fields import EBL_IGNORE_FIELDS
@@ -22,19 +20,6 @@ class EBLModel(Base):
 
     _default_fields = {"document_type": "BOOK"}
 
-    def do(
-        self,
-        blob,
-        ignore_missing=True,
-        exception_handlers=None,
-        init_fields=None,
-    ):
-        """Overwrite the do method."""
-        init_fields = deepcopy(self._default_fields)
-        return super().do(
-            blob, ignore_missing, exception_handlers, init_fields
-        )
-
 
 model = EBLModel(
     bases=(model_base,), entry_point_group="cds_ils.importer.document"
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer providers registry."""
+import pkg_resources
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+from cds_ils.importer import marc21
+
+IMPORTER_PROVIDERS_EXTENSION = "cds-ils-importer-providers"
+
+
+class ImporterProvider(object):
+    """Resolved configuration of an importer provider."""
+
+    def __init__(
+        self,
+        name,
+        importer_class,
+        dojson_model,
+        agency_code,
+        priority,
+        concurrency=1,
+        can_delete=False,
+    ):
+        """Constructor."""
+        self.name = name
+        self.importer_class = importer_class
+        self.dojson_model = dojson_model
+        self.agency_code = agency_code
+        self.priority = priority
+        self.concurrency = concurrency
+        self.can_delete = can_delete
+
+
+class ImporterProvidersRegistry(object):
+    """Providers of an application, resolved once from the configuration."""
+
+    def __init__(self, providers):
+        """Constructor."""
+        self._providers = {provider.name: provider for provider in providers}
+
+    @classmethod
+    def build(cls, config):
+        """Resolve the configured providers and their importer classes."""
+        entry_points = pkg_resources.get_entry_map(
+            "cds-ils", "cds_ils.importers"
+        )
+        allowed_to_delete = config[
+            "CDS_ILS_IMPORTER_PROVIDERS_ALLOWED_TO_DELETE_RECORDS"
+        ]
+        return cls(
+            ImporterProvider(
+                name,
+                entry_points[name].load(),
+                marc21,
+                provider_config["agency_code"],
+                provider_config["priority"],
+                concurrency=provider_config.get("concurrency", 1),
+                can_delete=name in allowed_to_delete,
+            )
+            for name, provider_config in config[
+                "CDS_ILS_IMPORTER_PROVIDERS"
+            ].items()
+        )
+
+    def get(self, name):
+        """Get a provider by name."""
+        return self._providers[name]
+
+
+def _get_importer_providers():
+    """Get the providers registry of the application, building it once."""
+    registry = current_app.extensions.get(IMPORTER_PROVIDERS_EXTENSION)
+    if registry is None:
+        registry = ImporterProvidersRegistry.build(current_app.config)
+        current_app.extensions[IMPORTER_PROVIDERS_EXTENSION] = registry
+    return registry
+
+
+current_importer_providers = LocalProxy(_get_importer_providers)
+"""Proxy to the importer providers registry of the current application."""
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer entries reports module."""
+
+DOCUMENT_REPORT_FIELDS = ("pid", "title", "edition", "publication_year")
+"""Fields of the documents stored in the entries reports."""
+
+EITEM_REPORT_FIELDS = ("pid", "document_pid", "open_access")
+"""Fields of the eitems stored in the entries reports."""
+
+SERIES_REPORT_FIELDS = ("pid", "title", "mode_of_issuance")
+"""Fields of the series stored in the entries reports."""
+
+
+def compact_record(record, fields):
+    """Keep only the summary fields of a reported record."""
+    if not record:
+        return record
+    return {field: record[field] for field in fields if field in record}
+
+
+def compact_records(records, fields):
+    """Keep only the summary fields of a list of reported records."""
+    if records is None:
+        return None
+    return [compact_record(record, fields) for record in records]
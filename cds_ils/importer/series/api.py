@@ -10,6 +10,9 @@
 from elasticsearch_dsl import Q
 from invenio_app_ils.proxies import current_app_ils
 
+from cds_ils.literature.identifiers import CANONICAL_IDENTIFIERS_FIELD, \
+    get_canonical_identifier
+
 
 def search_series_by_isbn(isbn):
     """Find series by ISBN."""
@@ -35,3 +38,16 @@ def search_series_by_issn(issn):
         ],
     )
     return search
+
+
+def search_series_by_canonical_identifier(scheme, value):
+    """Find series by an identifier, in canonical form."""
+    series_search = current_app_ils.series_search_cls()
+    return series_search.filter(
+        Q(
+            "term",
+            **{CANONICAL_IDENTIFIERS_FIELD: get_canonical_identifier(
+                scheme, value
+            )}
+        )
+    )
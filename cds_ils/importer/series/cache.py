@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer series cache."""
+from collections import OrderedDict
+from functools import partial
+
+from flask import current_app
+from invenio_app_ils.errors import IlsValidationError
+from invenio_app_ils.proxies import current_app_ils
+from invenio_db import db
+
+from cds_ils.importer.indexer import index_record
+from cds_ils.importer.transactions import commit
+from cds_ils.literature.identifiers import get_canonical_value
+
+
+class SeriesCache(object):
+    """Series resolved by an import run.
+
+    The series having an identifier, in its canonical form, are searched
+    once per run, and the series created by the run are registered
+    immediately, so that they are matched before the search index is
+    refreshed. The identifiers merged
+    into the same series by many records are stored with a single update
+    when the cache is flushed.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        # {(scheme, value): pids found by the search}
+        self._searched = {}
+        # {(scheme, value): pids of the series created by the run}
+        self._created = {}
+        # {pid: series record}
+        self._records = {}
+        # {pid: series record} with merged identifiers to store
+        self._changed = OrderedDict()
+        # functions undoing the changes, while journaling
+        self._journal = None
+
+    def search(self, scheme, value, search):
+        """Get the pids of the series having an identifier.
+
+        :param search: function searching the pids of the series having
+                       the identifier value, called once per identifier.
+        """
+        key = (scheme, get_canonical_value(scheme, value))
+        pids = self._searched.get(key)
+        if pids is None:
+            pids = self._searched[key] = search(value)
+        created = self._created.get(key, [])
+        return pids + [pid for pid in created if pid not in pids]
+
+    def get_record(self, pid):
+        """Get a series record, loading it once."""
+        series = self._records.get(pid)
+        if series is None:
+            series_class = current_app_ils.series_record_cls
+            series = self._records[pid] = series_class.get_record_by_pid(pid)
+        return series
+
+    def add(self, series):
+        """Register a series created by the run."""
+        pid = series["pid"]
+        self._records[pid] = series
+        self._undo(partial(self._records.pop, pid, None))
+        for identifier in series.get("identifiers", []):
+            scheme = identifier["scheme"]
+            key = (scheme, get_canonical_value(scheme, identifier["value"]))
+            created = self._created.setdefault(key, [])
+            created.append(pid)
+            self._undo(created.remove, pid)
+
+    def merge_identifiers(self, series, identifiers):
+        """Set the identifiers of a series, stored when flushed."""
+        pid = series["pid"]
+        self._undo(series.__setitem__, "identifiers", series["identifiers"])
+        if pid not in self._changed:
+            self._undo(self._changed.pop, pid, None)
+        series["identifiers"] = identifiers
+        self._changed[pid] = series
+
+    def _undo(self, function, *args):
+        """Record how to undo a change."""
+        if self._journal is not None:
+            self._journal.append(partial(function, *args))
+
+    def begin(self):
+        """Start recording the changes, to be able to undo them."""
+        self._journal = []
+
+    def commit(self):
+        """Keep the recorded changes."""
+        self._journal = None
+
+    def rollback(self):
+        """Undo the changes recorded since ``begin``."""
+        for undo in reversed(self._journal):
+            undo()
+        self._journal = None
+
+    def flush(self, indexing_buffer=None, unit_of_work=None):
+        """Store and index the series with merged identifiers."""
+        series_indexer = current_app_ils.series_indexer
+        for series in self._changed.values():
+            try:
+                with db.session.begin_nested():
+                    series.commit()
+            except IlsValidationError as e:
+                current_app.logger.error(
+                    "IMPORTER SERIES {0} UPDATE ERROR {1}".format(
+                        series["pid"], e.original_exception.message
+                    )
+                )
+                continue
+            index_record(series_indexer, series, indexing_buffer)
+        self._changed = OrderedDict()
+        commit(unit_of_work)
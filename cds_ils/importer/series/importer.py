@@ -8,19 +8,21 @@
 """CDS-ILS Series Importer."""
 
 import uuid
-from copy import deepcopy
+from functools import partial
 
 import click
+from flask import current_app
 from invenio_app_ils.errors import IlsValidationError, RecordRelationsError
 from invenio_app_ils.proxies import current_app_ils
 from invenio_app_ils.records_relations.api import RecordRelationsParentChild
 from invenio_app_ils.relations.api import Relation
 from invenio_app_ils.series.api import SeriesIdProvider
-from invenio_db import db
 
 from cds_ils.importer.errors import SeriesImportError
-from cds_ils.importer.series.api import search_series_by_isbn, \
+from cds_ils.importer.series.api import \
+    search_series_by_canonical_identifier, search_series_by_isbn, \
     search_series_by_issn
+from cds_ils.importer.transactions import commit, rollback, savepoint
 
 
 class SeriesImporter(object):
@@ -30,10 +32,15 @@ class SeriesImporter(object):
         self,
         json_metadata,
         metadata_provider,
+        unit_of_work=None,
+        series_cache=None,
     ):
         """Constructor."""
         self.json_data = json_metadata
         self.metadata_provider = metadata_provider
+        self.unit_of_work = unit_of_work
+        self.series_cache = series_cache
+        self.changed = False
 
     def _set_record_import_source(self, record_dict):
         """Set the import source for document."""
@@ -44,10 +51,12 @@ class SeriesImporter(object):
 
     def _before_create(self, json_series):
         """Perform before create metadata modification."""
-        cleaned = deepcopy(json_series)
-
-        if "volume" in cleaned:
-            del cleaned["volume"]
+        # the volume is left out, the other fields are shared not copied
+        cleaned = {
+            field: value
+            for field, value in json_series.items()
+            if field != "volume"
+        }
         # save the import source
         self._set_record_import_source(cleaned)
         cleaned["mode_of_issuance"] = "SERIAL"
@@ -65,17 +74,27 @@ class SeriesImporter(object):
         return existing_identifiers + new_identifiers
 
     def update_series(self, matched_series, json_series):
-        """Update series record."""
-        matched_series["identifiers"] = self._update_field_identifiers(
+        """Update series record, unless nothing changed."""
+        identifiers = self._update_field_identifiers(
             matched_series, json_series
         )
+        if identifiers == matched_series["identifiers"]:
+            return
+        if self.series_cache is not None:
+            # stored once per series with the other merges of the run
+            self.series_cache.merge_identifiers(matched_series, identifiers)
+            self.changed = True
+            return
+        matched_series["identifiers"] = identifiers
         try:
-            matched_series.commit()
-            db.session.commit()
+            with savepoint(self.unit_of_work):
+                matched_series.commit()
+            commit(self.unit_of_work)
+            self.changed = True
         except IlsValidationError as e:
             click.secho("Field: {}".format(e.errors[0].res["field"]), fg="red")
             click.secho(e.original_exception.message, fg="red")
-            db.session.rollback()
+            rollback(self.unit_of_work)
             # raise e TODO handle the incorrect records in the logging
 
     def create_series(self, json_series):
@@ -84,20 +103,23 @@ class SeriesImporter(object):
         series_class = current_app_ils.series_record_cls
 
         record_uuid = uuid.uuid4()
-        provider = SeriesIdProvider.create(
-            object_type="rec",
-            object_uuid=record_uuid,
-        )
-        cleaned_json["pid"] = provider.pid.pid_value
-
         try:
-            series = series_class.create(cleaned_json, record_uuid)
-            db.session.commit()
+            with savepoint(self.unit_of_work):
+                provider = SeriesIdProvider.create(
+                    object_type="rec",
+                    object_uuid=record_uuid,
+                )
+                cleaned_json["pid"] = provider.pid.pid_value
+                series = series_class.create(cleaned_json, record_uuid)
+            commit(self.unit_of_work)
+            self.changed = True
+            if self.series_cache is not None:
+                self.series_cache.add(series)
             return series
         except IlsValidationError as e:
             click.secho("Field: {}".format(e.errors[0].res["field"]), fg="red")
             click.secho(e.original_exception.message, fg="red")
-            db.session.rollback()
+            rollback(self.unit_of_work)
             # raise e TODO handle the incorrect records in the logging
 
     def search_for_matching_series(self, json_series):
@@ -118,17 +140,49 @@ class SeriesImporter(object):
         # check by issn first
 
         for issn in issn_list:
-            search = search_series_by_issn(issn)
-            results = search.scan()
-            matches += [x.pid for x in results if x.pid not in matches]
+            pids = self._search_series_pids(
+                "ISSN", issn, search_series_by_issn
+            )
+            matches += [pid for pid in pids if pid not in matches]
 
         for isbn in isbn_list:
-            search = search_series_by_isbn(isbn)
-            results = search.scan()
-            matches += [x.pid for x in results if x.pid not in matches]
+            pids = self._search_series_pids(
+                "ISBN", isbn, search_series_by_isbn
+            )
+            matches += [pid for pid in pids if pid not in matches]
 
         return matches
 
+    def has_new_series(self):
+        """Check if importing the record would create a series."""
+        return any(
+            not self.search_for_matching_series(json_series)
+            for json_series in self.json_data or []
+        )
+
+    def _search_series_pids(self, scheme, value, search_series):
+        """Search the pids of the series, through the run cache if any."""
+        if current_app.config[
+            "CDS_ILS_IMPORTER_MATCH_CANONICAL_IDENTIFIERS"
+        ]:
+            search_series = partial(
+                search_series_by_canonical_identifier, scheme
+            )
+
+        def search(value):
+            return [hit.pid for hit in search_series(value).scan()]
+
+        if self.series_cache is None:
+            return search(value)
+        return self.series_cache.search(scheme, value, search)
+
+    def _get_series(self, pid):
+        """Get a series record, through the run cache if any."""
+        if self.series_cache is None:
+            series_class = current_app_ils.series_record_cls
+            return series_class.get_record_by_pid(pid)
+        return self.series_cache.get_record(pid)
+
     def import_serial_relation(
         self, series_record, document_record, json_series
     ):
@@ -137,18 +191,19 @@ class SeriesImporter(object):
             rr = RecordRelationsParentChild()
             serial_relation = Relation.get_relation_by_name("serial")
             volume = json_series.get("volume", None)
-            rr.add(
-                series_record,
-                document_record,
-                relation_type=serial_relation,
-                volume=volume,
-            )
+            with savepoint(self.unit_of_work):
+                rr.add(
+                    series_record,
+                    document_record,
+                    relation_type=serial_relation,
+                    volume=volume,
+                )
+            self.changed = True
         except RecordRelationsError as e:
             click.secho(str(e), fg="red")
 
     def import_series(self, document):
         """Import series."""
-        series_class = current_app_ils.series_record_cls
         if self.json_data is None:
             return []
 
@@ -157,9 +212,7 @@ class SeriesImporter(object):
             matching_series_pids = self.search_for_matching_series(json_series)
 
             if len(matching_series_pids) == 1:
-                matching_series = series_class.get_record_by_pid(
-                    matching_series_pids[0]
-                )
+                matching_series = self._get_series(matching_series_pids[0])
                 self.update_series(matching_series, json_series)
                 series.append(matching_series)
                 self.import_serial_relation(
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer source files module.
+
+The uploaded files are stored as they are sent, possibly gzip or zstd
+compressed, and decompressed in a stream while they are parsed.
+The sources are either MARCXML files or NDJSON files of records already
+converted by the conversion stage.
+"""
+import gzip
+import hashlib
+import io
+import json
+import zlib
+
+from cds_ils.importer.errors import ImporterSourceError
+from cds_ils.importer.parse_xml import get_records_list
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+"""Number of bytes of the uploaded files written at once."""
+
+
+def _open_gzip(source_path):
+    """Open a gzip compressed source file."""
+    return gzip.open(source_path, "rb")
+
+
+def _open_zstd(source_path):
+    """Open a zstd compressed source file."""
+    if zstandard is None:
+        raise ImporterSourceError(
+            "The zstandard package is required to import {0}".format(
+                source_path
+            )
+        )
+    decompressor = zstandard.ZstdDecompressor()
+    return decompressor.stream_reader(open(source_path, "rb"), closefd=True)
+
+
+DECOMPRESSION_ERRORS = (OSError, EOFError, zlib.error) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
+"""Errors raised when reading corrupted compressed files."""
+
+COMPRESSIONS = {
+    ".gz": _open_gzip,
+    ".zst": _open_zstd,
+}
+"""Openers of the compressed source files, by extension."""
+
+SOURCE_TYPES = {
+    ".xml": "marcxml",
+    ".ndjson": "ndjson",
+}
+"""Types of the source files, by extension."""
+
+
+def get_source_extension(filename, allowed_extensions):
+    """Get the allowed extension of a file, the longest one matching.
+
+    :returns: the extension, e.g. ``.xml.gz``, or None if not allowed.
+    """
+    filename = filename.lower()
+    matching = [
+        extension
+        for extension in allowed_extensions
+        if filename.endswith(extension.lower())
+    ]
+    return max(matching, key=len) if matching else None
+
+
+def get_source_type(filename):
+    """Get the type of a source file from its extension.
+
+    :returns: the source type, or None if unknown.
+    """
+    filename = filename.lower()
+    for extension in COMPRESSIONS:
+        if filename.endswith(extension):
+            filename = filename[:-len(extension)]
+    for extension, source_type in SOURCE_TYPES.items():
+        if filename.endswith(extension):
+            return source_type
+    return None
+
+
+def open_source(source_path):
+    """Open a source file for reading, decompressing it in a stream."""
+    for extension, opener in COMPRESSIONS.items():
+        if source_path.lower().endswith(extension):
+            return opener(source_path)
+    return open(source_path, "rb")
+
+
+def get_ndjson_records(source):
+    """Generate the records of a binary NDJSON file, one per line."""
+    lines = io.TextIOWrapper(source, encoding="utf-8")
+    try:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        # leave the source open, it is closed by its owner
+        lines.detach()
+
+
+def get_source_records(source, source_type):
+    """Generate the records of a source file of the given type."""
+    if source_type == "ndjson":
+        return get_ndjson_records(source)
+    return get_records_list(source)
+
+
+def count_source_records(source_path, source_type="marcxml"):
+    """Count the records of a source file.
+
+    The compressed files cannot be rewound, they are read twice instead.
+    """
+    with open_source(source_path) as source:
+        return sum(1 for _ in get_source_records(source, source_type))
+
+
+def save_upload(stream, destination_path):
+    """Write an uploaded file in chunks and compute its checksum.
+
+    The checksum is the one of the decompressed content, read back from the
+    written file: the same records uploaded with another compression have
+    the same checksum.
+
+    :param stream: the binary stream of the uploaded file.
+    :returns: the SHA-256 hex digest of the decompressed content.
+    :raises ImporterSourceError: if the file cannot be decompressed.
+    """
+    with open(destination_path, "wb") as destination:
+        for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b""):
+            destination.write(chunk)
+    checksum = hashlib.sha256()
+    try:
+        with open_source(destination_path) as source:
+            for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+                checksum.update(chunk)
+    except DECOMPRESSION_ERRORS:
+        raise ImporterSourceError(
+            "The uploaded file cannot be decompressed"
+        )
+    return checksum.hexdigest()
@@ -6,12 +6,100 @@
 # the terms of the MIT License; see LICENSE file for more details.
 
 """CDS-ILS Importer tasks."""
-from celery import shared_task
+from celery import chord, shared_task
+from flask import current_app
 
-from cds_ils.importer.api import import_from_xml
+from cds_ils.importer.api import finish_sharded_import, get_import_shards, \
+    import_from_xml, import_shard_from_xml, promote_preview, resume_import
+from cds_ils.importer.conversion import convert_file, get_conversion_shards, \
+    get_shard_path, merge_converted_shards
 
 
 @shared_task
 def import_from_xml_task(log_id, source_path, source_type, provider, mode):
-    """Load a single xml file task."""
-    import_from_xml(log_id, source_path, source_type, provider, mode)
+    """Load a single xml file task.
+
+    The file is split in shards imported in parallel when the provider
+    allows it, the task log is closed when all of them are completed.
+    """
+    shards = get_import_shards(log_id, source_path, provider)
+    if len(shards) == 1:
+        import_from_xml(log_id, source_path, source_type, provider, mode)
+        return
+
+    args = (log_id, source_path, source_type, provider, mode)
+    chord(
+        import_shard_from_xml_task.s(*args, start, stop)
+        for start, stop in shards
+    )(finish_sharded_import_task.s(*args))
+
+
+@shared_task
+def import_shard_from_xml_task(
+    log_id, source_path, source_type, provider, mode, start, stop
+):
+    """Load a range of entries of a xml file task."""
+    return import_shard_from_xml(
+        log_id, source_path, source_type, provider, mode, start, stop
+    )
+
+
+@shared_task
+def finish_sharded_import_task(
+    shard_results, log_id, source_path, source_type, provider, mode
+):
+    """Import the deferred entries and close the parallel import task."""
+    finish_sharded_import(
+        shard_results, log_id, source_path, source_type, provider, mode
+    )
+
+
+@shared_task
+def resume_import_task(log_id):
+    """Resume an interrupted import task."""
+    resume_import(log_id)
+
+
+@shared_task
+def promote_preview_task(preview_log_id, log_id):
+    """Import the records of a previewed task."""
+    promote_preview(preview_log_id, log_id)
+
+
+@shared_task
+def convert_file_task(source_path, destination_path, provider):
+    """Convert the MARCXML records of a file to a NDJSON file task.
+
+    The file is split in shards converted in parallel by the workers, their
+    NDJSON files are merged when all of them are completed.
+    """
+    shards = get_conversion_shards(
+        source_path,
+        current_app.config["CDS_ILS_IMPORTER_CONVERSION_SHARDS"],
+    )
+    shard_paths = [get_shard_path(destination_path, start)
+                   for start, _ in shards]
+    if not shards:
+        merge_converted_shards(shard_paths, destination_path)
+        return
+
+    chord(
+        convert_shard_task.s(source_path, shard_path, provider, start, stop)
+        for shard_path, (start, stop) in zip(shard_paths, shards)
+    )(merge_converted_shards_task.si(shard_paths, destination_path))
+
+
+@shared_task
+def convert_shard_task(source_path, shard_path, provider, start, stop):
+    """Convert a range of records of a MARCXML file task."""
+    # the workers convert the shards in parallel
+    return convert_file(
+        source_path, shard_path, provider, processes=1, start=start,
+        stop=stop
+    )
+
+
+@shared_task
+def merge_converted_shards_task(shard_paths, destination_path):
+    """Merge the NDJSON files of the converted shards task."""
+    merge_converted_shards(shard_paths, destination_path)
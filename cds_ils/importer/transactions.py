@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS Importer transactions module."""
+from contextlib import contextmanager
+
+from invenio_db import db
+
+
+class UnitOfWork(object):
+    """Import many records in a single transaction.
+
+    Each record is imported in its own savepoint, rolled back alone when
+    the record fails, and the transaction is committed every
+    ``commit_size`` records, if given, or when explicitly committed.
+    """
+
+    def __init__(self, commit_size=None):
+        """Constructor."""
+        self.commit_size = commit_size
+        self._records = 0
+
+    @contextmanager
+    def record(self):
+        """Import a record in a savepoint."""
+        with db.session.begin_nested():
+            yield
+        self._records += 1
+        if self.commit_size and self._records >= self.commit_size:
+            self.commit()
+
+    def commit(self):
+        """Commit the records imported so far."""
+        db.session.commit()
+        self._records = 0
+
+
+@contextmanager
+def savepoint(unit_of_work=None):
+    """Run a write operation in its own savepoint within a unit of work.
+
+    Failed operations are then rolled back without losing the changes of
+    the previous records and operations of the unit of work.
+    """
+    if unit_of_work is None:
+        yield
+    else:
+        with db.session.begin_nested():
+            yield
+
+
+def commit(unit_of_work=None):
+    """Commit a write operation, unless it is part of a unit of work."""
+    if unit_of_work is None:
+        db.session.commit()
+
+
+def rollback(unit_of_work=None):
+    """Roll back a failed write operation.
+
+    Within a unit of work, the savepoint of the operation is already
+    rolled back.
+    """
+    if unit_of_work is None:
+        db.session.rollback()
@@ -12,32 +12,41 @@ import os
 import uuid
 
 import arrow
-from flask import Blueprint, abort, request
+from flask import Blueprint, Response, abort, request, stream_with_context
 from invenio_app_ils.permissions import need_permissions
+from invenio_db import db
 from webargs import fields
 from webargs.flaskparser import use_kwargs
 
+from cds_ils.importer.api import create_promotion_task, get_resumable_task
+from cds_ils.importer.errors import ImporterSourceError, \
+    ImporterTaskNotPromotable, ImporterTaskNotResumable
 from cds_ils.importer.models import ImporterAgent, ImporterMode, \
     ImporterTaskEntry, ImporterTaskLog
-from cds_ils.importer.tasks import import_from_xml_task
+from cds_ils.importer.progress import dump_progress, get_progress_client, \
+    stream_progress
+from cds_ils.importer.sources import get_source_extension, get_source_type, \
+    save_upload
+from cds_ils.importer.tasks import import_from_xml_task, \
+    promote_preview_task, resume_import_task
 
 
 def create_importer_blueprint(app):
     """Add importer views to the blueprint."""
     blueprint = Blueprint("invenio_app_ils_importer", __name__)
 
-    def allowed_files(filename):
-        """Checks the extension of the files."""
-        allowed_extensions = app.config[
-            "CDS_ILS_IMPORTER_FILE_EXTENSIONS_ALLOWED"
-        ]
-        return filename.lower().endswith(tuple(allowed_extensions))
-
     def rename_file(filename):
-        """Renames filename with an unique name."""
+        """Renames filename with an unique name, keeping its extension.
+
+        :returns: the new filename, or None if its extension is not allowed.
+        """
+        ext = get_source_extension(
+            filename, app.config["CDS_ILS_IMPORTER_FILE_EXTENSIONS_ALLOWED"]
+        )
+        if not ext:
+            return None
         unique_filename = uuid.uuid4().hex
-        ext = filename.rsplit(".", 1)[1]
-        return unique_filename + "." + ext
+        return unique_filename + ext.lower()
 
     def dump_log(log):
         """Dumps a database log entry."""
@@ -54,6 +63,9 @@ def create_importer_blueprint(app):
         }
         if log.entries_count:
             obj["total_entries"] = log.entries_count
+            obj["loaded_entries"] = log.processed_count or 0
+        obj["counters"] = log.dump_counters()
+        obj["indexing_failures"] = log.indexing_failed_count or 0
         return obj
 
     @blueprint.errorhandler(413)
@@ -71,63 +83,96 @@ def create_importer_blueprint(app):
     def check_next(log_id, next_entry):
         log = ImporterTaskLog.query.filter_by(id=log_id).first()
         if log:
-            children_entries_query = ImporterTaskEntry.query \
-                .filter_by(import_id=log_id)
-            entries = children_entries_query \
+            max_page_size = app.config["CDS_ILS_IMPORTER_CHECK_MAX_PAGE_SIZE"]
+            page_size = request.args.get("size", max_page_size, type=int)
+            page_size = max(1, min(page_size, max_page_size))
+            # one more entry is fetched to know if there are more pages
+            entries = ImporterTaskEntry.query \
+                .filter_by(import_id=log_id) \
                 .filter(ImporterTaskEntry.entry_index >= next_entry) \
                 .order_by(ImporterTaskEntry.entry_index.asc()) \
+                .limit(page_size + 1) \
                 .all()
             obj = dump_log(log)
-            if log.entries_count:
-                obj["loaded_entries"] = children_entries_query.count()
-            reports = []
-            for entry in entries:
-                if not entry.error:
-                    reports.append({
-                        "index": entry.entry_index,
-                        "success": True,
-                        "report": {
-                            "ambiguous_documents": entry.ambiguous_documents,
-                            "ambiguous_eitems": entry.ambiguous_eitems,
-                            "created_document": entry.created_document,
-                            "created_eitem": entry.created_eitem,
-                            "updated_document": entry.updated_document,
-                            "updated_eitem": entry.updated_eitem,
-                            "deleted_eitems": entry.deleted_eitems,
-                            "series": entry.series,
-                            "fuzzy_documents": entry.fuzzy_documents,
-                        }
-                    })
-                else:
-                    reports.append({
-                        "index": entry.entry_index,
-                        "success": False,
-                        "message": entry.error,
-                    })
-            obj["reports"] = reports
+            obj["more_entries"] = len(entries) > page_size
+            entries = entries[:page_size]
+            obj["reports"] = [entry.dump() for entry in entries]
+            obj["next_entry"] = (
+                entries[-1].entry_index + 1 if entries else next_entry
+            )
             return obj
         else:
             abort(404, "Task not found")
 
+    @blueprint.route("/importer/check/<int:log_id>/status", methods=["GET"])
+    @need_permissions("document-importer")
+    def check_status(log_id):
+        log = ImporterTaskLog.query.filter_by(id=log_id).first()
+        if not log:
+            abort(404, "Task not found")
+        return dump_log(log)
+
+    @blueprint.route("/importer/check/<int:log_id>/stream", methods=["GET"])
+    @need_permissions("document-importer")
+    def check_stream(log_id):
+        """Stream the progress of a task, the clients poll it otherwise."""
+        if get_progress_client() is None:
+            abort(501, "Progress stream not available")
+        if not ImporterTaskLog.query.filter_by(id=log_id).count():
+            abort(404, "Task not found")
+
+        def get_progress(last_entry_index):
+            log = ImporterTaskLog.query.filter_by(id=log_id).one()
+            entries = []
+            if last_entry_index is not None:
+                # the entries written while the client was reconnecting
+                entries = ImporterTaskEntry.query \
+                    .filter_by(import_id=log_id) \
+                    .filter(ImporterTaskEntry.entry_index > last_entry_index) \
+                    .order_by(ImporterTaskEntry.entry_index.asc()) \
+                    .limit(max_page_size + 1) \
+                    .all()
+            progress = dump_progress(
+                log, [entry.dump() for entry in entries[:max_page_size]]
+            )
+            # the others are polled
+            progress["more_entries"] = len(entries) > max_page_size
+            # release the database connection while streaming
+            db.session.close()
+            return progress
+
+        max_page_size = app.config["CDS_ILS_IMPORTER_CHECK_MAX_PAGE_SIZE"]
+        last_entry_index = request.headers.get("Last-Event-ID", type=int)
+        return Response(
+            stream_with_context(
+                stream_progress(log_id, get_progress, last_entry_index)
+            ),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     @blueprint.route("/importer", methods=["POST"])
     @use_kwargs({"provider": fields.Str(required=True)})
     @use_kwargs({"mode": fields.Str(required=True)})
     @need_permissions("document-importer")
     def importer(provider, mode):
+        importer_mode_map = dict(
+            create=ImporterMode.CREATE,
+            delete=ImporterMode.DELETE,
+            preview=ImporterMode.PREVIEW,
+        )
+
         def create_import_task(source_path, original_filename, source_type,
-                               provider, mode):
+                               source_checksum, provider, mode):
             """Creates a task and returns its associated identifier."""
-            importer_mode_map = dict(
-                create=ImporterMode.CREATE,
-                delete=ImporterMode.DELETE,
-            )
-
             log = ImporterTaskLog.create(dict(
                 agent=ImporterAgent.USER,
                 provider=provider,
                 source_type=source_type,
                 mode=importer_mode_map[mode],
                 original_filename=original_filename,
+                source_path=source_path,
+                source_checksum=source_checksum,
             ))
 
             import_from_xml_task.apply_async((
@@ -136,6 +181,15 @@ def create_importer_blueprint(app):
 
             return log.id
 
+        def get_duplicate_task(source_checksum, provider, mode):
+            """Get the recent task which imported the same file."""
+            window = app.config["CDS_ILS_IMPORTER_DUPLICATE_UPLOADS_WINDOW"]
+            if not window:
+                return None
+            return ImporterTaskLog.get_duplicate(
+                source_checksum, provider, importer_mode_map[mode], window
+            )
+
         if request.files:
             file = request.files["file"]
 
@@ -145,19 +199,36 @@ def create_importer_blueprint(app):
             if not mode:
                 abort(400, "Missing mode")
 
-            if allowed_files(file.filename):
+            if mode not in importer_mode_map:
+                abort(400, "Unknown mode")
+
+            filename = rename_file(file.filename)
+            if filename:
                 original_filename = file.filename
-                file.filename = rename_file(file.filename)
                 source_path = os.path.join(
                     app.config["CDS_ILS_IMPORTER_UPLOADS_PATH"],
-                    file.filename
+                    filename
                 )
-                file.save(source_path)
+                # stream the upload to the disk, compressed files included
+                try:
+                    source_checksum = save_upload(file.stream, source_path)
+                except ImporterSourceError as e:
+                    os.remove(source_path)
+                    abort(400, str(e))
+
+                duplicate = get_duplicate_task(source_checksum, provider, mode)
+                if duplicate:
+                    os.remove(source_path)
+                    return (json.dumps({"id": duplicate.id,
+                                        "duplicate": True}),
+                            200,
+                            {"ContentType": "application/json"})
 
-                source_type = "marcxml"
+                source_type = get_source_type(filename)
                 log_id = create_import_task(source_path,
                                             original_filename,
                                             source_type,
+                                            source_checksum,
                                             provider, mode)
 
                 return (json.dumps({"id": log_id}),
@@ -168,6 +239,30 @@ def create_importer_blueprint(app):
         else:
             abort(400, "Missing file")
 
+    @blueprint.route("/importer/<int:log_id>/resume", methods=["POST"])
+    @need_permissions("document-importer")
+    def resume(log_id):
+        try:
+            get_resumable_task(log_id)
+        except ImporterTaskNotResumable as e:
+            abort(400, str(e))
+        resume_import_task.apply_async((log_id,))
+        return (json.dumps({"id": log_id}),
+                202,
+                {"ContentType": "application/json"})
+
+    @blueprint.route("/importer/<int:log_id>/promote", methods=["POST"])
+    @need_permissions("document-importer")
+    def promote(log_id):
+        try:
+            log = create_promotion_task(log_id, ImporterAgent.USER)
+        except ImporterTaskNotPromotable as e:
+            abort(400, str(e))
+        promote_preview_task.apply_async((log_id, log.id))
+        return (json.dumps({"id": log.id}),
+                201,
+                {"ContentType": "application/json"})
+
     @blueprint.route("/importer/list", methods=["GET"])
     @need_permissions("document-importer")
     def importer_list():
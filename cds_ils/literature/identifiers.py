@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Literature canonical identifiers."""
+
+import re
+
+from invenio_app_ils.proxies import current_app_ils
+from invenio_indexer.signals import before_record_index
+from invenio_search import current_search_client
+from invenio_search.utils import build_alias_name
+
+from cds_ils.search import is_keyword_field
+
+CANONICAL_IDENTIFIERS_FIELD = "canonical_identifiers"
+"""Keyword field of the documents and series storing their identifiers."""
+
+CANONICAL_SCHEMES = ("ISBN", "ISSN")
+"""Schemes of the identifiers stored in their canonical form."""
+
+SEPARATORS = re.compile(r"[\s\-]+")
+
+
+def _compact(value):
+    """Remove the separators of an identifier value."""
+    return SEPARATORS.sub("", value or "").upper()
+
+
+def _isbn13_check_digit(digits):
+    """Compute the check digit of the first 12 digits of an ISBN-13."""
+    total = sum(
+        int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(digits)
+    )
+    return str((10 - total % 10) % 10)
+
+
+def normalize_isbn(value):
+    """Fold a valid ISBN-10 or ISBN-13 to a bare ISBN-13, else None."""
+    isbn = _compact(value)
+    if len(isbn) == 10 and isbn[:9].isdigit() and \
+            (isbn[9].isdigit() or isbn[9] == "X"):
+        total = sum(
+            (10 - i) * (10 if char == "X" else int(char))
+            for i, char in enumerate(isbn)
+        )
+        if total % 11:
+            return None
+        digits = "978" + isbn[:9]
+        return digits + _isbn13_check_digit(digits)
+    if len(isbn) == 13 and isbn.isdigit() and isbn[:3] in ("978", "979"):
+        if _isbn13_check_digit(isbn[:12]) != isbn[12]:
+            return None
+        return isbn
+    return None
+
+
+def normalize_issn(value):
+    """Format a valid ISSN as ``NNNN-NNNC``, else None."""
+    issn = _compact(value)
+    if len(issn) != 8 or not issn[:7].isdigit():
+        return None
+    total = sum((8 - i) * int(digit) for i, digit in enumerate(issn[:7]))
+    check_digit = (11 - total % 11) % 11
+    if issn[7] != ("X" if check_digit == 10 else str(check_digit)):
+        return None
+    return "{}-{}".format(issn[:4], issn[4:])
+
+
+NORMALIZERS = {
+    "ISBN": normalize_isbn,
+    "ISSN": normalize_issn,
+}
+
+
+def get_canonical_value(scheme, value):
+    """Get the canonical form of an identifier value.
+
+    Invalid values are only stripped of their separators, so that they
+    still match the same invalid values.
+    """
+    normalizer = NORMALIZERS.get(scheme)
+    if normalizer is None:
+        return value
+    return normalizer(value) or _compact(value)
+
+
+def get_canonical_identifier(scheme, value):
+    """Get the canonical ``SCHEME:value`` term of an identifier."""
+    return "{}:{}".format(scheme, get_canonical_value(scheme, value))
+
+
+def get_canonical_identifiers(identifiers):
+    """Get the unique canonical terms of the ISBN and ISSN identifiers."""
+    terms = []
+    for identifier in identifiers:
+        if identifier.get("scheme") not in CANONICAL_SCHEMES:
+            continue
+        term = get_canonical_identifier(
+            identifier["scheme"], identifier.get("value")
+        )
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def index_canonical_identifiers(
+    sender, json=None, record=None, index=None, **kwargs
+):
+    """Add the canonical identifiers to a record before indexing it.
+
+    The canonical identifiers are only added once mapped as a keyword, so
+    that they are not mapped dynamically as a text field.
+    """
+    if not is_keyword_field(index, CANONICAL_IDENTIFIERS_FIELD):
+        return
+    terms = get_canonical_identifiers(json.get("identifiers", []))
+    if terms:
+        json[CANONICAL_IDENTIFIERS_FIELD] = terms
+
+
+def register_canonical_identifiers_signals(app):
+    """Index the canonical identifiers of the documents and series."""
+    for index in ("documents-document-v1.0.0", "series-series-v1.0.0"):
+        before_record_index.dynamic_connect(
+            index_canonical_identifiers,
+            sender=app,
+            weak=False,
+            index=index,
+        )
+
+
+def put_canonical_identifiers_mapping():
+    """Map the canonical identifiers of the documents and series."""
+    for search_cls in (
+        current_app_ils.document_search_cls,
+        current_app_ils.series_search_cls,
+    ):
+        current_search_client.indices.put_mapping(
+            index=build_alias_name(search_cls.Meta.index),
+            body={
+                "properties": {
+                    CANONICAL_IDENTIFIERS_FIELD: {"type": "keyword"}
+                }
+            },
+        )
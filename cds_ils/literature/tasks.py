@@ -12,6 +12,7 @@ from invenio_app_ils.proxies import current_app_ils
 from invenio_db import db
 
 from .covers import has_already_cover, is_valid_cover, should_record_have_cover
+from .identifiers import get_canonical_value
 
 
 def pick_identifier_with_cover(sender, *args, **kwargs):
@@ -22,16 +23,17 @@ def pick_identifier_with_cover(sender, *args, **kwargs):
 
 
 def create_identifiers_lists(identifiers):
-    """Splits identifiers in two lists."""
+    """Splits identifiers in two lists of unique canonical values."""
     issn_list = []
     isbn_list = []
 
     for ident in identifiers:
-        if ident["scheme"] == "ISSN":
-            issn_list.append(ident["value"])
+        value = get_canonical_value(ident["scheme"], ident["value"])
+        if ident["scheme"] == "ISSN" and value not in issn_list:
+            issn_list.append(value)
 
-        if ident["scheme"] == "ISBN":
-            isbn_list.append(ident["value"])
+        if ident["scheme"] == "ISBN" and value not in isbn_list:
+            isbn_list.append(value)
 
     return issn_list, isbn_list
 
@@ -80,8 +82,10 @@ def pick_identifier_with_cover_task(record):
     if has_already_cover(cover_metadata):
         # there is a previous cover, do nothing if still valid
         current_cover_in_identifiers = (
-            cover_metadata.get("ISBN") in isbn_list
-            or cover_metadata.get("ISSN") in issn_list
+            get_canonical_value("ISBN", cover_metadata.get("ISBN"))
+            in isbn_list
+            or get_canonical_value("ISSN", cover_metadata.get("ISSN"))
+            in issn_list
         )
         if current_cover_in_identifiers and is_valid_cover(cover_metadata):
             return
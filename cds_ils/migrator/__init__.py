@@ -7,7 +7,9 @@
 
 """CDS-ILS migrator module."""
 
-from cds_dojson.overdo import OverdoBase
+from cds_ils.importer.overdo import CdsIlsOverdoBase
 
 # Matching to a correct model is happening here
-migrator_marc21 = OverdoBase(entry_point_models="cds_ils.migrator.models")
+migrator_marc21 = CdsIlsOverdoBase(
+    entry_point_models="cds_ils.migrator.models"
+)
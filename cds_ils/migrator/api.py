@@ -16,6 +16,7 @@ from celery import shared_task
 from invenio_app_ils.errors import IlsValidationError
 from invenio_db import db
 
+from cds_ils.importer.conversion_cache import flush_conversion_cache
 from cds_ils.migrator.json_record_loader import CDSRecordDumpLoader
 from cds_ils.migrator.xml_document_loader import CDSDocumentDumpLoader
 from cds_ils.migrator.xml_to_json_dump import CDSRecordDump
@@ -59,6 +60,9 @@ def import_documents_from_dump(sources, source_type, eager, include):
                                 item["recid"], str(e)
                             )
                         )
+    # the conversions of the eager migration, the tasks write theirs in
+    # batches
+    flush_conversion_cache()
 
 
 def import_record(dump, model, pid_provider, legacy_id_key="legacy_recid"):
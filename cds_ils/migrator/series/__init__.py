@@ -6,12 +6,14 @@
 # the terms of the MIT License; see LICENSE file for more details.
 
 """CDS-ILS migrator module."""
-from cds_dojson.overdo import OverdoBase
+from cds_ils.importer.overdo import CdsIlsOverdoBase
 
-serial_marc21 = OverdoBase(entry_point_models="cds_ils.migrator.serial_model")
-journal_marc21 = OverdoBase(
+serial_marc21 = CdsIlsOverdoBase(
+    entry_point_models="cds_ils.migrator.serial_model"
+)
+journal_marc21 = CdsIlsOverdoBase(
     entry_point_models="cds_ils.migrator.journal_model"
 )
-multipart_marc21 = OverdoBase(
+multipart_marc21 = CdsIlsOverdoBase(
     entry_point_models="cds_ils.migrator.multipart_model"
 )
@@ -15,6 +15,7 @@ import click
 from invenio_app_ils.errors import IlsValidationError
 from invenio_db import db
 
+from cds_ils.importer.conversion_cache import flush_conversion_cache
 from cds_ils.migrator.api import import_record
 from cds_ils.migrator.series import journal_marc21, multipart_marc21, \
     serial_marc21
@@ -74,6 +75,7 @@ def import_series_from_dump(
                     records_logger.error(
                         "@RECID: {0} ERROR: {1}".format(item["recid"], str(e))
                     )
+    flush_conversion_cache()
 
 
 def import_serial_from_file(sources, rectype):
@@ -13,6 +13,7 @@ import arrow
 from cds_dojson.marc21.utils import create_record
 from flask import current_app
 
+from cds_ils.importer.conversion_cache import get_conversion_cache
 from cds_ils.importer.errors import ManualImportRequired, \
     MissingRequiredField, UnexpectedValue
 from cds_ils.migrator import migrator_marc21
@@ -83,14 +84,22 @@ class CDSRecordDump(object):
         }
 
         if self.source_type == "marcxml":
+            cache = get_conversion_cache()
+            if cache is not None:
+                cache_key = cache.get_key(self.dojson_model, data["marcxml"])
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    val, _ = cached
+                    return dt, val
             marc_record = create_record(data["marcxml"])
             try:
-                val = self.dojson_model.do(
+                val, missing = self.dojson_model.convert(
                     marc_record, exception_handlers=exception_handlers
                 )
-                missing = self.dojson_model.missing(marc_record)
                 if missing:
                     raise LossyConversion(missing=missing)
+                if cache is not None:
+                    cache.set(cache_key, val)
                 return dt, val
             except LossyConversion as e:
                 current_app.logger.error(
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+#
+# CDS-ILS is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""CDS-ILS search utilities."""
+from invenio_search import current_search_client
+
+_keyword_fields = set()
+
+
+def is_keyword_field(index, field):
+    """Check that a field of an index is mapped as a keyword.
+
+    The fields found mapped are cached for the lifetime of the process, the
+    others are checked again on the next call until they are mapped.
+    """
+    if (index, field) in _keyword_fields:
+        return True
+    mappings = current_search_client.indices.get_field_mapping(
+        index=index, fields=field
+    )
+    types = [
+        index_mappings["mappings"].get(field, {}).get("mapping", {})
+        .get(field, {}).get("type")
+        for index_mappings in mappings.values()
+    ]
+    if types and all(type_ == "keyword" for type_ in types):
+        _keyword_fields.add((index, field))
+        return True
+    return False
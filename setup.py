@@ -24,7 +24,14 @@ tests_require = [
 
 setup_requires = ["Babel>=2.8.0"]
 
-extras_require = {"docs": ["Sphinx>=1.5.1"], "tests": tests_require}
+extras_require = {
+    "docs": ["Sphinx>=1.5.1"],
+    "tests": tests_require,
+    # importer progress stream
+    "progress": ["redis>=3.0.0"],
+    # zstd compressed importer uploads
+    "zstd": ["zstandard>=0.13.0"],
+}
 
 extras_require["all"] = []
 for name, reqs in extras_require.items():
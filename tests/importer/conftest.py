@@ -13,6 +13,9 @@ from invenio_app_ils.proxies import current_app_ils
 from invenio_indexer.api import RecordIndexer
 from invenio_search import current_search
 
+from cds_ils.importer.models import ImporterAgent, ImporterMode, \
+    ImporterTaskLog
+
 from ..helpers import _create_records, load_json_from_datadir
 
 
@@ -36,3 +39,22 @@ def importer_test_data(app, db, es_clear):
     current_search.flush_and_refresh(index="*")
 
     return {"documents": documents, "eitems": eitems}
+
+
+@pytest.fixture(scope="function")
+def create_task_log(app, db):
+    """Provide a function creating the log of a springer import task."""
+
+    def create(**data):
+        return ImporterTaskLog.create(dict(
+            dict(
+                agent=ImporterAgent.CLI,
+                provider="springer",
+                source_type="marcxml",
+                mode=ImporterMode.CREATE,
+                original_filename="springer.xml",
+            ),
+            **data
+        ))
+
+    return create
@@ -0,0 +1,64 @@
+from invenio_app_ils.proxies import current_app_ils
+from invenio_search.utils import build_alias_name
+
+from cds_ils.importer.documents.identifiers import DocumentIdentifiersIndex
+from cds_ils.literature.identifiers import get_canonical_identifiers, \
+    get_canonical_value, index_canonical_identifiers, normalize_isbn, \
+    normalize_issn, put_canonical_identifiers_mapping
+from cds_ils.literature.tasks import create_identifiers_lists
+
+
+def test_normalize_isbn():
+    assert normalize_isbn("0-306-40615-2") == "9780306406157"
+    assert normalize_isbn("978-0-306-40615-7") == "9780306406157"
+    assert normalize_isbn("080442957X") == "9780804429573"
+    assert normalize_isbn("979 10 90636 07 1") == "9791090636071"
+    assert normalize_isbn("0-306-40615-3") is None
+    assert normalize_isbn("978-0-306-40615-8") is None
+    assert normalize_isbn("") is None
+
+
+def test_normalize_issn():
+    assert normalize_issn("0065-2970") == "0065-2970"
+    assert normalize_issn("2434 561x") == "2434-561X"
+    assert normalize_issn("00652971") is None
+    assert normalize_issn("0065-297") is None
+
+
+def test_canonical_identifiers():
+    assert get_canonical_value("ISBN", "0-306-4061-53") == "0306406153"
+    assert get_canonical_value("DOI", "10.1007/b100336") == "10.1007/b100336"
+    assert get_canonical_identifiers([
+        {"scheme": "ISBN", "value": "0-306-40615-2"},
+        {"scheme": "ISBN", "value": "9780306406157"},
+        {"scheme": "ISSN", "value": "00652970"},
+        {"scheme": "DOI", "value": "10.1007/b100336"},
+    ]) == ["ISBN:9780306406157", "ISSN:0065-2970"]
+    assert create_identifiers_lists([
+        {"scheme": "ISBN", "value": "0-306-40615-2"},
+        {"scheme": "ISBN", "value": "9780306406157"},
+        {"scheme": "ISSN", "value": "00652970"},
+    ]) == (["0065-2970"], ["9780306406157"])
+
+
+def test_identifiers_index_canonical_isbn():
+    identifiers_index = DocumentIdentifiersIndex()
+    identifiers_index.add({
+        "pid": "docid-1",
+        "identifiers": [{"scheme": "ISBN", "value": "0-306-40615-2"}],
+    })
+    assert identifiers_index.search("ISBN", ["978-0-306-40615-7"]) == [
+        "docid-1"
+    ]
+
+
+def test_index_canonical_identifiers(app, es_clear):
+    series = {"identifiers": [{"scheme": "ISSN", "value": "00652970"}]}
+    index = build_alias_name(current_app_ils.series_search_cls.Meta.index)
+    # not mapped dynamically as a text field
+    index_canonical_identifiers(None, json=series, index=index)
+    assert "canonical_identifiers" not in series
+
+    put_canonical_identifiers_mapping()
+    index_canonical_identifiers(None, json=series, index=index)
+    assert series["canonical_identifiers"] == ["ISSN:0065-2970"]
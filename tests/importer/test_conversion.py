@@ -0,0 +1,82 @@
+import gzip
+import json
+from io import BytesIO
+
+import pytest
+
+from cds_ils.importer.conversion import ConvertedRecordDump, convert_file, \
+    merge_converted_shards
+from cds_ils.importer.errors import RecordConversionError
+from cds_ils.importer.sources import get_source_records, get_source_type
+
+collection = (
+    b"""<?xml version="1.0" encoding="UTF-8"?>"""
+    b"""<collection xmlns="http://www.loc.gov/MARC21/slim">"""
+    b"""<record><controlfield tag="001">1</controlfield></record>"""
+    b"""<record><controlfield tag="001">2</controlfield></record>"""
+    b"""<record><controlfield tag="001">3</controlfield></record>"""
+    b"""</collection>"""
+)
+
+
+def test_get_source_type():
+    assert get_source_type("dump.xml") == "marcxml"
+    assert get_source_type("dump.XML.gz") == "marcxml"
+    assert get_source_type("dump.ndjson") == "ndjson"
+    assert get_source_type("dump.ndjson.zst") == "ndjson"
+    assert get_source_type("dump.json") is None
+
+
+def test_get_ndjson_records():
+    lines = [
+        {"provider_recid": "1", "record": {"title": "A"}},
+        {"provider_recid": "2", "error": "LossyConversion"},
+    ]
+    source = gzip.GzipFile(fileobj=BytesIO(gzip.compress(
+        "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+        + b"\n\n"
+    )))
+    assert list(get_source_records(source, "ndjson")) == lines
+    # the source is left open for its owner
+    assert not source.closed
+
+
+def test_converted_record_dump():
+    timestamp, record, is_deletable = ConvertedRecordDump(dict(
+        timestamp="2020-10-01T10:00:00",
+        record={"title": "A"},
+        deletable=False,
+    )).dump()
+    assert timestamp.year == 2020
+    assert record == {"title": "A"}
+    assert not is_deletable
+
+    failed = ConvertedRecordDump(dict(error="LossyConversion: 245__"))
+    with pytest.raises(RecordConversionError):
+        failed.dump()
+
+
+def test_convert_file(app, tmpdir):
+    source_path = str(tmpdir.join("dump.xml"))
+    with open(source_path, "wb") as source:
+        source.write(collection)
+
+    shard_paths = []
+    for start, stop in [(0, 2), (2, None)]:
+        shard_path = str(tmpdir.join("dump.ndjson.{}".format(start)))
+        convert_file(
+            source_path, shard_path, "springer", processes=1, start=start,
+            stop=stop
+        )
+        shard_paths.append(shard_path)
+    destination_path = str(tmpdir.join("dump.ndjson"))
+    merge_converted_shards(shard_paths, destination_path)
+
+    with open(destination_path, "rb") as destination:
+        lines = list(get_source_records(destination, "ndjson"))
+    # the records are converted in order, failed or not
+    assert [line["provider_recid"] for line in lines] == ["1", "2", "3"]
+    for line in lines:
+        assert "record" in line or "error" in line
+        assert line["fingerprint"]
+    assert not tmpdir.join("dump.ndjson.0").exists()
@@ -0,0 +1,71 @@
+from lxml import etree
+
+from cds_ils.importer import marc21
+from cds_ils.importer.conversion_cache import ConversionCache, \
+    get_marc_checksum, get_model_version
+from cds_ils.migrator import migrator_marc21
+
+marcxml = (
+    """<record xmlns="http://www.loc.gov/MARC21/slim">"""
+    """<controlfield tag="001">1</controlfield></record>"""
+)
+
+
+def test_conversion_cache_get_set(tmpdir):
+    cache = ConversionCache(str(tmpdir.join("cache.sqlite")), 1024 ** 2)
+    assert cache.get("key") is None
+    cache.set("key", {"title": "A"}, False)
+    assert cache.get("key") == ({"title": "A"}, False)
+    # shared with the other processes and runs through the file
+    cache.flush()
+    cache = ConversionCache(str(tmpdir.join("cache.sqlite")), 1024 ** 2)
+    assert cache.get("key") == ({"title": "A"}, False)
+
+
+def test_conversion_cache_writes_in_batches(tmpdir):
+    path = str(tmpdir.join("cache.sqlite"))
+    cache = ConversionCache(path, 1024 ** 2, batch_size=3)
+    other_cache = ConversionCache(path, 1024 ** 2)
+    cache.set("first", {"title": "A"})
+    cache.set("second", {"title": "B"})
+    assert other_cache.get("first") is None
+    # the batch is written once full
+    cache.set("third", {"title": "C"})
+    for key in ("first", "second", "third"):
+        assert other_cache.get(key) is not None
+    # reading does not write until the batch is full
+    cache.get("first")
+    assert cache._accessed and not cache._pending
+
+
+def test_conversion_cache_evicts_least_recently_used(tmpdir):
+    cache = ConversionCache(
+        str(tmpdir.join("cache.sqlite")), 1024 ** 2, batch_size=1
+    )
+    record = {"title": "A"}
+    cache.set("first", record)
+    entry_size = cache._size
+    cache.max_size = entry_size * 3
+    cache.set("second", record)
+    cache.set("third", record)
+    cache.get("first")
+    # evicted down to 90% of the maximum size
+    cache.set("fourth", record)
+    assert cache.get("second") is None
+    assert cache.get("third") is None
+    for key in ("first", "fourth"):
+        assert cache.get(key) == (record, None)
+
+
+def test_conversion_cache_key():
+    parsed = etree.fromstring(marcxml)
+    assert get_marc_checksum(marcxml) == get_marc_checksum(
+        marcxml.encode("utf-8")
+    )
+    assert get_marc_checksum(parsed) != get_marc_checksum(
+        marcxml.replace(">1<", ">2<")
+    )
+    # the rules of the importer and the migrator are versioned separately
+    assert get_model_version(marc21) == get_model_version(marc21)
+    assert ConversionCache.get_key(marc21, marcxml) != \
+        ConversionCache.get_key(migrator_marc21, marcxml)
@@ -63,3 +63,18 @@ def test_fuzzy_matching(importer_test_data):
     results = fuzzy_search_document(data_to_update["title"], authors).scan()
     matches = [x.pid for x in results]
     assert matches == ["docid-5"]
+
+
+def test_previewed_fuzzy_matches_are_checked(importer_test_data):
+    data_to_update = load_json_from_datadir(
+        "match_testing_documents.json", relpath="importer"
+    )[3]
+    document_importer = DocumentImporter(
+        data_to_update, ("agency_code",), "springer", ("identifiers",)
+    )
+    # documents deleted since the preview are not matched anymore
+    document_importer.previewed_fuzzy_matches = ["docid-4", "docid-deleted"]
+
+    DocumentImporter.match_documents([document_importer])
+
+    assert document_importer.fuzzy_match_documents() == ["docid-4"]
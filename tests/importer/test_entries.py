@@ -0,0 +1,114 @@
+from cds_ils.importer.entries import ImporterTaskEntryWriter
+from cds_ils.importer.transactions import UnitOfWork
+
+
+def test_entries_writer_batches_inserts(create_task_log):
+    log = create_task_log()
+    writer = ImporterTaskEntryWriter(flush_size=2, flush_interval=3600)
+
+    writer.add_failure(dict(import_id=log.id, entry_index=0), Exception())
+    assert log.entries.count() == 0
+
+    writer.add_failure(dict(import_id=log.id, entry_index=1), Exception())
+    assert log.entries.count() == 2
+
+    writer.add_failure(dict(import_id=log.id, entry_index=2), Exception())
+    writer.flush()
+    entries = log.entries.all()
+    assert [entry.entry_index for entry in entries] == [0, 1, 2]
+    assert entries[0].error == "Exception"
+
+
+def test_entries_store_compact_reports(create_task_log):
+    log = create_task_log()
+    document = dict(
+        pid="docid-1",
+        title="Quantum Field Theory",
+        abstract="A very long abstract",
+        identifiers=[{"scheme": "ISBN", "value": "9780306406157"}],
+    )
+    eitem = dict(
+        pid="eitmid-1",
+        document_pid="docid-1",
+        urls=[{"value": "https://example.org"}],
+    )
+    report = dict(
+        created=document,
+        updated=None,
+        ambiguous_documents=[],
+        fuzzy=["docid-2"],
+        series=[dict(pid="serid-1", title="Lecture Notes", issn="0075-8450")],
+        created_eitem=eitem,
+        updated_eitem=None,
+        deleted_eitem_list=[],
+        ambiguous_eitem_list=[],
+    )
+    writer = ImporterTaskEntryWriter()
+    writer.add_success(dict(import_id=log.id, entry_index=0), report)
+    writer.flush()
+
+    report = log.entries.one().dump()["report"]
+    assert report["created_document"] == dict(
+        pid="docid-1", title="Quantum Field Theory"
+    )
+    assert report["created_eitem"] == dict(
+        pid="eitmid-1", document_pid="docid-1"
+    )
+    assert report["series"] == [dict(pid="serid-1", title="Lecture Notes")]
+    assert report["updated_document"] is None
+    assert report["fuzzy_documents"] == ["docid-2"]
+
+
+def test_entries_increment_task_counters(create_task_log):
+    log = create_task_log()
+    report = dict(
+        created=dict(pid="docid-1", title="Quantum Field Theory"),
+        updated=None,
+        ambiguous_documents=[],
+        fuzzy=["docid-2"],
+        series=[],
+        created_eitem=None,
+        updated_eitem=None,
+        deleted_eitem_list=[],
+        ambiguous_eitem_list=[],
+    )
+    writer = ImporterTaskEntryWriter(flush_size=2, flush_interval=3600)
+    writer.add_success(dict(import_id=log.id, entry_index=0), report)
+    writer.add_failure(dict(import_id=log.id, entry_index=1), Exception())
+    writer.add_skipped(dict(import_id=log.id, entry_index=2), "unchanged")
+    # matched documents left unchanged are not counted as updated
+    unchanged_report = dict(
+        report,
+        created=None,
+        updated=dict(pid="docid-3", title="Quantum Mechanics"),
+        fuzzy=[],
+        unchanged=True,
+    )
+    writer.add_success(
+        dict(import_id=log.id, entry_index=3), unchanged_report
+    )
+    writer.flush()
+
+    assert log.dump_counters() == dict(
+        processed=4,
+        created=1,
+        updated=0,
+        ambiguous=0,
+        fuzzy=1,
+        failed=1,
+        unchanged=2,
+    )
+
+
+def test_entries_writer_waits_for_the_unit_of_work(create_task_log):
+    log = create_task_log()
+    writer = ImporterTaskEntryWriter(
+        flush_size=1, unit_of_work=UnitOfWork(10)
+    )
+
+    writer.add_failure(dict(import_id=log.id, entry_index=0), Exception())
+    # not committed along the pending records of the unit of work
+    assert log.entries.count() == 0
+
+    writer.flush()
+    assert log.entries.count() == 1
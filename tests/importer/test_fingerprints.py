@@ -0,0 +1,69 @@
+import pytest
+from invenio_app_ils.documents.api import DOCUMENT_PID_TYPE
+from invenio_pidstore.models import PersistentIdentifier
+from lxml import etree
+
+from cds_ils.importer import marc21
+from cds_ils.importer.errors import RecordUnchanged
+from cds_ils.importer.fingerprints import RecordFingerprints, \
+    compute_fingerprint, get_provider_recid
+
+
+def marcxml_record(title):
+    return etree.fromstring(
+        """<record xmlns="http://www.loc.gov/MARC21/slim">"""
+        """<controlfield tag="001">EBL123</controlfield>"""
+        """<datafield tag="245" ind1=" " ind2=" ">"""
+        """<subfield code="a">{0}</subfield>"""
+        """</datafield>"""
+        """</record>""".format(title)
+    )
+
+
+def test_compute_fingerprint():
+    record = marcxml_record("Title")
+    assert get_provider_recid(record) == "EBL123"
+    assert compute_fingerprint(record, marc21) == compute_fingerprint(
+        marcxml_record("Title"), marc21
+    )
+    assert compute_fingerprint(record, marc21) != compute_fingerprint(
+        marcxml_record("Modified title"), marc21
+    )
+
+
+def test_record_fingerprints(importer_test_data):
+    fingerprints = RecordFingerprints.load("ebl")
+    fingerprints.check(marcxml_record("Title"))
+    fingerprints.add("EBL123", "docid-1", "eitemid-4")
+    fingerprints.flush()
+
+    fingerprints = RecordFingerprints.load("ebl")
+    with pytest.raises(RecordUnchanged):
+        fingerprints.check(marcxml_record("Title"))
+    fingerprints.check(marcxml_record("Modified title"))
+    fingerprints.add("EBL123", "docid-1", "eitemid-4")
+    fingerprints.flush()
+
+    fingerprints = RecordFingerprints.load("ebl")
+    fingerprints.check(marcxml_record("Title"))
+    with pytest.raises(RecordUnchanged):
+        fingerprints.check(marcxml_record("Modified title"))
+    # other providers have their own fingerprints
+    RecordFingerprints.load("safari").check(marcxml_record("Title"))
+
+
+def test_record_fingerprints_of_deleted_records(importer_test_data, db):
+    fingerprints = RecordFingerprints.load("ebl")
+    fingerprints.check(marcxml_record("Title"))
+    fingerprints.add("EBL123", "docid-1", "missing-eitem")
+    fingerprints.flush()
+    # imported again when the eitem no longer exists
+    RecordFingerprints.load("ebl").check(marcxml_record("Title"))
+
+    fingerprints.check(marcxml_record("Title"))
+    fingerprints.add("EBL123", "docid-1", "eitemid-4")
+    fingerprints.flush()
+    PersistentIdentifier.get(DOCUMENT_PID_TYPE, "docid-1").delete()
+    db.session.commit()
+    # imported again when the document was deleted
+    RecordFingerprints.load("ebl").check(marcxml_record("Title"))
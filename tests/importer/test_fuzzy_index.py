@@ -0,0 +1,50 @@
+from cds_ils.importer.documents.fuzzy import DocumentFuzzyIndex, get_fuzzy_key
+
+
+def test_fuzzy_key_normalization():
+    assert get_fuzzy_key("Théorie des Champs!", ["Dürr, H.-P."]) == \
+        "theorie des champs durr h p"
+
+
+def test_fuzzy_index_search():
+    fuzzy_index = DocumentFuzzyIndex(threshold=0.5)
+    fuzzy_index.add({
+        "pid": "docid-1",
+        "title": "Quantum Field Theory",
+        "authors": [{"full_name": "Weinberg, Steven"}],
+    })
+    fuzzy_index.add({
+        "pid": "docid-2",
+        "title": "Classical Electrodynamics",
+        "authors": [{"full_name": "Jackson, John David"}],
+    })
+    fuzzy_index.add({"pid": "docid-3"})
+
+    matches = fuzzy_index.search("Quantum feld theory", ["Weinberg, S."])
+    assert [pid for pid, score in matches] == ["docid-1"]
+    assert 0.5 <= matches[0][1] < 1
+    assert fuzzy_index.search(
+        "Classical Electrodynamics", ["Jackson, John David"]
+    ) == [("docid-2", 1.0)]
+    assert fuzzy_index.search("Linear Algebra", ["Lang, Serge"]) == []
+
+
+def test_fuzzy_index_rollback():
+    fuzzy_index = DocumentFuzzyIndex(threshold=0.5)
+    document = {
+        "pid": "docid-1",
+        "title": "Quantum Field Theory",
+        "authors": [{"full_name": "Weinberg, Steven"}],
+    }
+
+    fuzzy_index.begin()
+    fuzzy_index.add(document)
+    fuzzy_index.rollback()
+    assert fuzzy_index.search("Quantum Field Theory", ["Weinberg"]) == []
+
+    fuzzy_index.add(document)
+    fuzzy_index.begin()
+    fuzzy_index.add(dict(document, title="Linear Algebra"))
+    fuzzy_index.rollback()
+    matches = fuzzy_index.search("Quantum Field Theory", ["Weinberg, Steven"])
+    assert matches == [("docid-1", 1.0)]
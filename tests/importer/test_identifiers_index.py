@@ -0,0 +1,38 @@
+from cds_ils.importer.documents.identifiers import DocumentIdentifiersIndex
+
+
+def test_identifiers_index_search():
+    identifiers_index = DocumentIdentifiersIndex()
+    identifiers_index.add({
+        "pid": "docid-1",
+        "identifiers": [
+            {"scheme": "ISBN", "value": "9780306479151"},
+            {"scheme": "DOI", "value": "10.1007/b100336"},
+            {"scheme": "ISSN", "value": "0065-2970"},
+        ],
+    })
+    identifiers_index.add({
+        "pid": "docid-2",
+        "identifiers": [{"scheme": "ISBN", "value": "9780306479151"}],
+    })
+
+    assert identifiers_index.search("ISBN", ["9780306479151"]) == [
+        "docid-1",
+        "docid-2",
+    ]
+    assert identifiers_index.search("DOI", ["10.1007/b100336"]) == ["docid-1"]
+    assert identifiers_index.search("ISBN", ["0306479150"]) == []
+
+    # documents updated during the run are indexed again
+    identifiers_index.add({
+        "pid": "docid-2",
+        "identifiers": [
+            {"scheme": "ISBN", "value": "9780306479151"},
+            {"scheme": "ISBN", "value": "0306479150"},
+        ],
+    })
+    assert identifiers_index.search("ISBN", ["0306479150"]) == ["docid-2"]
+    assert identifiers_index.search("ISBN", ["9780306479151"]) == [
+        "docid-1",
+        "docid-2",
+    ]
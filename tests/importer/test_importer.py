@@ -1,8 +1,12 @@
+import json
 import time
+from copy import deepcopy
 
 from invenio_app_ils.proxies import current_app_ils
 
+from cds_ils.importer.api import import_from_xml
 from cds_ils.importer.importer import Importer
+from cds_ils.importer.models import ImporterTaskEntry
 from cds_ils.importer.series.importer import SeriesImporter
 from tests.helpers import load_json_from_datadir
 
@@ -155,3 +159,90 @@ def test_add_document_to_serial(app, db):
         created_document["relations_extra_metadata"]["serial"][0]["volume"]
         == "26"
     )
+
+
+def test_preview_documents(importer_test_data):
+    document_cls = current_app_ils.document_record_cls
+
+    json_data = load_json_from_datadir(
+        "modify_document_data.json", relpath="importer"
+    )
+    importer = Importer(json_data[0], "springer")
+    report = importer.preview_record()
+    assert report["updated"]
+    assert not report["created_eitem"] and not report["updated_eitem"]
+    # only the ids of the matches are kept
+    assert "preview" not in report
+
+    # nothing was written
+    document = document_cls.get_record_by_pid(report["updated"]["pid"])
+    assert document.revision_id == report["updated"].revision_id
+
+    json_data = load_json_from_datadir(
+        "create_documents_data.json", relpath="importer"
+    )
+    importer = Importer(json_data[0], "springer")
+    report = importer.preview_record()
+    assert report["created"]
+    assert "pid" not in report["created"]
+    assert "_eitem" not in report["created"]
+
+
+def test_import_unchanged_documents(importer_test_data):
+    document_cls = current_app_ils.document_record_cls
+
+    json_data = load_json_from_datadir(
+        "modify_document_data.json", relpath="importer"
+    )
+    report = Importer(deepcopy(json_data[0]), "springer").import_record()
+    assert report["updated"] and not report["unchanged"]
+    document = document_cls.get_record_by_pid(report["updated"]["pid"])
+    revision_id = document.revision_id
+    # wait for indexing
+    time.sleep(1)
+
+    report = Importer(deepcopy(json_data[0]), "springer").import_record()
+    assert report["updated"]["pid"] == document["pid"]
+    assert report["unchanged"]
+    assert not report["updated_eitem"]
+    document = document_cls.get_record_by_pid(document["pid"])
+    assert document.revision_id == revision_id
+
+
+def test_import_small_file_matches_the_created_documents(
+    importer_test_data, create_task_log, tmpdir
+):
+    json_data = load_json_from_datadir(
+        "create_documents_data.json", relpath="importer"
+    )[0]
+    json_data.pop("_eitem")
+    json_data["identifiers"] = [dict(scheme="ISBN", value="9780306406157")]
+    same_isbn = dict(
+        deepcopy(json_data),
+        title="Collected Poems",
+        identifiers=[dict(scheme="ISBN", value="978-0-306-40615-7")],
+    )
+    source = tmpdir.join("springer.ndjson")
+    source.write("".join(
+        json.dumps(dict(
+            timestamp="2020-01-01T00:00:00",
+            record=record,
+            deletable=False,
+        )) + "\n"
+        for record in (json_data, same_isbn)
+    ))
+    log = create_task_log(
+        source_type="ndjson", original_filename="springer.ndjson"
+    )
+
+    # both records are matched in the same window, before any is imported
+    import_from_xml(log.id, str(source), "ndjson", "springer", "create")
+
+    created, updated = [
+        entry.dump()["report"]
+        for entry in log.entries.order_by(ImporterTaskEntry.entry_index)
+    ]
+    assert created["created_document"]
+    assert updated["created_document"] is None
+    assert updated["updated_document"]["pid"] == \
+        created["created_document"]["pid"]
@@ -0,0 +1,50 @@
+from collections import namedtuple
+
+from cds_ils.importer.indexer import IndexingBuffer
+
+Record = namedtuple("Record", ["id", "_pid_type"])
+
+
+class BulkIndexer(object):
+    """Indexer recording its bulk operations, failing some of them."""
+
+    failed = 0
+    queues = []
+    indexed = []
+    deleted = []
+
+    def __init__(self, exchange=None, queue=None, routing_key=None):
+        self.queue = queue
+        self.queues.append(queue.name if queue else None)
+
+    def bulk_index(self, record_id_iterator):
+        self.indexed.extend(record_id_iterator)
+
+    def bulk_delete(self, record_id_iterator):
+        self.deleted.extend(record_id_iterator)
+
+    def process_bulk_queue(self, es_bulk_kwargs=None):
+        assert es_bulk_kwargs["raise_on_error"] is False
+        count = len(self.indexed) + len(self.deleted)
+        return count - self.failed, self.failed
+
+
+def test_indexing_buffer_counts_failures_on_the_task(db, create_task_log):
+    log = create_task_log()
+    BulkIndexer.failed = 1
+    indexer = BulkIndexer()
+    buffer = IndexingBuffer(chunk_size=10, log=log)
+
+    buffer.index(indexer, Record("1", "unknown"))
+    buffer.index(indexer, Record("2", "unknown"))
+    # the last operation on a record wins
+    buffer.delete(indexer, Record("1", "unknown"))
+    assert buffer.flush() == 1
+
+    assert BulkIndexer.indexed == ["2"]
+    assert BulkIndexer.deleted == ["1"]
+    # sent through a queue of the flush, not the shared bulk queue
+    assert BulkIndexer.queues[-1].startswith("cds-ils-importer-indexer-")
+    db.session.refresh(log)
+    assert log.indexing_failed_count == 1
+    assert buffer.flush() == 0
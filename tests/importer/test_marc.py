@@ -0,0 +1,51 @@
+import json
+
+from cds_dojson.marc21.utils import create_record
+from lxml import etree
+
+from cds_ils.importer import marc21
+from cds_ils.importer.fingerprints import compute_fingerprint, \
+    get_provider_recid
+from cds_ils.importer.marc import create_marc_record, get_marc_fields
+
+marcxml = (
+    b"""<collection xmlns="http://www.loc.gov/MARC21/slim"><record>"""
+    b"""<leader>00000nam  2200000 d 4500</leader>"""
+    b"""<controlfield tag="001">EBL123</controlfield>"""
+    b"""<datafield tag="245" ind1=" " ind2="#">"""
+    b"""<subfield code="a">Title</subfield><subfield code="b"></subfield>"""
+    b"""</datafield>"""
+    b"""<datafield tag="700" ind1="1" ind2="">"""
+    b"""<subfield code="a">Author A</subfield>"""
+    b"""</datafield>"""
+    b"""<datafield tag="700" ind1="1" ind2="">"""
+    b"""<subfield code="a">Author B</subfield>"""
+    b"""</datafield>"""
+    b"""<controlfield tag="003">MiAaPQ</controlfield>"""
+    b"""</record></collection>"""
+)
+
+
+def test_create_marc_record_from_element():
+    record = etree.fromstring(marcxml)[0]
+    marc_record = create_marc_record(record)
+    assert list(marc_record.items()) == list(create_record(record).items())
+
+
+def test_create_marc_record_from_fields():
+    record = etree.fromstring(marcxml)[0]
+    fields = get_marc_fields(record)
+    # as sent to the workers
+    deserialized = json.loads(json.dumps(fields))
+    assert list(create_marc_record(deserialized).items()) == \
+        list(create_record(record).items())
+
+
+def test_fingerprint_of_fields():
+    record = etree.fromstring(marcxml)[0]
+    fields = get_marc_fields(record)
+    assert get_provider_recid(fields) == get_provider_recid(record)
+    assert compute_fingerprint(fields, marc21) == \
+        compute_fingerprint(record, marc21)
+    assert compute_fingerprint(json.loads(json.dumps(fields)), marc21) == \
+        compute_fingerprint(record, marc21)
@@ -0,0 +1,43 @@
+from invenio_app_ils.proxies import current_app_ils
+from invenio_search.utils import build_alias_name
+
+from cds_ils.importer.documents.api import get_document_match_key, \
+    get_match_key, index_document_match_key, put_match_key_mapping
+
+
+def test_match_key_normalization():
+    assert get_match_key(
+        "Théorie des Champs!",
+        subtitle="Une Introduction",
+        authors=["Weinberg, Steven", "Dürr, H.-P.", "Paul Dirac"],
+    ) == "theorie des champs une introduction dirac durr weinberg"
+    assert get_match_key("Quantum field theory") == "quantum field theory"
+    # the order and the first names of the authors do not matter
+    assert get_match_key(
+        "Quantum Field Theory", authors=["Weinberg, S.", "Dirac, P."]
+    ) == get_match_key(
+        "quantum field theory", authors=["P. Dirac", "Weinberg, Steven"]
+    )
+
+
+def test_document_match_key(app, es_clear):
+    document = {
+        "title": "Quantum Field Theory",
+        "alternative_titles": [
+            {"type": "TRANSLATED_TITLE", "value": "Théorie des champs"},
+            {"type": "SUBTITLE", "value": "Foundations"},
+        ],
+        "authors": [{"full_name": "Weinberg, Steven"}],
+    }
+    assert get_document_match_key(document) == \
+        "quantum field theory foundations weinberg"
+    assert get_document_match_key({"authors": []}) is None
+
+    index = build_alias_name(current_app_ils.document_search_cls.Meta.index)
+    # not mapped dynamically as a text field
+    index_document_match_key(None, json=document, index=index)
+    assert "match_key" not in document
+
+    put_match_key_mapping()
+    index_document_match_key(None, json=document, index=index)
+    assert document["match_key"] == "quantum field theory foundations weinberg"
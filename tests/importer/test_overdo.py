@@ -0,0 +1,83 @@
+from cds_dojson.marc21.utils import create_record
+
+from cds_ils.importer.overdo import CdsIlsOverdo
+
+marcxml = (
+    """<record>"""
+    """<controlfield tag="001">1</controlfield>"""
+    """<datafield tag="020" ind1=" " ind2=" ">"""
+    """<subfield code="a">0123456789</subfield>"""
+    """<subfield code="b">print</subfield>"""
+    """<subfield code="q">ignored</subfield>"""
+    """</datafield>"""
+    """<datafield tag="245" ind1=" " ind2=" ">"""
+    """<subfield code="a">Title</subfield>"""
+    """</datafield>"""
+    """<datafield tag="999" ind1=" " ind2=" ">"""
+    """<subfield code="a">no rule</subfield>"""
+    """</datafield>"""
+    """</record>"""
+)
+
+
+class ExampleModel(CdsIlsOverdo):
+    __ignore_keys__ = {"020__q"}
+
+
+model = ExampleModel()
+
+
+@model.over("isbn", "^020..")
+def isbn(self, key, value):
+    return value["a"]
+
+
+@model.over("title", "^245..")
+def title(self, key, value):
+    return value["a"]
+
+
+def test_do_collects_missing_keys():
+    missing = set()
+    record = model.do(create_record(marcxml), missing=missing)
+    assert record == {"isbn": "0123456789", "title": "Title"}
+
+    blob = create_record(marcxml)
+    model.do(blob)
+    assert missing == model.missing(blob) == {"020__b", "999__a"}
+
+
+def test_do_memoizes_rules():
+    model.do(create_record(marcxml))
+    assert model._dispatch["020__"][0] == "isbn"
+    # negative entries for the keys without rules
+    assert model._dispatch["999__"] is None
+
+
+class DefaultsModel(CdsIlsOverdo):
+    _default_fields = {
+        "_migration": {"record_type": "document", "volumes": []},
+        "document_type": "BOOK",
+    }
+
+
+defaults_model = DefaultsModel()
+
+
+@defaults_model.over("_migration", "^245..")
+def volumes(self, key, value):
+    self["_migration"]["volumes"].append(value["a"])
+    return self["_migration"]
+
+
+def test_do_creates_default_fields():
+    first = defaults_model.do(create_record(marcxml))
+    assert first == {
+        "_migration": {"record_type": "document", "volumes": ["Title"]},
+        "document_type": "BOOK",
+    }
+    # the declared defaults are not modified
+    assert DefaultsModel._default_fields["_migration"]["volumes"] == []
+    second = defaults_model.do(create_record(marcxml))
+    assert second["_migration"]["volumes"] == ["Title"]
+    assert second["_migration"] is not first["_migration"]
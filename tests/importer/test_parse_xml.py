@@ -0,0 +1,38 @@
+from io import BytesIO
+
+from cds_ils.importer.parse_xml import get_record_local_name, get_records_list
+
+collection = (
+    b"""<?xml version="1.0" encoding="UTF-8"?>"""
+    b"""<collection xmlns="http://www.loc.gov/MARC21/slim">"""
+    b"""<record><controlfield tag="001">1</controlfield></record>"""
+    b"""<record><controlfield tag="001">2</controlfield></record>"""
+    b"""<record><controlfield tag="001">3</controlfield></record>"""
+    b"""</collection>"""
+)
+
+
+def test_get_record_local_name():
+    assert get_record_local_name("//*[local-name() = 'record']") == "record"
+    assert get_record_local_name("record") == "record"
+    assert get_record_local_name("//collection/record") is None
+
+
+def test_get_records_list_streams_records(app):
+    recids = []
+    for record in get_records_list(BytesIO(collection)):
+        # previously yielded records are freed from the tree
+        previous = record.getprevious()
+        assert previous is None or len(previous) == 0
+        recids.append(record[0].text)
+    assert recids == ["1", "2", "3"]
+
+
+def test_get_records_list_by_xpath(app, monkeypatch):
+    monkeypatch.setitem(
+        app.config,
+        "CDS_ILS_IMPORTER_RECORD_TAG",
+        "//*[local-name() = 'record'][position() > 1]",
+    )
+    records = get_records_list(BytesIO(collection))
+    assert [record[0].text for record in records] == ["2", "3"]
@@ -0,0 +1,77 @@
+import json
+
+from cds_ils.importer import progress
+from cds_ils.importer.progress import PROGRESS_CHANNEL, stream_progress
+
+
+class FakePubSub(object):
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.channels = []
+        self.closed = False
+
+    def subscribe(self, channel):
+        self.channels.append(channel)
+
+    def get_message(self, timeout=None):
+        if self.messages:
+            return self.messages.pop(0)
+        return None
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient(object):
+    def __init__(self, messages):
+        self.pubsub_instance = FakePubSub(messages)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return self.pubsub_instance
+
+
+def test_stream_progress(app, monkeypatch):
+    running = dict(id=1, state="RUNNING", loaded_entries=1, reports=[])
+    finished = dict(id=1, state="SUCCEEDED", loaded_entries=2, reports=[
+        dict(index=1, success=False, message="Exception"),
+    ])
+    client = FakeClient([None, dict(data=json.dumps(finished))])
+    monkeypatch.setattr(progress, "get_progress_client", lambda: client)
+
+    events = list(stream_progress(1, lambda last_entry_index: running))
+
+    assert client.pubsub_instance.channels == [PROGRESS_CHANNEL.format(1)]
+    assert client.pubsub_instance.closed
+    assert events == [
+        "event: progress\ndata: {}\n\n".format(json.dumps(running)),
+        ": keepalive\n\n",
+        "id: 1\nevent: progress\ndata: {}\n\n".format(json.dumps(finished)),
+        "event: end\ndata: {}\n\n".format(json.dumps(dict(id=1))),
+    ]
+
+
+def test_stream_progress_after_reconnecting(app, monkeypatch):
+    missed = dict(id=1, state="RUNNING", loaded_entries=6, reports=[
+        dict(index=5, success=False, message="Exception"),
+    ])
+    published = dict(id=1, state="SUCCEEDED", loaded_entries=7, reports=[
+        dict(index=4, success=False, message="Exception"),
+    ])
+    client = FakeClient([dict(data=json.dumps(published))])
+    monkeypatch.setattr(progress, "get_progress_client", lambda: client)
+    last_entry_indexes = []
+
+    def get_progress(last_entry_index):
+        last_entry_indexes.append(last_entry_index)
+        return missed
+
+    events = list(stream_progress(1, get_progress, last_entry_index=3))
+
+    # the entries written after the last one sent are sent again
+    assert last_entry_indexes == [3]
+    assert events[:2] == [
+        "id: 5\nevent: progress\ndata: {}\n\n".format(json.dumps(missed)),
+        "id: 5\nevent: progress\ndata: {}\n\n".format(
+            json.dumps(published)
+        ),
+    ]
@@ -0,0 +1,14 @@
+from cds_ils.importer.providers.springer.importer import SpringerImporter
+from cds_ils.importer.registry import current_importer_providers
+
+
+def test_importer_providers_registry(app):
+    springer = current_importer_providers.get("springer")
+    assert springer.importer_class == SpringerImporter
+    assert springer.agency_code == "DE-He213"
+    assert springer.priority == 2
+    assert not springer.can_delete
+    assert current_importer_providers.get("ebl").can_delete
+
+    # the registry is built once per application
+    assert current_importer_providers.get("springer") is springer
@@ -0,0 +1,118 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from invenio_app_ils.documents.api import DOCUMENT_PID_TYPE
+from invenio_pidstore.models import PersistentIdentifier
+
+from cds_ils.importer.api import get_resumable_task, import_from_xml, \
+    resume_import
+from cds_ils.importer.errors import ImporterTaskNotResumable
+from cds_ils.importer.models import ImporterTaskEntry
+from cds_ils.importer.XMLRecordLoader import XMLRecordDumpLoader
+from tests.helpers import load_json_from_datadir
+
+
+def test_resumable_task(app, db, tmpdir, create_task_log):
+    source = tmpdir.join("springer.xml")
+    source.write("<collection><record/></collection>")
+    log = create_task_log(source_path=str(source))
+
+    log.checkpoint(4)
+    log.checkpoint(2)
+    assert log.last_entry_index == 4
+
+    # the task renewed its lease
+    with pytest.raises(ImporterTaskNotResumable):
+        get_resumable_task(log.id)
+
+    lease = app.config["CDS_ILS_IMPORTER_TASK_LEASE"]
+    log.heartbeat = datetime.now() - lease - timedelta(seconds=1)
+    db.session.commit()
+    assert log.is_stale(lease)
+    assert get_resumable_task(log.id) == log
+
+    log.set_resumed()
+    log.set_succeeded()
+    with pytest.raises(ImporterTaskNotResumable):
+        get_resumable_task(log.id)
+
+
+class WorkerKilled(BaseException):
+    """The worker died while importing a record."""
+
+
+def test_resume_a_task_killed_in_the_middle_of_a_window(
+    app, db, importer_test_data, create_task_log, tmpdir, monkeypatch
+):
+    json_data = load_json_from_datadir(
+        "create_documents_data.json", relpath="importer"
+    )[0]
+    json_data.pop("_eitem")
+    records = [
+        dict(
+            json_data,
+            title=title,
+            authors=[dict(full_name=author)],
+            identifiers=[dict(scheme="ISBN", value=isbn)],
+        )
+        for title, author, isbn in (
+            ("Collected Poems", "Frost, Robert", "9780306406157"),
+            ("Lunar Cartography", "Halley, Edmond", "9781861972712"),
+        )
+    ]
+    source = tmpdir.join("springer.ndjson")
+    source.write("".join(
+        json.dumps(dict(
+            timestamp="2020-01-01T00:00:00",
+            record=record,
+            deletable=False,
+        )) + "\n"
+        for record in records
+    ))
+    log = create_task_log(
+        source_type="ndjson",
+        original_filename="springer.ndjson",
+        source_path=str(source),
+    )
+    documents = PersistentIdentifier.query.filter_by(
+        pid_type=DOCUMENT_PID_TYPE
+    )
+    documents_count = documents.count()
+
+    run = XMLRecordDumpLoader.run.__func__
+    calls = []
+
+    def kill_on_second_record(cls, importer, mode):
+        calls.append(importer)
+        if len(calls) == 2:
+            raise WorkerKilled()
+        return run(cls, importer, mode)
+
+    monkeypatch.setattr(
+        XMLRecordDumpLoader, "run", classmethod(kill_on_second_record)
+    )
+    with pytest.raises(WorkerKilled):
+        import_from_xml(log.id, str(source), "ndjson", "springer", "create")
+    # the connection of the dead worker is lost with its transaction
+    db.session.rollback()
+    monkeypatch.undo()
+
+    # the first record is lost along with its entry and the checkpoint
+    assert documents.count() == documents_count
+    assert log.entries.count() == 0
+    assert log.last_entry_index is None
+
+    lease = app.config["CDS_ILS_IMPORTER_TASK_LEASE"]
+    log.heartbeat = datetime.now() - lease - timedelta(seconds=1)
+    db.session.commit()
+    resume_import(log.id)
+
+    reports = [
+        entry.dump()["report"]
+        for entry in log.entries.order_by(ImporterTaskEntry.entry_index)
+    ]
+    assert len(reports) == 2
+    created_pids = [report["created_document"]["pid"] for report in reports]
+    assert len(set(created_pids)) == 2
+    assert documents.count() == documents_count + 2
@@ -0,0 +1,53 @@
+from cds_ils.importer.series.cache import SeriesCache
+
+
+def test_series_cache_searches_once():
+    cache = SeriesCache()
+    searched = []
+
+    def search(value):
+        searched.append(value)
+        return ["1"]
+
+    assert cache.search("ISSN", "1234-5678", search) == ["1"]
+    assert cache.search("ISSN", "1234-5678", search) == ["1"]
+    assert searched == ["1234-5678"]
+
+
+def test_series_cache_matches_created_series():
+    cache = SeriesCache()
+    cache.add(dict(
+        pid="2", identifiers=[{"scheme": "ISSN", "value": "1234-5678"}]
+    ))
+
+    assert cache.search("ISSN", "1234-5678", lambda value: []) == ["2"]
+    assert cache.search("ISSN", "1234-5678", lambda value: ["1"]) == ["2"]
+    assert cache.search("ISBN", "9780000000002", lambda value: []) == []
+    assert cache.get_record("2")["pid"] == "2"
+
+
+def test_series_cache_rolls_back_changes():
+    cache = SeriesCache()
+    series = dict(
+        pid="1", identifiers=[{"scheme": "ISSN", "value": "1234-5678"}]
+    )
+    identifiers = series["identifiers"] + [
+        {"scheme": "ISBN", "value": "9780000000002"}
+    ]
+
+    cache.begin()
+    cache.add(dict(
+        pid="2", identifiers=[{"scheme": "ISSN", "value": "8765-4321"}]
+    ))
+    cache.merge_identifiers(series, identifiers)
+    cache.rollback()
+
+    assert cache.search("ISSN", "8765-4321", lambda value: []) == []
+    assert series["identifiers"] == [
+        {"scheme": "ISSN", "value": "1234-5678"}
+    ]
+    assert not cache._changed
+
+    cache.merge_identifiers(series, identifiers)
+    assert series["identifiers"] == identifiers
+    assert list(cache._changed) == ["1"]
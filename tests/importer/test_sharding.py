@@ -0,0 +1,108 @@
+from copy import deepcopy
+
+import pytest
+from invenio_app_ils.proxies import current_app_ils
+from invenio_search import current_search
+
+from cds_ils.importer.api import get_import_shards
+from cds_ils.importer.context import ImportContext
+from cds_ils.importer.errors import DocumentCreationDeferred
+from cds_ils.importer.importer import Importer
+from cds_ils.importer.indexer import IndexingBuffer
+from cds_ils.importer.registry import IMPORTER_PROVIDERS_EXTENSION
+from tests.helpers import load_json_from_datadir
+
+
+def set_concurrency(monkeypatch, app, provider, concurrency):
+    monkeypatch.setitem(
+        app.config["CDS_ILS_IMPORTER_PROVIDERS"][provider],
+        "concurrency",
+        concurrency,
+    )
+    # the providers registry is built again from the config
+    monkeypatch.setitem(app.extensions, IMPORTER_PROVIDERS_EXTENSION, None)
+
+
+def test_get_import_shards(app, tmpdir, monkeypatch, create_task_log):
+    source = tmpdir.join("springer.xml")
+    source.write(
+        "<collection>{0}</collection>".format("<record/>" * 10)
+    )
+    log = create_task_log()
+    monkeypatch.setitem(app.config, "CDS_ILS_IMPORTER_SHARD_MIN_ENTRIES", 3)
+
+    # sequential import
+    set_concurrency(monkeypatch, app, "springer", 1)
+    assert get_import_shards(log.id, str(source), "springer") == [(0, None)]
+
+    set_concurrency(monkeypatch, app, "springer", 2)
+    shards = get_import_shards(log.id, str(source), "springer")
+    assert shards == [(0, 5), (5, 10)]
+    assert log.entries_count == 10
+
+    # shards are never smaller than the minimum
+    set_concurrency(monkeypatch, app, "springer", 8)
+    shards = get_import_shards(log.id, str(source), "springer")
+    assert shards == [(0, 4), (4, 8), (8, 10)]
+
+
+def test_shards_defer_only_the_creations(importer_test_data):
+    context = ImportContext(defer_creations=True)
+
+    matched_json = load_json_from_datadir(
+        "modify_document_data.json", relpath="importer"
+    )[0]
+    report = Importer(matched_json, "springer", context=context) \
+        .import_record()
+    assert report["updated"]
+
+    # the matched document is updated unless a new series is created
+    new_series = load_json_from_datadir(
+        "new_document_with_serial.json", relpath="importer"
+    )[0]["_serial"]
+    with pytest.raises(DocumentCreationDeferred):
+        Importer(
+            dict(matched_json, _serial=new_series), "springer",
+            context=context,
+        ).import_record()
+
+    created_json = load_json_from_datadir(
+        "create_documents_data.json", relpath="importer"
+    )[0]
+    with pytest.raises(DocumentCreationDeferred):
+        Importer(created_json, "springer", context=context).import_record()
+
+
+def test_shards_defer_the_eitems_of_matched_documents(importer_test_data):
+    eitem_search_cls = current_app_ils.eitem_search_cls
+    # matches docid-1, which has no eitem of the provider yet
+    matched_json = load_json_from_datadir(
+        "modify_document_data.json", relpath="importer"
+    )[1]
+
+    # the records of two shards matching the same document
+    context = ImportContext(defer_creations=True)
+    for _ in range(2):
+        with pytest.raises(DocumentCreationDeferred):
+            Importer(
+                deepcopy(matched_json), "springer", context=context
+            ).import_record()
+
+    # imported afterwards in sequence, a single eitem is created even
+    # before it is indexed
+    context = ImportContext(indexing_buffer=IndexingBuffer())
+    reports = [
+        Importer(
+            deepcopy(matched_json), "springer", context=context
+        ).import_record()
+        for _ in range(2)
+    ]
+    assert reports[0]["created_eitem"]
+    assert reports[1]["created_eitem"] is None
+    assert reports[1]["updated_eitem"] is None
+    context.indexing_buffer.flush()
+    current_search.flush_and_refresh(index="*")
+    search = eitem_search_cls().search_by_document_pid(
+        document_pid="docid-1"
+    ).filter("term", created_by__value="springer")
+    assert search.count() == 1
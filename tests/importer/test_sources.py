@@ -0,0 +1,56 @@
+import gzip
+import hashlib
+from io import BytesIO
+
+import pytest
+
+from cds_ils.importer.errors import ImporterSourceError
+from cds_ils.importer.parse_xml import get_records_list
+from cds_ils.importer.sources import count_source_records, \
+    get_source_extension, open_source, save_upload
+
+collection = (
+    b"""<?xml version="1.0" encoding="UTF-8"?>"""
+    b"""<collection xmlns="http://www.loc.gov/MARC21/slim">"""
+    b"""<record><controlfield tag="001">1</controlfield></record>"""
+    b"""<record><controlfield tag="001">2</controlfield></record>"""
+    b"""</collection>"""
+)
+
+
+def test_get_source_extension():
+    allowed = [".xml", ".xml.gz", ".xml.zst"]
+    assert get_source_extension("dump.XML", allowed) == ".xml"
+    assert get_source_extension("dump.xml.gz", allowed) == ".xml.gz"
+    assert get_source_extension("dump.xml.zst", allowed) == ".xml.zst"
+    assert get_source_extension("dump.gz", allowed) is None
+    assert get_source_extension("dump.json", allowed) is None
+
+
+def test_save_upload_checksum(tmpdir):
+    source_path = str(tmpdir.join("upload.xml"))
+    checksum = save_upload(BytesIO(collection), source_path)
+    assert checksum == hashlib.sha256(collection).hexdigest()
+    with open(source_path, "rb") as source:
+        assert source.read() == collection
+
+
+def test_save_corrupted_upload(tmpdir):
+    source_path = str(tmpdir.join("upload.xml.gz"))
+    with pytest.raises(ImporterSourceError):
+        save_upload(BytesIO(gzip.compress(collection)[:-8]), source_path)
+
+
+def test_open_gzip_source(app, tmpdir):
+    source_path = str(tmpdir.join("upload.xml.gz"))
+    compressed = gzip.compress(collection)
+    # the compressed upload is stored as it is, checksummed decompressed
+    checksum = save_upload(BytesIO(compressed), source_path)
+    assert checksum == hashlib.sha256(collection).hexdigest()
+    with open(source_path, "rb") as source:
+        assert source.read() == compressed
+
+    assert count_source_records(source_path) == 2
+    with open_source(source_path) as source:
+        recids = [record[0].text for record in get_records_list(source)]
+    assert recids == ["1", "2"]
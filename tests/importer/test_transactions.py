@@ -0,0 +1,80 @@
+import pytest
+from invenio_app_ils.proxies import current_app_ils
+from invenio_db import db
+
+from cds_ils.importer.context import ImportContext
+from cds_ils.importer.documents.identifiers import DocumentIdentifiersIndex
+from cds_ils.importer.importer import Importer
+from cds_ils.importer.models import ImporterAgent, ImporterMode, \
+    ImporterTaskLog
+from cds_ils.importer.transactions import UnitOfWork
+from tests.helpers import load_json_from_datadir
+
+
+def add_log(filename):
+    db.session.add(ImporterTaskLog(
+        agent=ImporterAgent.CLI,
+        provider="springer",
+        source_type="marcxml",
+        mode=ImporterMode.CREATE,
+        original_filename=filename,
+    ))
+    db.session.flush()
+
+
+def test_unit_of_work_rolls_back_failed_records(app, db):
+    identifiers_index = DocumentIdentifiersIndex()
+    context = ImportContext(
+        identifiers_index=identifiers_index,
+        unit_of_work=UnitOfWork(commit_size=2),
+    )
+
+    with context.record():
+        add_log("first.xml")
+        identifiers_index.add(dict(
+            pid="1", identifiers=[{"scheme": "ISBN", "value": "123"}]
+        ))
+    with pytest.raises(ValueError):
+        with context.record():
+            add_log("failed.xml")
+            identifiers_index.add(dict(
+                pid="2", identifiers=[{"scheme": "ISBN", "value": "123"}]
+            ))
+            raise ValueError()
+    with context.record():
+        add_log("second.xml")
+    # committed after two imported records
+    db.session.rollback()
+
+    filenames = [log.original_filename for log in ImporterTaskLog.query]
+    assert sorted(filenames) == ["first.xml", "second.xml"]
+    assert identifiers_index.search("ISBN", ["123"]) == ["1"]
+
+
+def test_unit_of_work_creates_and_updates_documents(importer_test_data):
+    document_cls = current_app_ils.document_record_cls
+    context = ImportContext(unit_of_work=UnitOfWork(commit_size=10))
+
+    created_json = load_json_from_datadir(
+        "create_documents_data.json", relpath="importer"
+    )[0]
+    modified_json = load_json_from_datadir(
+        "modify_document_data.json", relpath="importer"
+    )[0]
+    reports = []
+    for json_data in (created_json, modified_json):
+        with context.record():
+            importer = Importer(json_data, "springer", context=context)
+            reports.append(importer.import_record())
+    context.commit()
+    db.session.expire_all()
+
+    created_pid = reports[0]["created"]["pid"]
+    assert document_cls.get_record_by_pid(created_pid)["created_by"] == {
+        "type": "import",
+        "value": "springer",
+    }
+    updated_pid = reports[1]["updated"]["pid"]
+    updated_document = document_cls.get_record_by_pid(updated_pid)
+    assert {"scheme": "ISBN", "value": "0987654321"} in \
+        updated_document["identifiers"]
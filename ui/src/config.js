@@ -162,6 +162,7 @@ export const config = {
     modes: [
       { key: 'create', text: 'Create', value: 'create' },
       { key: 'delete', text: 'Delete', value: 'delete' },
+      { key: 'preview', text: 'Preview', value: 'preview' },
     ],
     fetchTaskStatusIntervalSecs: 5000,
   },
@@ -17,6 +17,14 @@ const check = async (taskId, nextEntry = 0) => {
   );
 };
 
+const streamUrl = taskId => {
+  return `${http.defaults.baseURL}${importerURL}/check/${taskId}/stream`;
+};
+
+const promote = async taskId => {
+  return await http.post(`${importerURL}/${taskId}/promote`);
+};
+
 const list = async () => {
   return await http.get(`${importerURL}/list`);
 };
@@ -25,5 +33,7 @@ export const importerApi = {
   check: check,
   createTask: createTask,
   list: list,
+  promote: promote,
+  streamUrl: streamUrl,
   url: importerURL,
 };
@@ -371,7 +371,7 @@ export class Importer extends Component {
                 ref={this.filesRef}
                 id="upload"
                 type="file"
-                accept=".xml"
+                accept=".xml,.ndjson,.gz,.zst"
                 onChange={this.onFileChange}
               />
               <Label basic prompt={fileMissing} pointing="left">
@@ -10,13 +10,26 @@ import {
 } from 'semantic-ui-react';
 import _isEmpty from 'lodash/isEmpty';
 import _get from 'lodash/get';
-import { CdsBackOfficeRoutes } from '../../../routes/BackofficeUrls';
+import {
+  BackOfficeRouteGenerators,
+  CdsBackOfficeRoutes,
+} from '../../../routes/BackofficeUrls';
 import { ReportDetails } from './ReportDetails';
 import { Link } from 'react-router-dom';
 import { BackOfficeRoutes } from '@inveniosoftware/react-invenio-app-ils';
 import { DocumentIcon } from '@inveniosoftware/react-invenio-app-ils';
 import { importerApi } from '../../../api/importer';
-import { invenioConfig } from '@inveniosoftware/react-invenio-app-ils';
+import {
+  history,
+  invenioConfig,
+} from '@inveniosoftware/react-invenio-app-ils';
+
+const mergeReports = (knownReports, newReports) => {
+  const knownIndexes = new Set(knownReports.map(report => report.index));
+  return knownReports
+    .concat(newReports.filter(report => !knownIndexes.has(report.index)))
+    .sort((first, second) => first.index - second.index);
+};
 
 export class ImportedDocuments extends React.Component {
   constructor(props) {
@@ -26,6 +39,8 @@ export class ImportedDocuments extends React.Component {
       importCompleted: false,
       data: null,
       isLoading: true,
+      isPromoting: false,
+      promoteError: null,
     };
   }
 
@@ -36,27 +51,78 @@ export class ImportedDocuments extends React.Component {
       invenioConfig.IMPORTER.fetchTaskStatusIntervalSecs
     );
     this.checkForData(taskId);
+    this.openStream();
   }
 
   componentWillUnmount = () => {
     this.intervalId && clearInterval(this.intervalId);
+    this.closeStream();
+  };
+
+  openStream = () => {
+    const { taskId } = this.props;
+    if (!window.EventSource) {
+      return;
+    }
+    this.eventSource = new EventSource(importerApi.streamUrl(taskId), {
+      withCredentials: true,
+    });
+    this.eventSource.addEventListener('open', () => {
+      this.isStreaming = true;
+    });
+    this.eventSource.addEventListener('progress', this.handleProgress);
+    this.eventSource.addEventListener('end', this.closeStream);
+    this.eventSource.addEventListener('error', () => {
+      // the stream is not available, polling takes over
+      if (this.eventSource.readyState === EventSource.CLOSED) {
+        this.closeStream();
+      }
+    });
+  };
+
+  closeStream = () => {
+    this.eventSource && this.eventSource.close();
+    this.eventSource = null;
+    this.isStreaming = false;
+  };
+
+  handleProgress = event => {
+    const progress = JSON.parse(event.data);
+    this.setState(({ data }) => ({
+      data: {
+        ...data,
+        ...progress,
+        // the pagination of the polled entries is kept, the entries missed
+        // while reconnecting which did not fit in the stream are polled
+        next_entry: _get(data, 'next_entry', 0),
+        more_entries:
+          _get(data, 'more_entries', false) ||
+          _get(progress, 'more_entries', false),
+        reports: mergeReports(_get(data, 'reports', []), progress.reports),
+      },
+    }));
   };
 
   checkForData = async () => {
     const { importCompleted, data } = this.state;
     const { taskId } = this.props;
 
+    if (this.isStreaming && !_get(data, 'more_entries', false)) {
+      // the progress is streamed, no need to poll
+      return;
+    }
     if (!importCompleted) {
-      const nextEntry = _get(data, 'loaded_entries', 0);
+      const nextEntry = _get(data, 'next_entry', 0);
       const knownEntries = _get(data, 'reports', []);
       const response = await importerApi.check(taskId, nextEntry);
       const responseData = response.data;
       if (responseData) {
-        responseData.reports = knownEntries.concat(
+        responseData.reports = mergeReports(
+          knownEntries,
           _get(responseData, 'reports', [])
         );
       }
-      if (response.data.state !== 'RUNNING') {
+      if (response.data.state !== 'RUNNING' && !response.data.more_entries) {
         this.setState({
           importCompleted: true,
           isLoading: false,
@@ -81,6 +147,49 @@ export class ImportedDocuments extends React.Component {
     this.setState({ activeIndex: newIndex });
   };
 
+  promote = async () => {
+    const { taskId } = this.props;
+    this.setState({ isPromoting: true, promoteError: null });
+    try {
+      const response = await importerApi.promote(taskId);
+      history.push(
+        BackOfficeRouteGenerators.importerDetailsFor(response.data.id)
+      );
+    } catch (error) {
+      this.setState({
+        isPromoting: false,
+        promoteError: _get(error, 'response.data.message', error.message),
+      });
+    }
+  };
+
+  renderPromote = () => {
+    const { data, isPromoting, promoteError } = this.state;
+    if (data.mode !== 'PREVIEW' || data.state !== 'SUCCEEDED') {
+      return null;
+    }
+    return (
+      <>
+        <Divider hidden />
+        <Button
+          primary
+          icon="upload"
+          labelPosition="left"
+          content="Import the previewed literatures"
+          loading={isPromoting}
+          disabled={isPromoting}
+          onClick={this.promote}
+        />
+        {promoteError && (
+          <Message negative>
+            <Message.Header>Failed to import the preview</Message.Header>
+            <p>{promoteError}</p>
+          </Message>
+        )}
+      </>
+    );
+  };
+
   renderErrorMessage = data => {
     return (
       <Message negative>
@@ -122,7 +231,10 @@ export class ImportedDocuments extends React.Component {
         ) : data.state === 'SUCCEEDED' ? (
           <>
             <Icon name="check circle" color="green" aria-label="Completed" />
-            Literatures imported successfully.
+            {data.mode === 'PREVIEW'
+              ? 'Literatures previewed successfully, nothing was imported.'
+              : 'Literatures imported successfully.'}
+            {this.renderPromote()}
           </>
         ) : (
           <>
@@ -154,7 +266,7 @@ export class ImportedDocuments extends React.Component {
                 onClick={this.handleClick}
               >
                 <Icon name="dropdown" />
-                {!_isEmpty(document) ? (
+                {!_isEmpty(document) && document.pid ? (
                   <Link
                     to={BackOfficeRoutes.documentDetailsFor(document.pid)}
                     target="_blank"
@@ -162,6 +274,11 @@ export class ImportedDocuments extends React.Component {
                     <DocumentIcon />
                     {document.title}
                   </Link>
+                ) : !_isEmpty(document) ? (
+                  <>
+                    <DocumentIcon />
+                    {document.title}
+                  </>
                 ) : importSuccess ? (
                   'No document created or updated'
                 ) : (
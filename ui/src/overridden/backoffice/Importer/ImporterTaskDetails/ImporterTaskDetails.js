@@ -9,7 +9,8 @@ export class ImporterTaskDetails extends React.Component {
         params: { taskId },
       },
     } = this.props;
-    return <ImportedDocuments taskId={taskId} />;
+    // remounted when a preview is promoted to a new task
+    return <ImportedDocuments key={taskId} taskId={taskId} />;
   }
 }
 
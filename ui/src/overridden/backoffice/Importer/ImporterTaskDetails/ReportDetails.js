@@ -12,9 +12,13 @@ const displayRecordLink = (id, label) => (
 );
 
 const displayValue = (value, urlGenerator, getId, getTitle) => {
-  return _isEmpty(value)
-    ? ''
-    : displayRecordLink(urlGenerator(getId(value)), getTitle(value));
+  if (_isEmpty(value)) {
+    return '';
+  }
+  // the records of a preview are not created, they have no pid
+  return getId(value)
+    ? displayRecordLink(urlGenerator(getId(value)), getTitle(value))
+    : getTitle(value);
 };
 
 const displayValues = (values, urlGenerator, getId, getTitle) => {